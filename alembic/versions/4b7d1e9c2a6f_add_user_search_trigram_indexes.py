@@ -0,0 +1,38 @@
+"""add user search trigram indexes
+
+Revision ID: 4b7d1e9c2a6f
+Revises: 9c2f4e7a1b3d
+Create Date: 2026-10-18 10:41:03.582917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7d1e9c2a6f'
+down_revision: Union[str, None] = '9c2f4e7a1b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ('first_name', 'last_name', 'email', 'nickname')
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY keeps the users table writable while the indexes build,
+    # but cannot run inside the migration transaction
+    with op.get_context().autocommit_block():
+        for column in SEARCH_COLUMNS:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_{column}_trgm '
+                f'ON users USING gin (lower({column}) gin_trgm_ops)'
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for column in SEARCH_COLUMNS:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS ix_users_{column}_trgm')
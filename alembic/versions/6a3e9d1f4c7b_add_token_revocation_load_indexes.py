@@ -0,0 +1,30 @@
+"""add token revocation load indexes
+
+Revision ID: 6a3e9d1f4c7b
+Revises: d7f1b3a5c9e2
+Create Date: 2026-10-18 21:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a3e9d1f4c7b'
+down_revision: Union[str, None] = 'd7f1b3a5c9e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('token_watermarks', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
+    op.create_index(op.f('ix_token_watermarks_updated_at'), 'token_watermarks', ['updated_at'], unique=False)
+    op.create_index(op.f('ix_revoked_tokens_created_at'), 'revoked_tokens', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_revoked_tokens_created_at'), table_name='revoked_tokens')
+    op.drop_index(op.f('ix_token_watermarks_updated_at'), table_name='token_watermarks')
+    op.drop_column('token_watermarks', 'updated_at')
@@ -0,0 +1,30 @@
+"""add users created_at id index
+
+Revision ID: 7e1a5c3f9d20
+Revises: 4b7d1e9c2a6f
+Create Date: 2026-10-18 11:27:45.104311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e1a5c3f9d20'
+down_revision: Union[str, None] = '4b7d1e9c2a6f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_users_created_at_id', table_name='users',
+                      postgresql_concurrently=True, if_exists=True)
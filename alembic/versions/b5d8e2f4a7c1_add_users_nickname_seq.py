@@ -0,0 +1,27 @@
+"""add users nickname sequence
+
+Revision ID: b5d8e2f4a7c1
+Revises: 7e1a5c3f9d20
+Create Date: 2026-10-18 13:02:11.734590
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d8e2f4a7c1'
+down_revision: Union[str, None] = '7e1a5c3f9d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Must match NICKNAME_BLOCK_SIZE in app/models/user_model.py
+    op.execute(sa.schema.CreateSequence(sa.Sequence('users_nickname_seq', start=0, minvalue=0, increment=100)))
+
+
+def downgrade() -> None:
+    op.execute(sa.schema.DropSequence(sa.Sequence('users_nickname_seq')))
@@ -0,0 +1,26 @@
+"""add users token_version
+
+Revision ID: c3a9f6e1d8b4
+Revises: b5d8e2f4a7c1
+Create Date: 2026-10-18 14:21:47.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a9f6e1d8b4'
+down_revision: Union[str, None] = 'b5d8e2f4a7c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
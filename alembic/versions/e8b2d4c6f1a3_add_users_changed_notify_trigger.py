@@ -0,0 +1,43 @@
+"""add users_changed notify trigger
+
+Revision ID: e8b2d4c6f1a3
+Revises: c3a9f6e1d8b4
+Create Date: 2026-10-18 15:04:32.560917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b2d4c6f1a3'
+down_revision: Union[str, None] = 'c3a9f6e1d8b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Must match USERS_CHANGED_CHANNEL and USERS_CHANGED_IGNORED_COLUMNS in app/models/user_model.py
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_users_changed() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE'
+               AND to_jsonb(NEW) - ARRAY['last_login_at', 'failed_login_attempts', 'updated_at']
+                 = to_jsonb(OLD) - ARRAY['last_login_at', 'failed_login_attempts', 'updated_at'] THEN
+                RETURN NULL;
+            END IF;
+            PERFORM pg_notify('users_changed', CAST(OLD.id AS text));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(
+        "CREATE TRIGGER users_changed_notify AFTER UPDATE OR DELETE ON users "
+        "FOR EACH ROW EXECUTE FUNCTION notify_users_changed()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS users_changed_notify ON users")
+    op.execute("DROP FUNCTION IF EXISTS notify_users_changed()")
@@ -1,21 +1,90 @@
+from builtins import ValueError, dict, isinstance, len, min, next, range, str
+import itertools
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base, sessionmaker
+from app.utils.pool_stats import InstrumentedAsyncPool
+from settings.config import Settings, get_settings
 
 Base = declarative_base()
 
+def _unique_statement_name() -> str:
+    return f"__sa_{uuid.uuid4().hex}__"
+
+def engine_options(database_url: str, settings: Optional[Settings] = None, **overrides: Any) -> Dict[str, Any]:
+    """
+    ``create_async_engine`` keyword arguments from the ``db_*`` settings, with ``overrides`` on top.
+
+    asyncpg connect options (``statement_cache_size``, ``server_settings``) are only passed for
+    asyncpg URLs; a ``connect_args`` override is merged into them.
+
+    With ``db_pgbouncer_mode`` the connection may be a different server connection in every
+    transaction. asyncpg names its prepared statements ``__asyncpg_stmt_<n>__`` per client
+    connection, so two clients collide on one server connection and a cached statement is missing
+    on the next one. Statements are then given globally unique names and, unless PgBouncer
+    tracks prepared statements itself, are not cached past the transaction that prepared them.
+    """
+    settings = settings or get_settings()
+    options: Dict[str, Any] = {
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    if "asyncpg" in database_url:
+        connect_args: Dict[str, Any] = {"statement_cache_size": settings.db_statement_cache_size}
+        if settings.db_server_settings:
+            connect_args["server_settings"] = dict(settings.db_server_settings)
+        if settings.db_pgbouncer_mode:
+            connect_args.update(
+                statement_cache_size=0,
+                prepared_statement_cache_size=settings.db_pgbouncer_statement_cache_size,
+                prepared_statement_name_func=_unique_statement_name,
+            )
+        options["connect_args"] = connect_args
+    if "connect_args" in overrides:
+        options["connect_args"] = {**options.get("connect_args", {}), **overrides.pop("connect_args")}
+    options.update(overrides)
+    return options
+
+def _session_factory_for(engine):
+    return sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, future=True)
+
 class Database:
-    """Handles database connections and sessions."""
+    """
+    Handles database connections and sessions.
+
+    Besides the primary, any ``replica_urls`` get an engine of their own; ``get_read_session_factory``
+    hands out sessions bound to one of them for read-only work.
+    """
     _engine = None
     _session_factory = None
+    _replica_engines: List = []
+    _replica_session_factories: List = []
+    _round_robin = itertools.count()
 
     @classmethod
-    def initialize(cls, database_url: str, echo: bool = False):
-        """Initialize the async engine and sessionmaker."""
+    def initialize(cls, database_url: str, echo: bool = False, replica_urls: Optional[Sequence[str]] = None,
+                   **overrides: Any):
+        """
+        Initialize the async engines and sessionmakers; ``overrides`` replace the pool settings.
+        ``replica_urls`` defaults to the ``database_replica_urls`` setting.
+        """
         if cls._engine is None:  # Ensure engine is created once
-            cls._engine = create_async_engine(database_url, echo=echo, future=True)
-            cls._session_factory = sessionmaker(
-                bind=cls._engine, class_=AsyncSession, expire_on_commit=False, future=True
+            cls._engine = create_async_engine(
+                database_url, echo=echo, future=True, **engine_options(database_url, **overrides)
             )
+            cls._session_factory = _session_factory_for(cls._engine)
+            if replica_urls is None:
+                replica_urls = get_settings().database_replica_urls
+            cls._replica_engines = [
+                create_async_engine(url, echo=echo, future=True, **engine_options(url, **overrides))
+                for url in replica_urls
+            ]
+            cls._replica_session_factories = [_session_factory_for(engine) for engine in cls._replica_engines]
 
     @classmethod
     def get_session_factory(cls):
@@ -23,3 +92,36 @@ class Database:
         if cls._session_factory is None:
             raise ValueError("Database not initialized. Call `initialize()` first.")
         return cls._session_factory
+
+    @classmethod
+    def get_read_session_factory(cls):
+        """
+        A session factory for read-only work: a replica picked by ``database_replica_selection``
+        (``round_robin``, or ``least_loaded`` for the fewest checked-out connections), or the
+        primary when no replicas are configured.
+        """
+        factories = cls._replica_session_factories
+        if not factories:
+            return cls.get_session_factory()
+        if get_settings().database_replica_selection == "least_loaded":
+            pools = [engine.pool for engine in cls._replica_engines]
+            return factories[min(range(len(pools)), key=lambda i: pools[i].checkedout())]
+        return factories[next(cls._round_robin) % len(factories)]
+
+    @classmethod
+    def replica_pool_stats(cls) -> List[Dict[str, Any]]:
+        """``pool_stats`` for each replica, in the order of ``database_replica_urls``."""
+        return [
+            engine.pool.snapshot() if isinstance(engine.pool, InstrumentedAsyncPool) else {"status": engine.pool.status()}
+            for engine in cls._replica_engines
+        ]
+
+    @classmethod
+    def pool_stats(cls) -> Dict[str, Any]:
+        """Checked-out connections, waiters, timeouts and acquire/connect latency histograms."""
+        if cls._engine is None:
+            raise ValueError("Database not initialized. Call `initialize()` first.")
+        pool = cls._engine.pool
+        if not isinstance(pool, InstrumentedAsyncPool):
+            return {"status": pool.status()}
+        return pool.snapshot()
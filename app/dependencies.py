@@ -1,27 +1,45 @@
 import uuid
 from uuid import UUID
-from typing import Sequence, Union
+from typing import Optional, Sequence, Union
 from builtins import Exception, dict, str
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import Database
+from app.utils.read_your_writes import reads_must_use_primary
 from app.utils.template_manager import TemplateManager
+from app.services.api_key_service import ApiKeyService
 from app.services.email_service import EmailService
+from app.services.identity_cache import get_identity_cache
 from app.services.jwt_service import decode_token
-from settings.config import Settings
+from app.services.token_revocation_service import is_token_revoked
+from settings.config import Settings, get_settings, reload_settings
 from fastapi import Depends
 from app.models.user_model import User, UserRole
+from app.schemas.api_key_schema import ApiKeyPrincipal
+from app.schemas.token_schema import TokenClaims
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login/")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login/", auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
-def get_settings() -> Settings:
-    """Return application settings."""
-    return Settings()
+_email_service: Optional[EmailService] = None
 
 def get_email_service() -> EmailService:
-    template_manager = TemplateManager()
-    return EmailService(template_manager=template_manager)
+    """Return the process-wide EmailService, whose SMTP connections are reused across requests."""
+    global _email_service
+    if _email_service is None:
+        template_manager = TemplateManager(auto_reload=get_settings().email_template_auto_reload)
+        template_manager.preload()
+        _email_service = EmailService(template_manager=template_manager)
+    return _email_service
+
+def close_email_service():
+    """Close the shared EmailService's SMTP connections; a new one is built on next use."""
+    global _email_service
+    if _email_service is not None:
+        _email_service.close()
+        _email_service = None
 
 async def get_db() -> AsyncSession:
     """Dependency that provides a database session for each request."""
@@ -31,38 +49,89 @@ async def get_db() -> AsyncSession:
             yield session
         except Exception as e:
             raise HTTPException(status_code=500, detail=str(e))
+
+async def get_read_db(request: Request) -> AsyncSession:
+    """
+    Dependency for read-only routes: a session on a read replica, or on the primary while the
+    client is within ``read_your_writes_seconds`` of its last write (or no replica is configured).
+    """
+    if reads_must_use_primary(request):
+        async_session_factory = Database.get_session_factory()
+    else:
+        async_session_factory = Database.get_read_session_factory()
+    async with async_session_factory() as session:
+        try:
+            yield session
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
         
 
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db),
-) -> User:
-    credentials_exc = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    payload = decode_token(token)
-    if not payload or "sub" not in payload:
-        raise credentials_exc
 
-    try:
-        user_uuid = UUID(payload["sub"])   # ← now this will succeed
-    except ValueError:
-        raise credentials_exc
+def get_token_claims(token: str = Depends(oauth2_scheme)) -> TokenClaims:
+    """Verify the bearer token and return its claims, without touching the database."""
+    claims = TokenClaims.from_payload(decode_token(token))
+    if claims is None or is_token_revoked(claims.jti, claims.id, claims.issued_at):
+        raise _credentials_exception()
+    return claims
 
-    user = await db.get(User, user_uuid)
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    """The full ``User`` behind the bearer token, for endpoints that need more than its id and role."""
+    claims = get_token_claims(token)
+    identity_cache = get_identity_cache()
+    if identity_cache is not None:
+        user = await identity_cache.load(db, claims.id)
+    else:
+        user = await db.get(User, claims.id)
     if not user:
         # Token was valid, but the user record no longer exists
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    if user.token_version != claims.token_version:
+        # Role or password changed after this token was issued
+        raise _credentials_exception()
 
     return user
 
+async def get_current_principal(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    api_key: Optional[str] = Depends(api_key_header),
+    db: AsyncSession = Depends(get_db),
+) -> Union[User, TokenClaims, ApiKeyPrincipal]:
+    """
+    The caller for authorization checks.
+
+    An ``X-API-Key`` header authenticates a service as an ``ApiKeyPrincipal``. Otherwise the
+    bearer token is used: with ``auth_trust_token_claims`` on, the signed claims are returned as
+    they are and no query runs; a role change then takes effect when the short-lived token
+    expires. Otherwise the user is loaded as in ``get_current_user``. Both expose ``id`` and ``role``.
+    """
+    if api_key:
+        principal = await ApiKeyService.authenticate(db, api_key)
+        if principal is None:
+            raise _credentials_exception()
+        return principal
+    if token is None:
+        raise _credentials_exception()
+    if get_settings().auth_trust_token_claims:
+        claims = get_token_claims(token)
+        if claims.role is None:
+            raise _credentials_exception()
+        return claims
+    return await get_current_user(token, db)
+
 def require_role(allowed: Sequence[Union[UserRole,str]]):
     """
     Dependency that ensures current_user.role is one of the allowed roles.
@@ -73,18 +142,22 @@ def require_role(allowed: Sequence[Union[UserRole,str]]):
         for r in allowed
     }
 
-    def role_checker(current_user: User = Depends(get_current_user)) -> User:
-        # current_user.role is a UserRole enum
-        role_name = (
-            current_user.role.name
-            if isinstance(current_user.role, UserRole)
-            else str(current_user.role)
-        )
-        if role_name not in allowed_names:
+    def role_checker(current_user: Union[User, TokenClaims, ApiKeyPrincipal] = Depends(get_current_principal)) -> Union[User, TokenClaims, ApiKeyPrincipal]:
+        if isinstance(current_user, ApiKeyPrincipal):
+            # An API key may act as any of its scopes
+            granted = current_user.scopes
+        else:
+            # current_user.role is a UserRole enum
+            granted = {
+                current_user.role.name
+                if isinstance(current_user.role, UserRole)
+                else str(current_user.role)
+            }
+        if granted.isdisjoint(allowed_names):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Operation not permitted"
             )
         return current_user
 
-    return role_checker
\ No newline at end of file
+    return role_checker
@@ -1,11 +1,23 @@
-from builtins import Exception
+from builtins import Exception, NotImplementedError, RuntimeError, str
+import asyncio
+import math
+import signal
 from fastapi import FastAPI
 from starlette.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware  # Import the CORSMiddleware
 from app.database import Database
-from app.dependencies import get_settings
-from app.routers import user_routes
+from app.dependencies import close_email_service, get_email_service, get_settings, reload_settings
+from app.services.api_key_service import start_api_key_usage_recorder, stop_api_key_usage_recorder
+from app.services.email_outbox_service import start_email_dispatcher, stop_email_dispatcher
+from app.services.identity_cache import start_identity_cache, stop_identity_cache
+from app.services.login_activity_service import start_last_login_recorder, stop_last_login_recorder
+from app.services.password_rehash_service import drain_password_rehashes
+from app.services.token_revocation_service import start_token_revocation_sync, stop_token_revocation_sync
+from app.routers import admin_routes, api_key_routes, user_routes
 from app.utils.api_description import getDescription
+from app.utils.rate_limit import RateLimitExceeded
+from app.utils.read_your_writes import record_write
+from app.utils.security import PasswordHashingBusyError, shutdown_password_executor
 app = FastAPI(
     title="User Management",
     description=getDescription(),
@@ -28,15 +40,56 @@ app.add_middleware(
     allow_headers=["*"],  # Allowed HTTP headers
 )
 
+@app.middleware("http")
+async def read_your_writes_middleware(request, call_next):
+    response = await call_next(request)
+    record_write(request, response)
+    return response
+
 @app.on_event("startup")
 async def startup_event():
     settings = get_settings()
     Database.initialize(settings.database_url, settings.debug)
+    if settings.email_outbox_dispatcher_enabled:
+        await start_email_dispatcher(Database.get_session_factory(), get_email_service())
+    if settings.last_login_write_behind_enabled:
+        await start_last_login_recorder(Database.get_session_factory())
+    if settings.identity_cache_enabled:
+        await start_identity_cache(Database._engine)
+    await start_token_revocation_sync(Database.get_session_factory())
+    await start_api_key_usage_recorder(Database.get_session_factory())
+    # `kill -HUP <pid>` re-reads the environment and .env without restarting the worker
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_settings)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        pass  # No SIGHUP on this platform, or not running in the main thread
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_email_dispatcher()
+    await stop_last_login_recorder()
+    await stop_identity_cache()
+    await stop_token_revocation_sync()
+    await stop_api_key_usage_recorder()
+    await drain_password_rehashes()
+    shutdown_password_executor()
+    close_email_service()
+
+@app.exception_handler(PasswordHashingBusyError)
+async def password_hashing_busy_handler(request, exc):
+    return JSONResponse(status_code=503, content={"message": "Server is busy, please retry shortly."}, headers={"Retry-After": "1"})
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_exceeded_handler(request, exc):
+    retry_after = str(math.ceil(exc.retry_after))
+    return JSONResponse(status_code=429, content={"message": "Too many attempts, please retry later."}, headers={"Retry-After": retry_after})
 
 @app.exception_handler(Exception)
 async def exception_handler(request, exc):
     return JSONResponse(status_code=500, content={"message": "An unexpected error occurred."})
 
 app.include_router(user_routes.router)
+app.include_router(api_key_routes.router)
+app.include_router(admin_routes.router)
 
 
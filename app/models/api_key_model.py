@@ -0,0 +1,44 @@
+from builtins import int, list, str
+from datetime import datetime
+import uuid
+from sqlalchemy import BigInteger, Column, String, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+class ApiKey(Base):
+    """
+    A long-lived credential for service-to-service callers, sent in the ``X-API-Key`` header.
+
+    Keys look like ``umk_<prefix>_<secret>``. Only the prefix, which identifies the key, and an
+    HMAC-SHA256 digest of the whole key are stored; see app.services.api_key_service.
+
+    Attributes:
+        id (UUID): Unique identifier for the key.
+        name (str): What the key is for, e.g. the calling service.
+        prefix (str): Public part of the key, unique and indexed for lookup.
+        key_hash (str): Hex HMAC-SHA256 of the full key.
+        scopes (list[str]): Role names the key may act as, checked by ``require_role``.
+        created_by (UUID): Admin who created the key.
+        usage_count (int): Authenticated requests made with the key, written in batches.
+        last_used_at (datetime): Time of the most recent use, written in batches.
+        expires_at (datetime): Optional expiry.
+        revoked_at (datetime): When the key was revoked; null while active.
+        created_at (datetime): Timestamp when the key was created.
+    """
+    __tablename__ = "api_keys"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    name: Mapped[str] = Column(String(100), nullable=False)
+    prefix: Mapped[str] = Column(String(16), nullable=False, unique=True, index=True)
+    key_hash: Mapped[str] = Column(String(64), nullable=False)
+    scopes: Mapped[list] = Column(ARRAY(String(32)), nullable=False, default=list)
+    created_by: Mapped[uuid.UUID] = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    usage_count: Mapped[int] = Column(BigInteger, nullable=False, default=0)
+    last_used_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+    expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+    revoked_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<ApiKey {self.name} ({self.prefix}), Scopes: {self.scopes}>"
@@ -0,0 +1,53 @@
+from builtins import dict, int, str
+from datetime import datetime
+from enum import Enum
+import uuid
+from sqlalchemy import Column, String, Integer, DateTime, Index, func, Enum as SQLAlchemyEnum
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+class OutboxStatus(Enum):
+    """Delivery state of a queued email."""
+    PENDING = "PENDING"
+    SENDING = "SENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+class EmailOutbox(Base):
+    """
+    An email waiting to be delivered, written in the same transaction as the change that caused it.
+
+    Rows are claimed by the background dispatcher in app.services.email_outbox_service, which moves
+    them from PENDING to SENDING, then to SENT, or back to PENDING with a later next_attempt_at on failure.
+
+    Attributes:
+        id (UUID): Unique identifier for the message.
+        email_type (str): Template name understood by EmailService.send_user_email.
+        recipient (str): Destination email address.
+        payload (dict): Template context, including the recipient under "email".
+        status (OutboxStatus): Delivery state.
+        attempts (int): Number of delivery attempts made so far.
+        next_attempt_at (datetime): Earliest time the dispatcher may (re)claim the message.
+        last_error (str): Error from the most recent failed attempt.
+        created_at (datetime): Timestamp when the message was queued.
+        sent_at (datetime): Timestamp of successful delivery.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    email_type: Mapped[str] = Column(String(50), nullable=False)
+    recipient: Mapped[str] = Column(String(255), nullable=False)
+    payload: Mapped[dict] = Column(JSONB, nullable=False)
+    status: Mapped[OutboxStatus] = Column(SQLAlchemyEnum(OutboxStatus, name='OutboxStatus', create_constraint=True), nullable=False, default=OutboxStatus.PENDING)
+    attempts: Mapped[int] = Column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error: Mapped[str] = Column(String(500), nullable=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<EmailOutbox {self.email_type} to {self.recipient}, Status: {self.status.name}>"
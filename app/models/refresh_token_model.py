@@ -0,0 +1,37 @@
+from builtins import str
+from datetime import datetime
+import uuid
+from sqlalchemy import Column, String, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+from app.database import Base
+
+class RefreshToken(Base):
+    """
+    A refresh token issued at login, stored only as the SHA-256 of the opaque value given to the client.
+
+    Every refresh revokes the presented token and issues its successor in the same family. Presenting
+    a token that was already rotated means it leaked, so the whole family is revoked; see
+    app.services.refresh_token_service.
+
+    Attributes:
+        id (UUID): Unique identifier for the token.
+        user_id (UUID): The user the token renews access for.
+        family_id (UUID): Shared by a login's token and all tokens rotated from it.
+        token_hash (str): Hex SHA-256 of the token, unique and indexed for lookup.
+        expires_at (datetime): After this the token can no longer be used.
+        revoked_at (datetime): When the token was rotated or revoked; null while usable.
+        created_at (datetime): Timestamp when the token was issued.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    family_id: Mapped[uuid.UUID] = Column(UUID(as_uuid=True), nullable=False, index=True)
+    token_hash: Mapped[str] = Column(String(64), nullable=False, unique=True, index=True)
+    expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False)
+    revoked_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self) -> str:
+        return f"<RefreshToken {self.id} for {self.user_id}, family {self.family_id}>"
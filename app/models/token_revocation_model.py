@@ -0,0 +1,50 @@
+from builtins import str
+from datetime import datetime
+import uuid
+from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped
+from app.database import Base
+
+class RevokedToken(Base):
+    """
+    An access token revoked before it expired, identified by its ``jti`` claim.
+
+    Attributes:
+        jti (str): The token's unique id.
+        user_id (UUID): Subject of the token, for auditing.
+        expires_at (datetime): The token's own expiry; after it the row can be pruned.
+        created_at (datetime): When the token was revoked.
+    """
+    __tablename__ = "revoked_tokens"
+
+    jti: Mapped[str] = Column(String(64), primary_key=True)
+    user_id: Mapped[uuid.UUID] = Column(UUID(as_uuid=True), nullable=True)
+    expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    def __repr__(self) -> str:
+        return f"<RevokedToken {self.jti}>"
+
+class TokenWatermark(Base):
+    """
+    Revokes every access token of a user issued (``iat``) before ``revoked_before``.
+
+    Written on a lock, role change, password reset or delete. No foreign key to users, so the
+    watermark outlives a deleted user until the tokens it covers have expired.
+
+    Attributes:
+        user_id (UUID): The user whose older tokens are revoked.
+        revoked_before (datetime): Tokens issued before this instant are no longer accepted.
+        expires_at (datetime): When every token the watermark covers has expired anyway.
+        updated_at (datetime): When the watermark was last moved, for incremental loads.
+    """
+    __tablename__ = "token_watermarks"
+
+    user_id: Mapped[uuid.UUID] = Column(UUID(as_uuid=True), primary_key=True)
+    revoked_before: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False)
+    expires_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=False, index=True)
+    updated_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    def __repr__(self) -> str:
+        return f"<TokenWatermark {self.user_id} before {self.revoked_before}>"
@@ -3,7 +3,7 @@ from datetime import datetime
 from enum import Enum
 import uuid
 from sqlalchemy import (
-    Column, String, Integer, DateTime, Boolean, func, Enum as SQLAlchemyEnum
+    DDL, Column, String, Integer, DateTime, Boolean, Index, Sequence, event, func, text, Enum as SQLAlchemyEnum
 )
 from sqlalchemy.dialects.postgresql import UUID, ENUM
 from sqlalchemy.orm import Mapped, mapped_column
@@ -16,6 +16,24 @@ class UserRole(Enum):
     MANAGER = "MANAGER"
     ADMIN = "ADMIN"
 
+# Positions for app.utils.nickname_gen.NicknameAllocator; each nextval reserves a block of this many nicknames
+NICKNAME_BLOCK_SIZE = 100
+nickname_sequence = Sequence("users_nickname_seq", start=0, minvalue=0, increment=NICKNAME_BLOCK_SIZE, metadata=Base.metadata)
+
+def _pg_trgm_installed(ddl, target, bind, **kw) -> bool:
+    """Only emit the trigram indexes where the pg_trgm extension could be installed."""
+    return bind.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar() is not None
+
+def _trigram_index(name: str, column: Column) -> Index:
+    """GIN trigram index on lower(column), usable by `lower(column) LIKE '%q%'`."""
+    label = f"{name}_lower"
+    return Index(
+        f"ix_users_{name}_trgm",
+        func.lower(column).label(label),
+        postgresql_using="gin",
+        postgresql_ops={label: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql", callable_=_pg_trgm_installed)
+
 class User(Base):
     """
     Represents a user within the application, corresponding to the 'users' table in the database.
@@ -40,6 +58,7 @@ class User(Base):
         last_login_at (datetime): Timestamp of the last login.
         failed_login_attempts (int): Count of failed login attempts.
         is_locked (bool): Flag indicating if the account is locked.
+        token_version (int): Bumped whenever the role or password changes; access tokens carry it as ``ver``.
         created_at (datetime): Timestamp when the user was created, set by the server.
         updated_at (datetime): Timestamp of the last update, set by the server.
 
@@ -68,12 +87,22 @@ class User(Base):
     last_login_at: Mapped[datetime] = Column(DateTime(timezone=True), nullable=True)
     failed_login_attempts: Mapped[int] = Column(Integer, default=0)
     is_locked: Mapped[bool] = Column(Boolean, default=False)
+    token_version: Mapped[int] = Column(Integer, default=0, server_default=text("0"), nullable=False)
     created_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now())
     updated_at: Mapped[datetime] = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     verification_token = Column(String, nullable=True)
     email_verified: Mapped[bool] = Column(Boolean, default=False, nullable=False)
     hashed_password: Mapped[str] = Column(String(255), nullable=False)
 
+    # GIN trigram indexes on the lowercased search columns, so substring search can use an index
+    __table_args__ = (
+        _trigram_index("first_name", first_name),
+        _trigram_index("last_name", last_name),
+        _trigram_index("email", email),
+        _trigram_index("nickname", nickname),
+        # Keyset pagination order for the user listing
+        Index("ix_users_created_at_id", created_at, id),
+    )
 
     def __repr__(self) -> str:
         """Provides a readable representation of a user object."""
@@ -95,3 +124,34 @@ class User(Base):
         """Updates the professional status and logs the update time."""
         self.is_professional = status
         self.professional_status_updated_at = func.now()
+
+@event.listens_for(User.__table__, "before_create")
+def _create_pg_trgm_extension(target, connection, **kw):
+    # Mirrors the migration for databases built with metadata.create_all (e.g. the test suite)
+    if connection.dialect.name != "postgresql":
+        return
+    available = connection.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar()
+    if available:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+# Channel on which Postgres announces changed users (payload: the user id), so every worker can drop
+# its cached copy; see app.services.identity_cache. Login bookkeeping columns do not count as changes.
+USERS_CHANGED_CHANNEL = "users_changed"
+USERS_CHANGED_IGNORED_COLUMNS = ("last_login_at", "failed_login_attempts", "updated_at")
+
+_ignored = ", ".join(f"'{name}'" for name in USERS_CHANGED_IGNORED_COLUMNS)
+event.listen(User.__table__, "after_create", DDL(f"""
+CREATE OR REPLACE FUNCTION notify_users_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND to_jsonb(NEW) - ARRAY[{_ignored}] = to_jsonb(OLD) - ARRAY[{_ignored}] THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify('{USERS_CHANGED_CHANNEL}', CAST(OLD.id AS text));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""").execute_if(dialect="postgresql"))
+event.listen(User.__table__, "after_create", DDL(
+    "CREATE TRIGGER users_changed_notify AFTER UPDATE OR DELETE ON users "
+    "FOR EACH ROW EXECUTE FUNCTION notify_users_changed()"
+).execute_if(dialect="postgresql"))
@@ -0,0 +1,21 @@
+"""
+Operational endpoints for administrators. The figures are those of the worker that serves the
+request; with several workers, each reports its own.
+"""
+
+from builtins import dict
+from typing import Any, Dict
+from fastapi import APIRouter, Depends
+from app.database import Database
+from app.dependencies import require_role
+
+router = APIRouter(prefix="/admin", tags=["Administration (Admin Role)"])
+
+@router.get("/db-pool", response_model=Dict[str, Any], name="get_db_pool_stats")
+async def get_db_pool_stats(current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Connection pool state of the primary and of each replica, in the order of
+    ``database_replica_urls``: checked-out connections, waiters, timeouts and acquire/connect
+    latency histograms.
+    """
+    return {"primary": Database.pool_stats(), "replicas": Database.replica_pool_stats()}
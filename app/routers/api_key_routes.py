@@ -0,0 +1,38 @@
+"""
+Management of the API keys that other services use to call this one with an ``X-API-Key`` header
+instead of logging in. Only administrators can create, list and revoke keys, and a key's
+plaintext value is returned once, when it is created.
+"""
+
+from builtins import dict
+from typing import List
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.dependencies import get_db, get_read_db, require_role
+from app.schemas.api_key_schema import ApiKeyCreate, ApiKeyCreatedResponse, ApiKeyPrincipal, ApiKeyResponse
+from app.services.api_key_service import ApiKeyService
+
+router = APIRouter(prefix="/api-keys", tags=["API Keys (Admin Role)"])
+
+@router.post("/", response_model=ApiKeyCreatedResponse, status_code=status.HTTP_201_CREATED, name="create_api_key")
+async def create_api_key(api_key: ApiKeyCreate, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Create an API key with the given scopes. The response carries the full key in ``key``;
+    store it, since only its digest is kept.
+    """
+    created_by = None if isinstance(current_user, ApiKeyPrincipal) else current_user.id
+    created, key = await ApiKeyService.create(db, api_key.name, api_key.scopes, created_by, api_key.expires_at)
+    return ApiKeyCreatedResponse(**ApiKeyResponse.model_validate(created).model_dump(), key=key)
+
+@router.get("/", response_model=List[ApiKeyResponse], name="list_api_keys")
+async def list_api_keys(db: AsyncSession = Depends(get_read_db), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """List every API key with its usage counters. Keys themselves are never returned."""
+    return [ApiKeyResponse.model_validate(api_key) for api_key in await ApiKeyService.list_keys(db)]
+
+@router.delete("/{key_id}", status_code=status.HTTP_204_NO_CONTENT, name="revoke_api_key")
+async def revoke_api_key(key_id: UUID, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """Revoke an API key. Requests with it are rejected from then on."""
+    if not await ApiKeyService.revoke(db, key_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="API key not found")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -18,31 +18,37 @@ Key Highlights:
 - Utilizes OAuth2PasswordBearer for securing API endpoints, requiring valid access tokens for operations.
 """
 
-from builtins import dict, int, len, str
+from builtins import dict, int, isinstance, len, str, sum
 from datetime import timedelta
 from uuid import UUID
 from typing import Sequence, Union, Optional
 from fastapi import APIRouter, Depends, HTTPException, Response, status, Request, Query
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.dependencies import get_current_user, get_db, get_email_service, require_role
-from app.schemas.pagination_schema import EnhancedPagination
-from app.schemas.token_schema import TokenResponse
-from app.schemas.user_schemas import LoginRequest, UserBase, UserCreate, UserListResponse, UserResponse, UserUpdate, UserProfileDTO, UserProfileUpdate
-from app.services.user_service import UserService
-from app.services.jwt_service import create_access_token
+from app.dependencies import get_current_principal, get_current_user, get_db, get_email_service, get_read_db, optional_oauth2_scheme, require_role
+from app.schemas.api_key_schema import ApiKeyPrincipal
+from app.schemas.pagination_schema import EnhancedPagination, TotalMode
+from app.schemas.token_schema import RefreshTokenRequest, TokenClaims, TokenResponse
+from app.schemas.user_schemas import BulkDeleteBatch, LoginRequest, UserBase, UserBulkDeleteRequest, UserBulkDeleteResponse, UserCreate, UserListResponse, UserResponse, UserUpdate, UserProfileDTO, UserProfileUpdate
+from app.services.user_service import EmailAlreadyExistsError, UserService
+from app.services.identity_cache import invalidate_cached_user
+from app.services.jwt_service import access_token_lifetime, create_access_token, decode_token
+from app.services.refresh_token_service import RefreshTokenService
+from app.services.token_revocation_service import TokenRevocationService
 from app.models.user_model import User, UserRole
 from app.utils.link_generation import create_user_links, generate_pagination_links
+from app.utils.pagination_cursor import decode_cursor, encode_cursor
+from app.utils.rate_limit import enforce_rate_limit
 from app.dependencies import get_settings, get_db, get_current_user
 from app.services.email_service import EmailService
-from datetime import datetime
+from datetime import datetime, timezone
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login/")
 # oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
-settings = get_settings()
 @router.get("/users/{user_id}", response_model=UserResponse, name="get_user", tags=["User Management Requires (Admin or Manager Roles)"])
-async def get_user(user_id: UUID, request: Request, db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
+async def get_user(user_id: UUID, request: Request, db: AsyncSession = Depends(get_read_db), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
     """
     Endpoint to fetch a user by their unique identifier (UUID).
 
@@ -53,7 +59,7 @@ async def get_user(user_id: UUID, request: Request, db: AsyncSession = Depends(g
         user_id: UUID of the user to fetch.
         request: The request object, used to generate full URLs in the response.
         db: Dependency that provides an AsyncSession for database access.
-        token: The OAuth2 access token obtained through OAuth2PasswordBearer dependency.
+        current_user: The caller, authenticated by a bearer token or an X-API-Key header.
     """
     user = await UserService.get_by_id(db, user_id)
     if not user:
@@ -84,7 +90,7 @@ async def get_user(user_id: UUID, request: Request, db: AsyncSession = Depends(g
 # experience by adhering to REST principles and providing self-discoverable operations.
 
 @router.put("/users/{user_id}", response_model=UserResponse, name="update_user", tags=["User Management Requires (Admin or Manager Roles)"])
-async def update_user(user_id: UUID, user_update: UserUpdate, request: Request, db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
+async def update_user(user_id: UUID, user_update: UserUpdate, request: Request, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
     """
     Update user information.
 
@@ -115,7 +121,7 @@ async def update_user(user_id: UUID, user_update: UserUpdate, request: Request,
 
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT, name="delete_user", tags=["User Management Requires (Admin or Manager Roles)"])
-async def delete_user(user_id: UUID, db: AsyncSession = Depends(get_db), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
+async def delete_user(user_id: UUID, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
     """
     Delete a user by their ID.
 
@@ -128,8 +134,37 @@ async def delete_user(user_id: UUID, db: AsyncSession = Depends(get_db), token:
 
 
 
+@router.post("/users/bulk-delete", response_model=UserBulkDeleteResponse, name="bulk_delete_users", tags=["User Management Requires (Admin or Manager Roles)"])
+async def bulk_delete_users(request_body: UserBulkDeleteRequest, response: Response, db: AsyncSession = Depends(get_db), current_user: dict = Depends(require_role(["ADMIN"]))):
+    """
+    Delete many users at once, e.g. to clean up spam sign-ups.
+
+    - **ids**: the users to delete, or
+    - **q** / **role** / **is_professional**: delete every user matching these filters, as in GET /users/.
+
+    Users are deleted in batches of `bulk_delete_batch_size`, each committed on its own; the response
+    lists how many each batch deleted. The caller is never deleted. If a batch fails the request stops
+    there with a 500 whose body still lists the batches already deleted, with `completed` false.
+    """
+    caller = None if isinstance(current_user, ApiKeyPrincipal) else current_user.id
+    batches = []
+    error = None
+    try:
+        async for deleted in UserService.bulk_delete(
+            db, ids=request_body.ids, q=request_body.q, role=request_body.role,
+            is_professional=request_body.is_professional, exclude=caller,
+        ):
+            batches.append(BulkDeleteBatch(batch=len(batches) + 1, deleted=deleted))
+    except SQLAlchemyError:
+        response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        error = f"Batch {len(batches) + 1} failed; no further batches were attempted"
+    return UserBulkDeleteResponse(
+        deleted=sum(batch.deleted for batch in batches), batches=batches, completed=error is None, error=error,
+    )
+
+
 @router.post("/users/", response_model=UserResponse, status_code=status.HTTP_201_CREATED, tags=["User Management Requires (Admin or Manager Roles)"], name="create_user")
-async def create_user(user: UserCreate, request: Request, db: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service), token: str = Depends(oauth2_scheme), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
+async def create_user(user: UserCreate, request: Request, db: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service), current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))):
     """
     Create a new user.
 
@@ -145,13 +180,13 @@ async def create_user(user: UserCreate, request: Request, db: AsyncSession = Dep
     Returns:
     - UserResponse: The newly created user's information along with navigation links.
     """
-    existing_user = await UserService.get_by_email(db, user.email)
-    if existing_user:
+    # The email's unique constraint is checked by the insert itself
+    try:
+        created_user = await UserService.create(db, user.model_dump(), email_service)
+    except EmailAlreadyExistsError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already exists")
-    
-    created_user = await UserService.create(db, user.model_dump(), email_service)
     if not created_user:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to create user")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="User could not be created")
     
     
     return UserResponse.model_construct(
@@ -180,6 +215,10 @@ async def list_users(
     request: Request,
     skip: int = 0,
     limit: int = 10,
+    cursor: str | None = Query(
+        None,
+        description="Opaque next_cursor from a previous page; takes precedence over skip"
+    ),
     q: str | None = Query(
         None,
         description="Search text matching first_name, last_name, email or nickname"
@@ -192,40 +231,72 @@ async def list_users(
         None,
         description="Filter by professional status"
     ),
-    db: AsyncSession = Depends(get_db),
+    include_total: bool = Query(
+        True,
+        description="Set to false to skip computing total"
+    ),
+    total_mode: TotalMode = Query(
+        TotalMode.EXACT,
+        description="exact runs COUNT(*); estimated uses the planner's row estimate; none skips the total"
+    ),
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(require_role(["ADMIN", "MANAGER"]))
 ):
+    after = None
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+
+    # Peek one row past the page to learn whether a next page exists
     users, total_users = await UserService.search_users(
     db,
     q=q,
     role=role,
     is_professional=is_professional,
     skip=skip,
-    limit=limit)
-
+    limit=limit,
+    after=after,
+    include_total=include_total,
+    total_mode=total_mode,
+    peek=True)
+    has_next = len(users) > limit
+    next_cursor = encode_cursor(users[limit - 1].created_at, users[limit - 1].id) if has_next else None
+    is_estimate = include_total and total_mode == TotalMode.ESTIMATED
 
     user_responses = [
-        UserResponse.model_validate(user) for user in users
+        UserResponse.model_validate(user) for user in users[:limit]
     ]
     
-    pagination_links = generate_pagination_links(request, skip, limit, total_users)
+    # An estimated total is not reliable enough to point a "last" link at
+    pagination_links = generate_pagination_links(
+        request, skip, limit, None if is_estimate else total_users,
+        cursor=cursor, next_cursor=next_cursor, has_next=has_next,
+    )
     
     # Construct the final response with pagination details
     return UserListResponse(
         items=user_responses,
         total=total_users,
-        page=skip // limit + 1,
+        total_is_estimate=is_estimate and total_users is not None,
+        page=skip // limit + 1 if cursor is None else None,
         size=len(user_responses),
-        links=pagination_links  # Ensure you have appropriate logic to create these links
+        next_cursor=next_cursor,
+        links=pagination_links
     )
 
 
 @router.post("/register/", response_model=UserResponse, tags=["Login and Registration"])
-async def register(user_data: UserCreate, session: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service)):
-    user = await UserService.register_user(session, user_data.model_dump(), email_service)
+async def register(user_data: UserCreate, request: Request, session: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service)):
+    await enforce_rate_limit(request, "register", user_data.email)
+    try:
+        user = await UserService.register_user(session, user_data.model_dump(), email_service)
+    except EmailAlreadyExistsError:
+        raise HTTPException(status_code=400, detail="Email already exists")
     if user:
         return user
-    raise HTTPException(status_code=400, detail="Email already exists")
+    raise HTTPException(status_code=500, detail="User could not be created")
 
 # @router.post("/login/", response_model=TokenResponse, tags=["Login and Registration"])
 # async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db)):
@@ -234,7 +305,7 @@ async def register(user_data: UserCreate, session: AsyncSession = Depends(get_db
 
 #     user = await UserService.login_user(session, form_data.username, form_data.password)
 #     if user:
-#         access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
+#         access_token_expires = timedelta(minutes=get_settings().access_token_expire_minutes)
 
 #         access_token = create_access_token(
 #            data={"sub": str(user.id), "role": str(user.role.name)},
@@ -245,26 +316,59 @@ async def register(user_data: UserCreate, session: AsyncSession = Depends(get_db
 #     raise HTTPException(status_code=401, detail="Incorrect email or password.")
 
 @router.post("/login/", include_in_schema=False, response_model=TokenResponse, tags=["Login and Registration"])
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db)):
-    if await UserService.is_account_locked(session, form_data.username):
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_db)):
+    await enforce_rate_limit(request, "login", form_data.username)
+    user, locked = await UserService.authenticate(session, form_data.username, form_data.password)
+    if locked:
         raise HTTPException(status_code=400, detail="Account locked due to too many failed login attempts.")
-
-    user = await UserService.login_user(session, form_data.username, form_data.password)
     if user:
-        access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-
-        access_token = create_access_token(
-            data={"sub": str(user.id),"role": str(user.role.name)},
-            expires_delta=access_token_expires)
+        refresh_token = await RefreshTokenService.issue(session, user.id)
+        await session.commit()
         # access_token = create_access_token(
         #     data={"sub": user.email, "role": str(user.role.name)},
         #     expires_delta=access_token_expires
         # )
 
-        return {"access_token": access_token, "token_type": "bearer"}
+        return _token_response(user.id, user.role, user.token_version, refresh_token)
     raise HTTPException(status_code=401, detail="Incorrect email or password.")
 
 
+@router.post("/token/refresh", response_model=TokenResponse, tags=["Login and Registration"])
+async def refresh_access_token(body: RefreshTokenRequest, session: AsyncSession = Depends(get_db)):
+    """
+    Trade a refresh token for a new access token and a new refresh token, without a password.
+
+    Each refresh token works once; reusing one revokes every token descended from the same login.
+    """
+    rotated = await RefreshTokenService.rotate(session, body.refresh_token)
+    if rotated is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired refresh token.", headers={"WWW-Authenticate": "Bearer"})
+    row, refresh_token = rotated
+    return _token_response(row.user_id, row.role, row.token_version, refresh_token)
+
+
+@router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT, tags=["Login and Registration"])
+async def revoke_refresh_token(body: RefreshTokenRequest, session: AsyncSession = Depends(get_db),
+                               access_token: Optional[str] = Depends(optional_oauth2_scheme)):
+    """
+    Log out: the refresh token, and any rotated from the same login, can no longer be used.
+    An access token sent as the bearer token is revoked as well.
+    """
+    claims = decode_token(access_token) if access_token else None
+    if claims and "jti" in claims and "exp" in claims:
+        await TokenRevocationService.revoke_token(
+            session, claims["jti"], UUID(claims["sub"]), datetime.fromtimestamp(claims["exp"], timezone.utc))
+    await RefreshTokenService.revoke(session, body.refresh_token)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+def _token_response(user_id: UUID, role: UserRole, token_version: int, refresh_token: str) -> dict:
+    access_token = create_access_token(
+        data={"sub": str(user_id), "role": str(role.name), "ver": token_version},
+        expires_delta=access_token_lifetime())
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+
 @router.get("/verify-email/{user_id}/{token}", status_code=status.HTTP_200_OK, name="verify_email", tags=["Login and Registration"])
 async def verify_email(user_id: UUID, token: str, db: AsyncSession = Depends(get_db), email_service: EmailService = Depends(get_email_service)):
     """
@@ -297,6 +401,7 @@ async def update_my_profile(
         setattr(current_user, field, val)
     db.add(current_user)
     await db.commit()
+    invalidate_cached_user(current_user.id)
     await db.refresh(current_user)
     return current_user
 
@@ -309,9 +414,13 @@ async def update_my_profile(
 async def upgrade_to_pro(
     user_id: UUID,
     db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Union[User, TokenClaims, ApiKeyPrincipal] = Depends(get_current_principal),
 ):
-    if current_user.role not in (UserRole.ADMIN, UserRole.MANAGER):
+    if isinstance(current_user, ApiKeyPrincipal):
+        allowed = not current_user.scopes.isdisjoint({UserRole.ADMIN.name, UserRole.MANAGER.name})
+    else:
+        allowed = current_user.role in (UserRole.ADMIN, UserRole.MANAGER)
+    if not allowed:
         raise HTTPException(status_code=403, detail="Insufficient privileges")
     user = await db.get(User, user_id)
     if not user:
@@ -320,6 +429,7 @@ async def upgrade_to_pro(
     user.professional_status_updated_at = datetime.utcnow()
     db.add(user)
     await db.commit()
+    invalidate_cached_user(user_id)
     return {"message": "Upgraded to professional status"}
 
 @router.get(
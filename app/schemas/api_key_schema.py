@@ -0,0 +1,39 @@
+from builtins import int, str
+from datetime import datetime
+from typing import FrozenSet, List, Optional
+from uuid import UUID
+from pydantic import BaseModel, Field
+from app.models.user_model import UserRole
+
+class ApiKeyCreate(BaseModel):
+    name: str = Field(..., max_length=100, example="billing-service")
+    scopes: List[UserRole] = Field(..., min_length=1, example=["MANAGER"],
+                                   description="Roles the key may act as in role-restricted endpoints.")
+    expires_at: Optional[datetime] = Field(None, description="Optional expiry; the key never expires when omitted.")
+
+class ApiKeyResponse(BaseModel):
+    id: UUID
+    name: str
+    prefix: str = Field(..., example="3f9a1c0e")
+    scopes: List[str]
+    usage_count: int = 0
+    last_used_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    revoked_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ApiKeyCreatedResponse(ApiKeyResponse):
+    key: str = Field(..., description="The full key. It is shown only once and cannot be recovered.")
+
+class ApiKeyPrincipal(BaseModel):
+    """
+    The caller behind a verified API key. ``scopes`` are role names; ``require_role`` admits the
+    key if any of them is allowed.
+    """
+    id: UUID
+    name: str
+    scopes: FrozenSet[str]
+    expires_at: Optional[datetime] = None
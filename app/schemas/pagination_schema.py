@@ -1,9 +1,16 @@
 import re
 from datetime import datetime
+from enum import Enum
 from typing import List, Optional
 from uuid import UUID
 from pydantic import BaseModel, EmailStr, Field, HttpUrl, validator, conint
 
+class TotalMode(str, Enum):
+    """How a paginated listing computes its total: exact COUNT(*), planner estimate, or not at all."""
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    NONE = "none"
+
 # Pagination Model
 class Pagination(BaseModel):
     page: int = Field(..., description="Current page number.")
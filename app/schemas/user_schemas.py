@@ -7,6 +7,7 @@ from uuid import UUID, uuid4
 import uuid
 import re
 from app.models.user_model import UserRole
+from app.schemas.pagination_schema import PaginationLink
 from app.utils.nickname_gen import generate_nickname
 
 
@@ -83,9 +84,35 @@ class UserListResponse(BaseModel):
         "linkedin_profile_url": "https://linkedin.com/in/johndoe", 
         "github_profile_url": "https://github.com/johndoe"
     }])
-    total: int = Field(..., example=100)
-    page: int = Field(..., example=1)
+    total: Optional[int] = Field(None, example=100, description="Total matching users; null when not requested.")
+    total_is_estimate: bool = Field(False, description="True when total is the planner's estimate rather than an exact count.")
+    page: Optional[int] = Field(None, example=1, description="Page number in skip/limit mode; null when paging by cursor.")
     size: int = Field(..., example=10)
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor for the next page; null on the last page.")
+    links: List[PaginationLink] = []
+
+class UserBulkDeleteRequest(BaseModel):
+    ids: Optional[List[UUID]] = Field(None, max_length=10000, description="Users to delete; give either ids or a filter.")
+    q: Optional[str] = Field(None, example="spam.example", description="Search text, as in GET /users/")
+    role: Optional[UserRole] = Field(None, example="ANONYMOUS")
+    is_professional: Optional[bool] = Field(None, example=False)
+
+    @root_validator(pre=True)
+    def check_ids_or_filter(cls, values):
+        has_filter = any(values.get(name) not in (None, "") for name in ("q", "role", "is_professional"))
+        if (values.get("ids") is not None) == has_filter:
+            raise ValueError("Provide either ids or at least one of q, role and is_professional")
+        return values
+
+class BulkDeleteBatch(BaseModel):
+    batch: int = Field(..., example=1)
+    deleted: int = Field(..., example=500)
+
+class UserBulkDeleteResponse(BaseModel):
+    deleted: int = Field(..., example=1200, description="Users deleted in total.")
+    batches: List[BulkDeleteBatch] = Field(..., description="Users deleted by each batch, in order.")
+    completed: bool = Field(True, description="False when a batch failed; the batches listed are deleted, the rest were not attempted.")
+    error: Optional[str] = Field(None, description="Why the failing batch was not deleted.")
 
 class UserProfileDTO(BaseModel):
     id: UUID = Field(
@@ -0,0 +1,234 @@
+from builtins import BaseException, Exception, dict, frozenset, int, len, list, str
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+from sqlalchemy import BigInteger, DateTime, column, func, or_, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.api_key_model import ApiKey
+from app.models.user_model import UserRole
+from app.schemas.api_key_schema import ApiKeyPrincipal
+from app.utils.ttl_cache import TTLCache
+from settings.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+API_KEY_PREFIX = "umk"
+
+# Principals of keys that already verified, keyed by the key's HMAC digest. Only successes are cached.
+_verified_keys: Optional[TTLCache] = None
+
+def _key_cache() -> TTLCache:
+    global _verified_keys
+    settings = get_settings()
+    if (_verified_keys is None or _verified_keys.maxsize != settings.api_key_cache_size
+            or _verified_keys.ttl != settings.api_key_cache_ttl_seconds):
+        _verified_keys = TTLCache(settings.api_key_cache_size, settings.api_key_cache_ttl_seconds)
+    return _verified_keys
+
+class ApiKeyService:
+    """
+    API keys are ``umk_<prefix>_<secret>`` with 256 random bits of secret, so a keyed SHA-256 is
+    safe to store and checking a key is one lookup on the unique ``prefix`` index plus a
+    constant-time comparison of digests; no bcrypt is involved.
+    """
+    @staticmethod
+    def digest(key: str) -> str:
+        secret = get_settings().api_key_hmac_secret.encode()
+        return hmac.new(secret, key.encode(), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def _prefix_of(key: str) -> Optional[str]:
+        parts = key.split("_", 2)
+        if len(parts) != 3 or parts[0] != API_KEY_PREFIX or not parts[1] or not parts[2]:
+            return None
+        return parts[1]
+
+    @classmethod
+    async def create(cls, session: AsyncSession, name: str, scopes: Sequence[UserRole],
+                     created_by: Optional[UUID] = None, expires_at: Optional[datetime] = None) -> Tuple[ApiKey, str]:
+        """Create a key and return it with its plaintext value, which is not stored anywhere."""
+        prefix = secrets.token_hex(4)
+        key = f"{API_KEY_PREFIX}_{prefix}_{secrets.token_urlsafe(32)}"
+        api_key = ApiKey(
+            name=name, prefix=prefix, key_hash=cls.digest(key), scopes=list(dict.fromkeys(s.name for s in scopes)),
+            created_by=created_by, expires_at=expires_at, usage_count=0,
+        )
+        session.add(api_key)
+        await session.commit()
+        return api_key, key
+
+    @classmethod
+    async def list_keys(cls, session: AsyncSession) -> List[ApiKey]:
+        return (await session.execute(select(ApiKey).order_by(ApiKey.created_at))).scalars().all()
+
+    @classmethod
+    async def revoke(cls, session: AsyncSession, key_id: UUID) -> bool:
+        """
+        Revoke a key. This worker stops accepting it at once; other workers within
+        ``api_key_cache_ttl_seconds``, when their cached verification expires.
+        """
+        row = (await session.execute(
+            update(ApiKey)
+            .where(ApiKey.id == key_id, ApiKey.revoked_at.is_(None))
+            .values(revoked_at=func.now())
+            .returning(ApiKey.id)
+            .execution_options(synchronize_session=False)
+        )).first()
+        await session.commit()
+        # Entries are keyed by digest, which is not stored with the id; revocations are rare
+        _key_cache().clear()
+        return row is not None
+
+    @classmethod
+    async def verify(cls, session: AsyncSession, key: str) -> Optional[ApiKeyPrincipal]:
+        """The principal for ``key``, or None if it is malformed, unknown, revoked or expired."""
+        prefix = cls._prefix_of(key)
+        if prefix is None:
+            return None
+        digest = cls.digest(key)
+        cache = _key_cache()
+        principal = cache.get(digest)
+        if principal is not None:
+            if principal.expires_at is None or datetime.now(timezone.utc) < principal.expires_at:
+                return principal
+            cache.invalidate(digest)
+            return None
+        row = (await session.execute(
+            select(ApiKey.id, ApiKey.name, ApiKey.key_hash, ApiKey.scopes, ApiKey.expires_at)
+            .where(
+                ApiKey.prefix == prefix,
+                ApiKey.revoked_at.is_(None),
+                or_(ApiKey.expires_at.is_(None), ApiKey.expires_at > func.now()),
+            )
+        )).first()
+        if row is None or not hmac.compare_digest(row.key_hash, digest):
+            return None
+        principal = ApiKeyPrincipal(id=row.id, name=row.name, scopes=frozenset(row.scopes), expires_at=row.expires_at)
+        cache.set(digest, principal)
+        return principal
+
+    @classmethod
+    async def authenticate(cls, session: AsyncSession, key: str) -> Optional[ApiKeyPrincipal]:
+        """Verify ``key`` and count the use, through the usage recorder when it is running."""
+        principal = await cls.verify(session, key)
+        if principal is not None and not record_api_key_use(principal.id):
+            await session.execute(
+                update(ApiKey)
+                .where(ApiKey.id == principal.id)
+                .values(usage_count=ApiKey.usage_count + 1, last_used_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        return principal
+
+def api_key_cache_stats() -> dict:
+    return _key_cache().stats()
+
+def clear_api_key_cache():
+    _key_cache().clear()
+
+class ApiKeyUsageRecorder:
+    """
+    Write-behind counters for ``api_keys.usage_count`` and ``last_used_at``.
+
+    Uses are counted in memory and written every ``flush_interval`` seconds as a single
+    ``UPDATE api_keys ... FROM (VALUES ...)``, so a busy key costs one row update per interval
+    rather than one per request. ``stop()`` flushes what is left.
+    """
+    def __init__(self, session_factory, *, flush_interval: float = 10.0):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self._uses: Dict[UUID, int] = {}
+        self._last_used: Dict[UUID, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, key_id: UUID, uses: int = 1, at: Optional[datetime] = None):
+        at = at or datetime.now(timezone.utc)
+        self._uses[key_id] = self._uses.get(key_id, 0) + uses
+        previous = self._last_used.get(key_id)
+        self._last_used[key_id] = at if previous is None or previous < at else previous
+
+    async def flush(self) -> int:
+        """Write every pending counter in one statement; returns the number of keys written."""
+        if not self._uses:
+            return 0
+        uses, self._uses = self._uses, {}
+        last_used, self._last_used = self._last_used, {}
+        rows = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("uses", BigInteger),
+            column("last_used_at", DateTime(timezone=True)),
+            name="key_uses",
+        ).data([(key_id, count, last_used[key_id]) for key_id, count in uses.items()])
+        stmt = (
+            update(ApiKey)
+            .where(ApiKey.id == rows.c.id)
+            .values(
+                usage_count=ApiKey.usage_count + rows.c.uses,
+                last_used_at=func.greatest(ApiKey.last_used_at, rows.c.last_used_at),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            async with self.session_factory() as session:
+                await session.execute(stmt)
+                await session.commit()
+        except BaseException:
+            for key_id, count in uses.items():
+                self.record(key_id, count, last_used[key_id])
+            raise
+        return len(uses)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Flushing API key usage failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush what is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+_usage_recorder: Optional[ApiKeyUsageRecorder] = None
+
+async def start_api_key_usage_recorder(session_factory) -> ApiKeyUsageRecorder:
+    """Start the process-wide usage recorder (idempotent)."""
+    global _usage_recorder
+    if _usage_recorder is None:
+        _usage_recorder = ApiKeyUsageRecorder(session_factory, flush_interval=get_settings().api_key_usage_flush_seconds)
+        _usage_recorder.start()
+    return _usage_recorder
+
+async def stop_api_key_usage_recorder():
+    global _usage_recorder
+    if _usage_recorder is not None:
+        recorder, _usage_recorder = _usage_recorder, None
+        await recorder.stop()
+
+def record_api_key_use(key_id: UUID) -> bool:
+    """Count one use of a key; returns False when no recorder is running and the caller must write it."""
+    if _usage_recorder is None:
+        return False
+    _usage_recorder.record(key_id)
+    return True
@@ -0,0 +1,260 @@
+from builtins import Exception, ValueError, dict, float, int, len, min, str, zip
+import asyncio
+import logging
+from datetime import timedelta
+from typing import List, Optional, Tuple
+from uuid import UUID, uuid4
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.email_outbox_model import EmailOutbox, OutboxStatus
+from app.services.email_service import EmailService
+from settings.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+class EmailOutboxService:
+    @classmethod
+    def enqueue(cls, session: AsyncSession, email_type: str, payload: dict) -> EmailOutbox:
+        """
+        Stage an email on the session; it is written when the caller commits its own transaction,
+        so the message exists if and only if the change that triggered it does.
+        """
+        message = EmailOutbox(email_type=email_type, recipient=payload["email"], payload=payload)
+        session.add(message)
+        return message
+
+    @classmethod
+    def enqueue_statement(cls, email_type: str, payload: dict, source):
+        """
+        An INSERT that queues the email once per row of ``source`` (typically a CTE over an
+        ``INSERT ... RETURNING``), so it can ride along in the statement that made the change.
+        """
+        row = select(
+            literal(uuid4(), EmailOutbox.id.type),
+            literal(email_type, EmailOutbox.email_type.type),
+            literal(payload["email"], EmailOutbox.recipient.type),
+            literal(payload, EmailOutbox.payload.type),
+            literal(OutboxStatus.PENDING, EmailOutbox.status.type),
+            literal(0, EmailOutbox.attempts.type),
+        ).select_from(source)
+        columns = [EmailOutbox.id, EmailOutbox.email_type, EmailOutbox.recipient, EmailOutbox.payload,
+                   EmailOutbox.status, EmailOutbox.attempts]
+        return insert(EmailOutbox).from_select(columns, row)
+
+    @classmethod
+    async def claim_batch(cls, session: AsyncSession, limit: int, lease_seconds: int) -> List[EmailOutbox]:
+        """
+        Atomically claim up to ``limit`` due messages for this worker.
+
+        ``FOR UPDATE SKIP LOCKED`` lets several dispatchers poll the same table without blocking
+        each other. Claimed rows are pushed ``lease_seconds`` into the future so that a worker
+        dying mid-send only delays the message instead of losing it.
+        """
+        due = (
+            select(EmailOutbox.id)
+            .where(
+                EmailOutbox.status.in_([OutboxStatus.PENDING, OutboxStatus.SENDING]),
+                EmailOutbox.next_attempt_at <= func.now(),
+            )
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        stmt = (
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(due.scalar_subquery()))
+            .values(
+                status=OutboxStatus.SENDING,
+                attempts=EmailOutbox.attempts + 1,
+                next_attempt_at=func.now() + timedelta(seconds=lease_seconds),
+            )
+            .returning(EmailOutbox)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(stmt)
+        messages = result.scalars().all()
+        await session.commit()
+        return messages
+
+    @classmethod
+    async def mark_sent(cls, session: AsyncSession, message_ids: List[UUID]):
+        if not message_ids:
+            return
+        await session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(message_ids))
+            .values(status=OutboxStatus.SENT, sent_at=func.now(), last_error=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    async def release(cls, session: AsyncSession, message_ids: List[UUID]):
+        """Hand back claimed messages that were never attempted: due at once, the claim not counted."""
+        if not message_ids:
+            return
+        await session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(message_ids))
+            .values(status=OutboxStatus.PENDING, attempts=EmailOutbox.attempts - 1, next_attempt_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    async def mark_failed(cls, session: AsyncSession, message: EmailOutbox, error: str, max_attempts: int,
+                          backoff_base_seconds: int, backoff_max_seconds: int):
+        """Schedule a retry with exponential backoff, or give up after ``max_attempts``."""
+        values = {"last_error": error[:500]}
+        if message.attempts >= max_attempts:
+            values["status"] = OutboxStatus.FAILED
+            logger.error(f"Giving up on email {message.id} to {message.recipient} after {message.attempts} attempts: {error}")
+        else:
+            delay = min(backoff_base_seconds * 2 ** (message.attempts - 1), backoff_max_seconds)
+            values["status"] = OutboxStatus.PENDING
+            values["next_attempt_at"] = func.now() + timedelta(seconds=delay)
+            logger.warning(f"Email {message.id} to {message.recipient} failed, retrying in {delay}s: {error}")
+        await session.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id == message.id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+class EmailOutboxDispatcher:
+    """
+    Background task that drains the email outbox.
+
+    Each iteration claims a batch, delivers it with at most ``concurrency`` sends in flight and
+    records the outcome. When a batch comes back empty it sleeps for ``poll_interval`` seconds,
+    or until ``wake()`` is called after a new message was committed.
+
+    Outcomes must be recorded before the lease runs out, or another dispatcher claims the batch
+    again and sends it twice. So a send only starts in the first half of the lease and is cut off
+    after ``send_timeout`` (under half the lease) as a failure; messages still waiting for a slot
+    at half time are handed back unattempted.
+    """
+    def __init__(self, session_factory, email_service: EmailService, *, batch_size: int = 50,
+                 concurrency: int = 5, poll_interval: float = 1.0, lease_seconds: int = 60,
+                 send_timeout: float = 20.0, max_attempts: int = 8, backoff_base_seconds: int = 5,
+                 backoff_max_seconds: int = 900):
+        if send_timeout >= lease_seconds / 2:
+            raise ValueError("send_timeout must be less than half of lease_seconds")
+        self.session_factory = session_factory
+        self.email_service = email_service
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.send_timeout = send_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_settings(cls, session_factory, email_service: EmailService) -> "EmailOutboxDispatcher":
+        settings = get_settings()
+        return cls(
+            session_factory,
+            email_service,
+            batch_size=settings.email_outbox_batch_size,
+            concurrency=settings.email_outbox_concurrency,
+            poll_interval=settings.email_outbox_poll_interval_seconds,
+            lease_seconds=settings.email_outbox_lease_seconds,
+            send_timeout=settings.email_outbox_send_timeout_seconds,
+            max_attempts=settings.email_outbox_max_attempts,
+            backoff_base_seconds=settings.email_outbox_backoff_base_seconds,
+            backoff_max_seconds=settings.email_outbox_backoff_max_seconds,
+        )
+
+    async def _deliver(self, semaphore: asyncio.Semaphore, message: EmailOutbox,
+                       start_by: float) -> Optional[Tuple[EmailOutbox, Optional[str]]]:
+        """Send one message; ``None`` if it was not started by ``start_by`` (loop time)."""
+        async with semaphore:
+            if asyncio.get_running_loop().time() > start_by:
+                return None
+            try:
+                await asyncio.wait_for(
+                    self.email_service.send_user_email(message.payload, message.email_type), self.send_timeout)
+                return message, None
+            except asyncio.TimeoutError:
+                return message, f"Send timed out after {self.send_timeout:g}s"
+            except Exception as e:
+                return message, str(e) or e.__class__.__name__
+
+    async def run_once(self) -> int:
+        """Claim and deliver one batch; returns the number of messages attempted."""
+        async with self.session_factory() as session:
+            start_by = asyncio.get_running_loop().time() + self.lease_seconds / 2
+            messages = await EmailOutboxService.claim_batch(session, self.batch_size, self.lease_seconds)
+            if not messages:
+                return 0
+            semaphore = asyncio.Semaphore(self.concurrency)
+            outcomes = await asyncio.gather(*(self._deliver(semaphore, m, start_by) for m in messages))
+            results = [outcome for outcome in outcomes if outcome is not None]
+            await EmailOutboxService.release(session, [m.id for m, outcome in zip(messages, outcomes) if outcome is None])
+            await EmailOutboxService.mark_sent(session, [m.id for m, error in results if error is None])
+            for message, error in results:
+                if error is not None:
+                    await EmailOutboxService.mark_failed(
+                        session, message, error, self.max_attempts,
+                        self.backoff_base_seconds, self.backoff_max_seconds,
+                    )
+            await session.commit()
+            return len(results)
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Email outbox dispatch failed: {e}")
+                processed = 0
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def wake(self):
+        """Ask the dispatcher to poll now instead of waiting for the next interval."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+_dispatcher: Optional[EmailOutboxDispatcher] = None
+
+async def start_email_dispatcher(session_factory, email_service: EmailService) -> EmailOutboxDispatcher:
+    """Start the process-wide dispatcher (idempotent)."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = EmailOutboxDispatcher.from_settings(session_factory, email_service)
+        _dispatcher.start()
+    return _dispatcher
+
+async def stop_email_dispatcher():
+    global _dispatcher
+    if _dispatcher is not None:
+        await _dispatcher.stop()
+        _dispatcher = None
+
+def wake_email_dispatcher():
+    """Nudge the dispatcher after committing new outbox rows; a no-op when it is not running."""
+    if _dispatcher is not None:
+        _dispatcher.wake()
@@ -1,17 +1,22 @@
 # email_service.py
 from builtins import ValueError, dict, str
-from settings.config import settings
+from settings.config import get_settings
 from app.utils.smtp_connection import SMTPClient
 from app.utils.template_manager import TemplateManager
 from app.models.user_model import User
 
 class EmailService:
     def __init__(self, template_manager: TemplateManager):
+        settings = get_settings()
         self.smtp_client = SMTPClient(
             server=settings.smtp_server,
             port=settings.smtp_port,
             username=settings.smtp_username,
-            password=settings.smtp_password
+            password=settings.smtp_password,
+            use_tls=settings.smtp_use_tls,
+            pool_size=settings.smtp_pool_size,
+            keepalive_seconds=settings.smtp_keepalive_seconds,
+            timeout=settings.smtp_timeout_seconds
         )
         self.template_manager = template_manager
 
@@ -26,12 +31,20 @@ class EmailService:
             raise ValueError("Invalid email type")
 
         html_content = self.template_manager.render_template(email_type, **user_data)
-        self.smtp_client.send_email(subject_map[email_type], html_content, user_data['email'])
+        await self.smtp_client.send_email_async(subject_map[email_type], html_content, user_data['email'])
 
-    async def send_verification_email(self, user: User):
-        verification_url = f"{settings.server_base_url}verify-email/{user.id}/{user.verification_token}"
-        await self.send_user_email({
+    def verification_email_payload(self, user: User) -> dict:
+        """Template context for a user's verification email, as sent now or queued in the outbox."""
+        verification_url = f"{get_settings().server_base_url}verify-email/{user.id}/{user.verification_token}"
+        return {
             "name": user.first_name,
             "verification_url": verification_url,
             "email": user.email
-        }, 'email_verification')
\ No newline at end of file
+        }
+
+    async def send_verification_email(self, user: User):
+        await self.send_user_email(self.verification_email_payload(user), 'email_verification')
+
+    def close(self):
+        """Release pooled SMTP connections."""
+        self.smtp_client.close()
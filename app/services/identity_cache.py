@@ -0,0 +1,157 @@
+from builtins import Exception, dict, float, int, str
+import asyncio
+import logging
+from types import MappingProxyType
+from typing import Mapping, Optional
+from uuid import UUID
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.models.user_model import USERS_CHANGED_CHANNEL, User
+from app.utils.ttl_cache import TTLCache
+from settings.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = tuple(attr.key for attr in inspect(User).column_attrs)
+
+class UserIdentityCache:
+    """
+    Per-process cache of read-only ``User`` snapshots for ``get_current_user``.
+
+    A snapshot is the row's column values. ``load`` turns a hit back into a ``User`` attached to
+    the request's session without a query, so handlers that modify and commit it still work.
+
+    Entries are dropped by ``invalidate`` right after a local change commits, and in every worker
+    by a ``LISTEN`` on ``USERS_CHANGED_CHANNEL``, which a trigger on ``users`` notifies when a row
+    is updated or deleted. Nothing is cached while the listener is not connected, and the cache is
+    cleared whenever it (re)connects, so a missed notification can never leave a stale entry
+    behind; ``ttl`` additionally bounds the staleness of the login bookkeeping columns that the
+    trigger ignores.
+    """
+    def __init__(self, engine: AsyncEngine, *, maxsize: int = 10000, ttl: float = 30.0,
+                 reconnect_delay: float = 1.0):
+        self.engine = engine
+        self.cache: TTLCache[Mapping] = TTLCache(maxsize, ttl)
+        self.reconnect_delay = reconnect_delay
+        self.listening = asyncio.Event()
+        # Bumped on every invalidation; a load that saw it change must not store what it read
+        self._epoch = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, engine: AsyncEngine) -> "UserIdentityCache":
+        settings = get_settings()
+        return cls(engine, maxsize=settings.identity_cache_max_size, ttl=settings.identity_cache_ttl_seconds)
+
+    def get(self, user_id: UUID) -> Optional[Mapping]:
+        if not self.listening.is_set():
+            return None
+        return self.cache.get(user_id)
+
+    def put(self, user: User, epoch: Optional[int] = None):
+        """Store a snapshot of a fully loaded user, unless an invalidation happened since ``epoch``."""
+        if not self.listening.is_set() or (epoch is not None and epoch != self._epoch):
+            return
+        if inspect(user).unloaded:
+            return
+        self.cache.set(user.id, MappingProxyType({key: getattr(user, key) for key in _COLUMNS}))
+
+    def invalidate(self, user_id: UUID):
+        self._epoch += 1
+        self.cache.invalidate(user_id)
+
+    def clear(self):
+        self._epoch += 1
+        self.cache.clear()
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+    async def load(self, session: AsyncSession, user_id: UUID) -> Optional[User]:
+        """The user with ``user_id`` in ``session``, from the cache when possible."""
+        snapshot = self.get(user_id)
+        if snapshot is not None:
+            user = User(**snapshot)
+            make_transient_to_detached(user)
+            return await session.merge(user, load=False)
+        epoch = self._epoch
+        user = await session.get(User, user_id)
+        if user is not None:
+            self.put(user, epoch)
+        return user
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self.invalidate(UUID(payload))
+        except ValueError:
+            self.clear()
+
+    async def _listen(self):
+        async with self.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            terminated = asyncio.Event()
+            driver.add_termination_listener(lambda _: terminated.set())
+            try:
+                await driver.add_listener(USERS_CHANGED_CHANNEL, self._on_notify)
+                # Whatever changed while we were not listening is unknown
+                self.clear()
+                self.listening.set()
+                await terminated.wait()
+            finally:
+                self.listening.clear()
+                self.clear()
+                # Never hand a connection with a LISTEN on it back to the pool
+                await conn.invalidate()
+
+    async def _run(self):
+        while True:
+            try:
+                await self._listen()
+                logger.warning("Identity cache listener connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Identity cache listener failed: {e}")
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.listening.clear()
+        self.clear()
+
+_identity_cache: Optional[UserIdentityCache] = None
+
+async def start_identity_cache(engine: AsyncEngine) -> UserIdentityCache:
+    """Start the process-wide identity cache and its listener (idempotent)."""
+    global _identity_cache
+    if _identity_cache is None:
+        _identity_cache = UserIdentityCache.from_settings(engine)
+        _identity_cache.start()
+    return _identity_cache
+
+async def stop_identity_cache():
+    global _identity_cache
+    if _identity_cache is not None:
+        cache, _identity_cache = _identity_cache, None
+        logger.info(f"Identity cache stats at shutdown: {cache.stats()}")
+        await cache.stop()
+
+def get_identity_cache() -> Optional[UserIdentityCache]:
+    return _identity_cache
+
+def invalidate_cached_user(user_id: UUID):
+    """Drop this worker's copy of a user after committing a change to it; a no-op when the cache is off."""
+    if _identity_cache is not None:
+        _identity_cache.invalidate(user_id)
@@ -1,11 +1,31 @@
 # app/services/jwt_service.py
-from builtins import dict, str
+from builtins import dict, float, int, str
+import hashlib
+import time
 import jwt
 from datetime import datetime, timedelta
-from settings.config import settings
+from typing import Optional
+from uuid import uuid4
+from app.utils.ttl_cache import TTLCache
+from settings.config import get_settings
+
+# Payloads of tokens that already passed jwt.decode, keyed by (sha256 of the token, secret, algorithm)
+# so rotating the key makes every old entry unreachable. Only successful decodes are cached.
+_verified_tokens: Optional[TTLCache] = None
+
+def access_token_lifetime() -> timedelta:
+    """How long a newly issued access token is valid; shorter while role claims are trusted without a lookup."""
+    settings = get_settings()
+    if settings.auth_trust_token_claims:
+        return timedelta(minutes=settings.claims_access_token_expire_minutes)
+    return timedelta(minutes=settings.access_token_expire_minutes)
 
 def create_access_token(*, data: dict, expires_delta: timedelta = None):
+    settings = get_settings()
     to_encode = data.copy()
+    # jti names the token for revocation; a fractional iat orders it against revocation watermarks
+    to_encode.setdefault("jti", uuid4().hex)
+    to_encode.setdefault("iat", time.time())
     # Convert role to uppercase before encoding the JWT
     if 'role' in to_encode:
         to_encode['role'] = to_encode['role'].upper()
@@ -14,9 +34,45 @@ def create_access_token(*, data: dict, expires_delta: timedelta = None):
     encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
     return encoded_jwt
 
+def _token_cache(settings) -> TTLCache:
+    global _verified_tokens
+    if (_verified_tokens is None or _verified_tokens.maxsize != settings.jwt_verify_cache_size
+            or _verified_tokens.ttl != settings.jwt_verify_cache_ttl_seconds):
+        _verified_tokens = TTLCache(settings.jwt_verify_cache_size, settings.jwt_verify_cache_ttl_seconds)
+    return _verified_tokens
+
 def decode_token(token: str):
+    """
+    Verify ``token`` and return its payload, or None if it is invalid or expired.
+
+    Clients send the same bearer token many times, so verified payloads are cached. A hit is
+    re-checked against ``exp`` on the wall clock, exactly as ``jwt.decode`` would, so a cached
+    token stops working the moment it expires. Tokens with ``nbf`` are always fully decoded.
+    """
+    settings = get_settings()
+    cache = _token_cache(settings)
+    key = (hashlib.sha256(token.encode()).digest(), settings.jwt_secret_key, settings.jwt_algorithm)
+    payload = cache.get(key)
+    if payload is not None:
+        if "exp" not in payload or time.time() < payload["exp"]:
+            return dict(payload)
+        cache.invalidate(key)
+        return None
     try:
         decoded = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
-        return decoded
     except jwt.PyJWTError:
         return None
+    if "nbf" not in decoded:
+        expires_at = None
+        if "exp" in decoded:
+            expires_at = time.monotonic() + (float(decoded["exp"]) - time.time())
+        cache.set(key, dict(decoded), expires_at=expires_at)
+    return decoded
+
+def token_cache_stats() -> dict:
+    """Hit/miss counters of the verified-token cache, for sizing ``jwt_verify_cache_size``."""
+    return _token_cache(get_settings()).stats()
+
+def clear_token_cache():
+    if _verified_tokens is not None:
+        _verified_tokens.clear()
@@ -0,0 +1,134 @@
+from builtins import BaseException, Exception, dict, int, len, list, max
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from uuid import UUID
+from sqlalchemy import DateTime, column, or_, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from app.models.user_model import User
+from settings.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+class LastLoginRecorder:
+    """
+    Write-behind buffer for ``users.last_login_at``.
+
+    Successful logins only record ``user_id -> timestamp`` in memory; repeated logins by the same
+    user coalesce to the newest one. A background task writes the buffer at least every
+    ``max_staleness`` seconds, or sooner once ``max_pending`` users are waiting, as a single
+    ``UPDATE users ... FROM (VALUES ...)``. ``stop()`` flushes whatever is left, so only a crashed
+    worker can lose timestamps, and then at most ``max_staleness`` seconds' worth.
+    """
+    def __init__(self, session_factory, *, max_staleness: float = 5.0, max_pending: int = 1000):
+        self.session_factory = session_factory
+        self.max_staleness = max_staleness
+        self.max_pending = max_pending
+        self._pending: Dict[UUID, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_settings(cls, session_factory) -> "LastLoginRecorder":
+        settings = get_settings()
+        return cls(
+            session_factory,
+            max_staleness=settings.last_login_max_staleness_seconds,
+            max_pending=settings.last_login_max_pending,
+        )
+
+    def record(self, user_id: UUID, at: Optional[datetime] = None):
+        at = at or datetime.now(timezone.utc)
+        previous = self._pending.get(user_id)
+        self._pending[user_id] = at if previous is None else max(previous, at)
+        if len(self._pending) >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        """Write every buffered timestamp in one statement; returns the number of users written."""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        rows = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("last_login_at", DateTime(timezone=True)),
+            name="logins",
+        ).data(list(batch.items()))
+        stmt = (
+            update(User)
+            .where(
+                User.id == rows.c.id,
+                # Never move a timestamp backwards, e.g. when another worker flushed a newer one first
+                or_(User.last_login_at.is_(None), User.last_login_at < rows.c.last_login_at),
+            )
+            .values(last_login_at=rows.c.last_login_at)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            async with self.session_factory() as session:
+                await session.execute(stmt)
+                await session.commit()
+        except BaseException:
+            # Put the batch back (keeping anything newer recorded meanwhile) so the next flush,
+            # or the one in stop() when this was a cancellation, writes it
+            for user_id, at in batch.items():
+                self.record(user_id, at)
+            raise
+        return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_staleness)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Flushing last_login_at updates failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush what is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+_recorder: Optional[LastLoginRecorder] = None
+
+async def start_last_login_recorder(session_factory) -> LastLoginRecorder:
+    """Start the process-wide recorder (idempotent)."""
+    global _recorder
+    if _recorder is None:
+        _recorder = LastLoginRecorder.from_settings(session_factory)
+        _recorder.start()
+    return _recorder
+
+async def stop_last_login_recorder():
+    global _recorder
+    if _recorder is not None:
+        recorder, _recorder = _recorder, None
+        await recorder.stop()
+
+def last_login_recorder_running() -> bool:
+    return _recorder is not None
+
+def record_last_login(user_id: UUID) -> bool:
+    """Buffer a successful login; returns False when no recorder is running and the caller must write it."""
+    if _recorder is None:
+        return False
+    _recorder.record(user_id)
+    return True
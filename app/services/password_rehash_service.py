@@ -0,0 +1,70 @@
+from builtins import Exception, bool, set, str
+import asyncio
+import logging
+from typing import Optional, Set
+from uuid import UUID
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import Database
+from app.models.user_model import User
+from app.services.identity_cache import invalidate_cached_user
+from app.utils.security import PasswordHashingBusyError, hash_password_async, needs_rehash
+from settings.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+class PasswordRehashService:
+    @classmethod
+    async def rehash(cls, session: AsyncSession, user_id: UUID, old_hash: str, password: str) -> bool:
+        """
+        Replace ``old_hash`` with a hash at the current cost. The write only lands if the stored
+        hash is still ``old_hash``, so a password changed in the meantime is never overwritten.
+        """
+        new_hash = await hash_password_async(password)
+        row = (await session.execute(
+            update(User)
+            .where(User.id == user_id, User.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )).first()
+        await session.commit()
+        if row is None:
+            return False
+        invalidate_cached_user(user_id)
+        return True
+
+# Rehashes still running, and the users they are for, so a burst of logins starts only one each
+_tasks: Set[asyncio.Task] = set()
+_in_flight: Set[UUID] = set()
+
+async def _rehash_in_background(session_factory, user_id: UUID, old_hash: str, password: str):
+    try:
+        async with session_factory() as session:
+            await PasswordRehashService.rehash(session, user_id, old_hash, password)
+    except PasswordHashingBusyError:
+        logger.info(f"Password hashing pool busy, rehash of user {user_id} left for a later login")
+    except Exception as e:
+        logger.error(f"Rehashing the password of user {user_id} failed: {e}")
+    finally:
+        _in_flight.discard(user_id)
+
+def schedule_password_rehash(user_id: UUID, old_hash: str, password: str) -> Optional[asyncio.Task]:
+    """
+    After a successful login, rehash the password in the background if its cost differs from
+    ``password_hash_rounds``. The login itself never waits for it.
+    """
+    if not get_settings().password_rehash_on_login or not needs_rehash(old_hash) or user_id in _in_flight:
+        return None
+    _in_flight.add(user_id)
+    task = asyncio.create_task(
+        _rehash_in_background(Database.get_session_factory(), user_id, old_hash, password)
+    )
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+async def drain_password_rehashes():
+    """Wait for the rehashes still running; called at shutdown before the hashing pool goes away."""
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
@@ -0,0 +1,115 @@
+from builtins import object, str
+import hashlib
+import secrets
+from datetime import timedelta
+from typing import Optional, Tuple
+from uuid import UUID, uuid4
+from sqlalchemy import func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.refresh_token_model import RefreshToken
+from app.models.user_model import User
+from settings.config import get_settings
+
+class RefreshTokenService:
+    """
+    Opaque, rotating refresh tokens.
+
+    A refresh token is 256 random bits, so a single SHA-256 is enough to store it safely and
+    looking one up is an indexed equality match: renewing a session never runs bcrypt.
+    """
+    @staticmethod
+    def hash_token(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def _lifetime() -> timedelta:
+        return timedelta(minutes=get_settings().refresh_token_expire_minutes)
+
+    @classmethod
+    async def issue(cls, session: AsyncSession, user_id: UUID, family_id: Optional[UUID] = None) -> str:
+        """Stage a new refresh token for ``user_id`` and return its value; the caller commits."""
+        token = secrets.token_urlsafe(32)
+        await session.execute(
+            insert(RefreshToken).values(
+                id=uuid4(),
+                user_id=user_id,
+                family_id=family_id or uuid4(),
+                token_hash=cls.hash_token(token),
+                expires_at=func.now() + cls._lifetime(),
+            )
+        )
+        return token
+
+    @classmethod
+    async def rotate(cls, session: AsyncSession, token: str) -> Optional[Tuple[object, str]]:
+        """
+        Exchange a refresh token for its successor in one statement.
+
+        Returns ``(row, new_token)`` where ``row`` has the user's ``user_id``, ``role`` and
+        ``token_version``, or None when the token is unknown, expired, revoked or its user is
+        locked. A token that was already rotated is a replay, so its whole family is revoked.
+        """
+        token_hash = cls.hash_token(token)
+        new_token = secrets.token_urlsafe(32)
+        rotated = (
+            update(RefreshToken)
+            .where(
+                RefreshToken.token_hash == token_hash,
+                RefreshToken.revoked_at.is_(None),
+                RefreshToken.expires_at > func.now(),
+                User.id == RefreshToken.user_id,
+                User.is_locked.is_(False),
+            )
+            .values(revoked_at=func.now())
+            .returning(RefreshToken.user_id, RefreshToken.family_id, User.role, User.token_version)
+            .cte("rotated")
+        )
+        successor = insert(RefreshToken).from_select(
+            [RefreshToken.id, RefreshToken.user_id, RefreshToken.family_id, RefreshToken.token_hash,
+             RefreshToken.expires_at],
+            select(
+                literal(uuid4(), RefreshToken.id.type),
+                rotated.c.user_id,
+                rotated.c.family_id,
+                literal(cls.hash_token(new_token), RefreshToken.token_hash.type),
+                func.now() + cls._lifetime(),
+            ),
+        ).cte("successor")
+        stmt = select(rotated.c.user_id, rotated.c.role, rotated.c.token_version).add_cte(successor)
+        row = (await session.execute(stmt)).first()
+        if row is None:
+            replayed = (
+                select(RefreshToken.family_id)
+                .where(RefreshToken.token_hash == token_hash, RefreshToken.revoked_at.is_not(None))
+                .scalar_subquery()
+            )
+            await cls._revoke_where(session, RefreshToken.family_id == replayed)
+            await session.commit()
+            return None
+        await session.commit()
+        return row, new_token
+
+    @classmethod
+    async def _revoke_where(cls, session: AsyncSession, *criteria):
+        await session.execute(
+            update(RefreshToken)
+            .where(*criteria, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+    @classmethod
+    async def revoke(cls, session: AsyncSession, token: str):
+        """Log out: revoke the token and every token rotated from the same login."""
+        family = (
+            select(RefreshToken.family_id)
+            .where(RefreshToken.token_hash == cls.hash_token(token))
+            .scalar_subquery()
+        )
+        await cls._revoke_where(session, RefreshToken.family_id == family)
+        await session.commit()
+
+    @classmethod
+    async def revoke_all_for_user(cls, session: AsyncSession, user_id: UUID):
+        """Stage the revocation of every refresh token of ``user_id``; the caller commits."""
+        await cls._revoke_where(session, RefreshToken.user_id == user_id)
@@ -0,0 +1,297 @@
+from builtins import Exception, bool, dict, float, int, len, list, max, set, str
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+from sqlalchemy import DateTime, delete, event, func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.token_revocation_model import RevokedToken, TokenWatermark
+from app.utils.bloom_filter import BloomFilter
+from settings.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Revocations staged in a session, applied to this worker's list once the session commits
+_PENDING = "pending_revocations"
+# Rows are stamped with their transaction's start time, so one that commits after a load can
+# carry a time before it: incremental loads look back this far to pick those up
+_LOAD_OVERLAP = timedelta(seconds=30)
+# pg_try_advisory_xact_lock key held while pruning, so one worker at a time does it
+_PRUNE_LOCK_KEY = 0x746F6B72
+
+class RevocationList:
+    """
+    This worker's copy of the revocation store, answering ``is_revoked`` without a query.
+
+    Revoked ``jti`` values go into a Bloom filter backed by an exact set: almost every token is not
+    revoked and is turned away by the filter, and the rare filter positive is settled by the set.
+    Per-user watermarks are a dict of ``user_id -> revoked_before`` (as a Unix timestamp).
+
+    ``replace`` swaps in a fresh copy loaded from Postgres; revocations made in this worker while
+    that load was running are re-applied on top so they are not lost. ``merge`` adds what an
+    incremental load found.
+    """
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        self._revoked: Set[str] = set()
+        self._watermarks: Dict[UUID, float] = {}
+        self._recent_tokens: List[str] = []
+        self._recent_watermarks: List[Tuple[UUID, float]] = []
+        self._loading = False
+        self.checks = 0
+        self.filter_positives = 0
+
+    def add_token(self, jti: str):
+        self._filter.add(jti)
+        self._revoked.add(jti)
+        if self._loading:
+            self._recent_tokens.append(jti)
+
+    def add_watermark(self, user_id: UUID, revoked_before: float):
+        self._watermarks[user_id] = max(revoked_before, self._watermarks.get(user_id, revoked_before))
+        if self._loading:
+            self._recent_watermarks.append((user_id, revoked_before))
+
+    def is_revoked(self, jti: Optional[str], user_id: UUID, issued_at: Optional[float]) -> bool:
+        self.checks += 1
+        watermark = self._watermarks.get(user_id)
+        if watermark is not None and (issued_at is None or issued_at < watermark):
+            return True
+        if jti is None or jti not in self._filter:
+            return False
+        self.filter_positives += 1
+        return jti in self._revoked
+
+    def begin_load(self):
+        """Mark the start of a full load from Postgres; see ``replace``."""
+        self._recent_tokens.clear()
+        self._recent_watermarks.clear()
+        self._loading = True
+
+    def replace(self, jtis: Iterable[str], watermarks: Dict[UUID, float]):
+        revoked = set(jtis)
+        recent_tokens, recent_watermarks = list(self._recent_tokens), list(self._recent_watermarks)
+        self._filter = BloomFilter.from_items(revoked, max(self.capacity, 2 * len(revoked)), self.error_rate)
+        self._revoked = revoked
+        self._watermarks = dict(watermarks)
+        self._loading = False
+        self._recent_tokens.clear()
+        self._recent_watermarks.clear()
+        self.merge(recent_tokens, recent_watermarks)
+
+    def merge(self, jtis: Iterable[str], watermarks: Iterable[Tuple[UUID, float]]):
+        for jti in jtis:
+            self.add_token(jti)
+        for user_id, revoked_before in watermarks:
+            self.add_watermark(user_id, revoked_before)
+
+    def stats(self) -> dict:
+        return {
+            "revoked_tokens": len(self._revoked),
+            "watermarks": len(self._watermarks),
+            "filter_bits": self._filter.size,
+            "checks": self.checks,
+            "filter_positives": self.filter_positives,
+        }
+
+def _pending(session: AsyncSession) -> dict:
+    return session.info.setdefault(_PENDING, {"tokens": [], "watermarks": []})
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_revocations(session: Session):
+    pending = session.info.pop(_PENDING, None)
+    if pending is not None:
+        get_revocation_list().merge(pending["tokens"], pending["watermarks"])
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_revocations(session: Session, transaction):
+    # Reached after a commit has applied them too; otherwise the transaction was rolled back
+    if transaction.parent is None:
+        session.info.pop(_PENDING, None)
+
+class TokenRevocationService:
+    @classmethod
+    def _max_token_lifetime(cls) -> timedelta:
+        settings = get_settings()
+        return timedelta(minutes=max(settings.access_token_expire_minutes, settings.claims_access_token_expire_minutes))
+
+    @classmethod
+    async def revoke_token(cls, session: AsyncSession, jti: str, user_id: Optional[UUID], expires_at: datetime):
+        """
+        Stage the revocation of one access token; the caller commits. Takes effect in this worker
+        when the session commits, and in the others at their next sync.
+        """
+        await session.execute(
+            pg_insert(RevokedToken)
+            .values(jti=jti, user_id=user_id, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+        )
+        _pending(session)["tokens"].append(jti)
+
+    @classmethod
+    def _upsert_watermarks(cls, stmt):
+        """A watermark only ever moves forward, and so does its expiry."""
+        return stmt.on_conflict_do_update(
+            index_elements=[TokenWatermark.user_id],
+            set_={
+                "revoked_before": func.greatest(TokenWatermark.revoked_before, stmt.excluded.revoked_before),
+                "expires_at": func.greatest(TokenWatermark.expires_at, stmt.excluded.expires_at),
+                "updated_at": func.now(),
+            },
+        )
+
+    @classmethod
+    async def revoke_user_tokens(cls, session: AsyncSession, user_id: UUID, at: Optional[datetime] = None):
+        """
+        Stage a watermark revoking every access token of ``user_id`` issued before ``at`` (default now);
+        the caller commits. Takes effect in this worker when the session commits, and in the others
+        at their next sync.
+        """
+        at = at or datetime.now(timezone.utc)
+        stmt = pg_insert(TokenWatermark).values(
+            user_id=user_id, revoked_before=at, expires_at=at + cls._max_token_lifetime(),
+        )
+        await session.execute(cls._upsert_watermarks(stmt))
+        _pending(session)["watermarks"].append((user_id, at.timestamp()))
+
+    @classmethod
+    async def revoke_tokens_of(cls, session: AsyncSession, users, at: Optional[datetime] = None) -> List[UUID]:
+        """
+        Like ``revoke_user_tokens`` for every row of ``users``, a subquery or CTE with an ``id``
+        column, in one statement; returns the ids. With a ``DELETE ... RETURNING id`` CTE the
+        rows are deleted and their tokens revoked in a single round trip.
+        """
+        at = at or datetime.now(timezone.utc)
+        rows = select(
+            users.c.id,
+            literal(at, DateTime(timezone=True)),
+            literal(at + cls._max_token_lifetime(), DateTime(timezone=True)),
+        )
+        stmt = pg_insert(TokenWatermark).from_select(["user_id", "revoked_before", "expires_at"], rows)
+        user_ids = (await session.execute(cls._upsert_watermarks(stmt).returning(TokenWatermark.user_id))).scalars().all()
+        _pending(session)["watermarks"].extend((user_id, at.timestamp()) for user_id in user_ids)
+        return user_ids
+
+    @classmethod
+    async def prune(cls, session: AsyncSession) -> bool:
+        """
+        Delete entries that can no longer matter, unless another worker is already doing so; the
+        caller commits. Returns whether this worker pruned.
+        """
+        if not (await session.execute(select(func.pg_try_advisory_xact_lock(_PRUNE_LOCK_KEY)))).scalar():
+            return False
+        await session.execute(delete(RevokedToken).where(RevokedToken.expires_at < func.now()))
+        await session.execute(delete(TokenWatermark).where(TokenWatermark.expires_at < func.now()))
+        return True
+
+    @classmethod
+    async def load(cls, session: AsyncSession, since: Optional[datetime] = None
+                   ) -> Tuple[List[str], Dict[UUID, float], datetime]:
+        """
+        Return what is still revoked and the database time of the load. With ``since``, the time
+        of an earlier load, only what was revoked from about then on.
+        """
+        loaded_at = (await session.execute(select(func.now()))).scalar()
+        jtis = select(RevokedToken.jti).where(RevokedToken.expires_at > loaded_at)
+        watermarks = select(TokenWatermark.user_id, TokenWatermark.revoked_before).where(
+            TokenWatermark.expires_at > loaded_at)
+        if since is not None:
+            jtis = jtis.where(RevokedToken.created_at > since - _LOAD_OVERLAP)
+            watermarks = watermarks.where(TokenWatermark.updated_at > since - _LOAD_OVERLAP)
+        rows = (await session.execute(watermarks)).all()
+        return (
+            (await session.execute(jtis)).scalars().all(),
+            {row.user_id: row.revoked_before.timestamp() for row in rows},
+            loaded_at,
+        )
+
+class TokenRevocationSync:
+    """
+    Background task keeping the worker's ``RevocationList`` in step with Postgres. Every ``interval``
+    seconds it loads what was revoked since its previous sync; every ``full_interval`` seconds it
+    reloads everything instead, which drops expired entries, and prunes them from the tables if no
+    other worker is at it.
+    """
+    def __init__(self, session_factory, revocations: RevocationList, interval: float = 5.0,
+                 full_interval: float = 300.0):
+        self.session_factory = session_factory
+        self.revocations = revocations
+        self.interval = interval
+        self.full_interval = full_interval
+        self._loaded_at: Optional[datetime] = None
+        self._full_loaded_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def sync_once(self, full: bool = False):
+        full = full or self._loaded_at is None or time.monotonic() - self._full_loaded_at >= self.full_interval
+        if full:
+            self.revocations.begin_load()
+        async with self.session_factory() as session:
+            if full:
+                await TokenRevocationService.prune(session)
+            jtis, watermarks, loaded_at = await TokenRevocationService.load(session, None if full else self._loaded_at)
+            await session.commit()
+        if full:
+            self.revocations.replace(jtis, watermarks)
+            self._full_loaded_at = time.monotonic()
+        else:
+            self.revocations.merge(jtis, watermarks.items())
+        self._loaded_at = loaded_at
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sync_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Token revocation sync failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+_revocations: Optional[RevocationList] = None
+_sync: Optional[TokenRevocationSync] = None
+
+def get_revocation_list() -> RevocationList:
+    global _revocations
+    if _revocations is None:
+        settings = get_settings()
+        _revocations = RevocationList(settings.token_revocation_filter_capacity, settings.token_revocation_filter_error_rate)
+    return _revocations
+
+async def start_token_revocation_sync(session_factory) -> TokenRevocationSync:
+    """Start the process-wide revocation sync (idempotent)."""
+    global _sync
+    if _sync is None:
+        settings = get_settings()
+        _sync = TokenRevocationSync(session_factory, get_revocation_list(), settings.token_revocation_sync_seconds,
+                                    settings.token_revocation_full_sync_seconds)
+        _sync.start()
+    return _sync
+
+async def stop_token_revocation_sync():
+    global _sync
+    if _sync is not None:
+        sync, _sync = _sync, None
+        await sync.stop()
+
+def is_token_revoked(jti: Optional[str], user_id: UUID, issued_at: Optional[float]) -> bool:
+    return get_revocation_list().is_revoked(jti, user_id, issued_at)
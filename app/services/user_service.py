@@ -1,24 +1,51 @@
-from builtins import Exception, bool, classmethod, int, str
+from builtins import Exception, bool, classmethod, dict, enumerate, int, len, list, max, range, str
 from datetime import datetime, timezone
+import itertools
 import secrets
-from typing import Optional, Dict, List, Tuple
+from typing import AsyncIterator, Optional, Dict, List, Tuple
 from pydantic import ValidationError
-from sqlalchemy import func, null, update, select, or_
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import case, delete, func, insert, literal, null, update, select, or_, text, tuple_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased, load_only
+from sqlalchemy.orm.attributes import set_committed_value
 from app.dependencies import get_email_service, get_settings
-from app.models.user_model import User
+from app.models.user_model import User, nickname_sequence
+from app.schemas.pagination_schema import TotalMode
 from app.schemas.user_schemas import UserCreate, UserUpdate
-from app.utils.nickname_gen import generate_nickname
-from app.utils.security import generate_verification_token, hash_password, verify_password
-from uuid import UUID
+from app.utils.nickname_gen import NicknameAllocator
+from app.utils.security import generate_verification_token, hash_password_async, verify_password_async
+from uuid import UUID, uuid4
 from app.services.email_service import EmailService
+from app.services.email_outbox_service import EmailOutboxService, wake_email_dispatcher
+from app.services.identity_cache import invalidate_cached_user
+from app.services.login_activity_service import last_login_recorder_running, record_last_login
+from app.services.password_rehash_service import schedule_password_rehash
+from app.services.refresh_token_service import RefreshTokenService
+from app.services.token_revocation_service import TokenRevocationService
 from app.models.user_model import UserRole
 import logging
 
-settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Retries when an allocated nickname collides with one a user picked for themselves
+_MAX_NICKNAME_ATTEMPTS = 5
+
+_nickname_allocator: Optional[NicknameAllocator] = None
+
+class EmailAlreadyExistsError(Exception):
+    """Raised by ``UserService.create`` when the email is already registered."""
+    def __init__(self, email: str):
+        super().__init__(f"A user with email {email} already exists")
+        self.email = email
+
+def get_nickname_allocator() -> NicknameAllocator:
+    """Process-wide nickname allocator; the word lists are loaded on first use."""
+    global _nickname_allocator
+    if _nickname_allocator is None:
+        _nickname_allocator = NicknameAllocator.from_word_files(nickname_sequence)
+    return _nickname_allocator
+
 class UserService:
     @classmethod
     async def _execute_query(cls, session: AsyncSession, query):
@@ -56,83 +83,185 @@ class UserService:
         user_data: Dict[str, str],
         email_service: EmailService
     ) -> Optional[User]:
+        """
+        Insert a new user and queue its verification email in a single statement.
+
+        Instead of probing for a free email and nickname, counting users and refreshing afterwards,
+        one ``INSERT ... RETURNING`` relies on the unique constraints, decides first-user-is-ADMIN
+        with an ``EXISTS`` probe inside the insert, and writes the outbox row in a CTE over the
+        returned row. Raises EmailAlreadyExistsError when the email is already registered and
+        returns None when the user could not be created for any other reason.
+
+        The dialect-specific ``ON CONFLICT DO NOTHING`` insert is not eligible for SQLAlchemy's
+        compiled-statement cache, and recompiling this statement costs more than the round trips it
+        saves, so conflicts surface as ``IntegrityError`` instead; they are rare and handled below.
+        """
         try:
             # 1) Validate incoming payload
             validated_data = UserCreate(**user_data).model_dump()
 
-            # 2) Check for existing email
-            existing_user = await cls.get_by_email(session, validated_data["email"])
-            if existing_user:
-                logger.error("User with given email already exists.")
-                return None
-
-            # 3) Hash & remove plain password
-            validated_data["hashed_password"] = hash_password(validated_data.pop("password"))
-
-            # 4) Build User, assign random nickname
-            new_user = User(**validated_data)
-            new_nickname = generate_nickname()
-            while await cls.get_by_nickname(session, new_nickname):
-                new_nickname = generate_nickname()
-            new_user.nickname = new_nickname
-
-            # 5) First user → ADMIN, everyone else → ANONYMOUS
-            user_count = await cls.count(session)
-            new_user.role = UserRole.ADMIN if user_count == 0 else UserRole.ANONYMOUS
-
-            # 6) Stage the new user so Postgres gives us an ID on flush
-            session.add(new_user)
-            await session.flush()
-
-            # 7) Now that new_user.id is known, set verification or auto-verify admin
-            if new_user.role == UserRole.ADMIN:
-                new_user.email_verified = True
-            else:
-                new_user.verification_token = generate_verification_token()
-            await email_service.send_verification_email(new_user)
-
-            # 8) Persist both the insert and our updates, then refresh
-            await session.commit()
-            await session.refresh(new_user)
-
-            return new_user
+            # 2) Hash & remove plain password
+            validated_data["hashed_password"] = await hash_password_async(validated_data.pop("password"))
+
+            for _ in range(_MAX_NICKNAME_ATTEMPTS):
+                try:
+                    new_user = await cls._insert_user(session, validated_data, email_service)
+                except IntegrityError:
+                    # 3) A unique constraint fired: either the email is taken, or (rarely) the nickname was
+                    await session.rollback()
+                    if await cls.get_by_email(session, validated_data["email"]):
+                        raise EmailAlreadyExistsError(validated_data["email"])
+                    continue
+                await session.commit()
+                wake_email_dispatcher()
+                return new_user
+            logger.error("Could not allocate a unique nickname for the new user.")
+            return None
 
         except ValidationError as e:
             logger.error(f"Validation error during user creation: {e}")
             return None
 
+    @classmethod
+    async def _insert_user(cls, session: AsyncSession, validated_data: Dict[str, str], email_service: EmailService) -> User:
+        user_id = uuid4()
+        verification_token = generate_verification_token()
+        role_type = User.__table__.c.role.type
+
+        # First user → ADMIN (auto-verified), everyone else → ANONYMOUS with a verification token.
+        # All three branches see the same statement snapshot, so they always agree.
+        users_exist = select(User.id).limit(1).exists()
+        values = {
+            **validated_data,
+            "id": user_id,
+            "nickname": await get_nickname_allocator().allocate(session),
+            "role": case((users_exist, literal(UserRole.ANONYMOUS, role_type)), else_=literal(UserRole.ADMIN, role_type)),
+            "email_verified": ~users_exist,
+            "verification_token": case((users_exist, literal(verification_token)), else_=null()),
+        }
+        new_user = (
+            insert(User)
+            .values(**values)
+            .returning(*User.__table__.c)
+            .cte("new_user")
+        )
+
+        # The payload only needs the id and token, both chosen here, so it can be bound up front
+        payload = email_service.verification_email_payload(
+            User(id=user_id, email=validated_data["email"], first_name=validated_data.get("first_name"),
+                 verification_token=verification_token)
+        )
+        queued_email = EmailOutboxService.enqueue_statement('email_verification', payload, new_user).cte("queued_email")
+
+        stmt = select(aliased(User, new_user)).add_cte(queued_email)
+        result = await session.execute(stmt)
+        return result.scalar_one()
+
     @classmethod
     async def update(cls, session: AsyncSession, user_id: UUID, update_data: Dict[str, str]) -> Optional[User]:
+        """
+        Apply ``update_data`` with one ``UPDATE users ... RETURNING`` and a single commit; the
+        returned row hydrates the user directly. Returns None when no user has ``user_id`` or the
+        data is invalid.
+        """
         try:
             # validated_data = UserUpdate(**update_data).dict(exclude_unset=True)
             validated_data = UserUpdate(**update_data).model_dump(exclude_unset=True)
 
             if 'password' in validated_data:
-                validated_data['hashed_password'] = hash_password(validated_data.pop('password'))
-            query = update(User).where(User.id == user_id).values(**validated_data).execution_options(synchronize_session="fetch")
-            await cls._execute_query(session, query)
-            updated_user = await cls.get_by_id(session, user_id)
-            if updated_user:
-                session.refresh(updated_user)  # Explicitly refresh the updated user object
-                logger.info(f"User {user_id} updated successfully.")
-                return updated_user
-            else:
-                logger.error(f"User {user_id} not found after update attempt.")
-            return None
+                validated_data['hashed_password'] = await hash_password_async(validated_data.pop('password'))
+            if 'role' in validated_data:
+                # Tokens issued under the old role stop being accepted, with or without a user lookup
+                validated_data['token_version'] = User.token_version + 1
+                await TokenRevocationService.revoke_user_tokens(session, user_id)
+            query = (
+                update(User)
+                .where(User.id == user_id)
+                .values(**validated_data)
+                .returning(User)
+                .execution_options(populate_existing=True)
+            )
+            updated_user = (await session.execute(query)).scalars().first()
+            if updated_user is None:
+                await session.rollback()
+                logger.info(f"User {user_id} not found for update.")
+                return None
+            await session.commit()
+            invalidate_cached_user(user_id)
+            logger.info(f"User {user_id} updated successfully.")
+            return updated_user
         except Exception as e:  # Broad exception handling for debugging
             logger.error(f"Error during user update: {e}")
+            await session.rollback()
             return None
 
+    @classmethod
+    async def _delete_where(cls, session: AsyncSession, *criteria) -> List[UUID]:
+        """
+        Delete the users matching ``criteria`` and revoke their tokens in one statement: a
+        ``DELETE ... RETURNING id`` CTE feeding the token watermark insert. Returns the deleted
+        ids; the caller commits and then invalidates the cached users.
+        """
+        deleted = delete(User).where(*criteria).returning(User.id).cte("deleted_users")
+        return await TokenRevocationService.revoke_tokens_of(session, deleted)
+
     @classmethod
     async def delete(cls, session: AsyncSession, user_id: UUID) -> bool:
-        user = await cls.get_by_id(session, user_id)
-        if not user:
+        try:
+            deleted = await cls._delete_where(session, User.id == user_id)
+            await session.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {e}")
+            await session.rollback()
+            return False
+        if not deleted:
             logger.info(f"User with ID {user_id} not found.")
             return False
-        await session.delete(user)
-        await session.commit()
+        invalidate_cached_user(user_id)
         return True
 
+    @classmethod
+    async def bulk_delete(
+        cls,
+        session: AsyncSession,
+        *,
+        ids: Optional[List[UUID]] = None,
+        q: Optional[str] = None,
+        role: Optional[UserRole] = None,
+        is_professional: Optional[bool] = None,
+        exclude: Optional[UUID] = None,
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator[int]:
+        """
+        Delete the users in ``ids``, or every user matching the ``search_users`` filters, in
+        batches of ``batch_size`` (default ``bulk_delete_batch_size``), yielding the number deleted
+        by each batch. Every batch is one ``DELETE ... RETURNING`` and its own transaction, so row
+        locks stay short and batches already yielded stay deleted if a later one fails; the failing
+        batch is rolled back and its error raised. ``exclude`` (usually the caller) is never deleted.
+        """
+        batch_size = batch_size or get_settings().bulk_delete_batch_size
+        keep = [User.id != exclude] if exclude is not None else []
+        if ids is not None:
+            ids = list(dict.fromkeys(ids))
+            batches = ([User.id.in_(ids[i:i + batch_size])] for i in range(0, len(ids), batch_size))
+        else:
+            matching = select(User.id).where(*cls._search_filters(q, role, is_professional), *keep).limit(batch_size)
+            batches = itertools.repeat([User.id.in_(matching.scalar_subquery())])
+        for number, criteria in enumerate(batches, 1):
+            try:
+                deleted = await cls._delete_where(session, *criteria, *keep)
+                await session.commit()
+            except SQLAlchemyError as e:
+                logger.error(f"Bulk delete batch {number} failed, stopping: {e}")
+                await session.rollback()
+                raise
+            for user_id in deleted:
+                invalidate_cached_user(user_id)
+            logger.info(f"Bulk delete batch {number}: {len(deleted)} users deleted.")
+            yield len(deleted)
+            if ids is None and len(deleted) < batch_size:
+                return
+
     @classmethod
     async def list_users(cls, session: AsyncSession, skip: int = 0, limit: int = 10) -> List[User]:
         query = select(User).offset(skip).limit(limit)
@@ -145,26 +274,100 @@ class UserService:
     
 
     @classmethod
-    async def login_user(cls, session: AsyncSession, email: str, password: str) -> Optional[User]:
-        user = await cls.get_by_email(session, email)
-        if user:
-            if user.email_verified is False:
-                return None
-            if user.is_locked:
-                return None
-            if verify_password(password, user.hashed_password):
-                user.failed_login_attempts = 0
-                user.last_login_at = datetime.now(timezone.utc)
-                session.add(user)
-                await session.commit()
-                return user
-            else:
-                user.failed_login_attempts += 1
-                if user.failed_login_attempts >= settings.max_login_attempts:
-                    user.is_locked = True
-                session.add(user)
+    async def authenticate(cls, session: AsyncSession, email: str, password: str) -> Tuple[Optional[User], bool]:
+        """
+        Check a login attempt, returning ``(user, locked)``.
+
+        Reads only the columns a login needs, then records the outcome with a single UPDATE so
+        concurrent attempts cannot lose each other's writes: a failure increments
+        ``failed_login_attempts`` in SQL and locks the account once it reaches
+        ``max_login_attempts``, and stops counting once the account is locked, so exactly one
+        failure makes the transition; a success only counts if the account is still unlocked when it
+        lands, so a burst of parallel guesses cannot slip past a lock set while bcrypt was running.
+        ``locked`` is also True for the failure that trips the lock.
+
+        A success with no failures to reset writes nothing when the write-behind buffer in
+        ``login_activity_service`` is running: the lock is re-read ``FOR SHARE`` after bcrypt and
+        ``last_login_at`` goes to the buffer. A password hashed
+        at a cost other than ``password_hash_rounds`` is rehashed in the background.
+
+        The returned user only has id, email, role, token_version and the login columns loaded.
+        """
+        query = (
+            select(User)
+            .options(load_only(User.id, User.email, User.role, User.hashed_password, User.email_verified,
+                               User.is_locked, User.failed_login_attempts, User.token_version))
+            .where(User.email == email)
+        )
+        user = (await session.execute(query)).scalars().first()
+        if user is None:
+            return None, False
+        if user.is_locked:
+            return None, True
+        if user.email_verified is False:
+            return None, False
+
+        if await verify_password_async(password, user.hashed_password):
+            # A hash made at another cost than the policy is replaced without delaying this login
+            schedule_password_rehash(user.id, user.hashed_password, password)
+            if user.failed_login_attempts == 0 and last_login_recorder_running():
+                # Nothing to reset and last_login_at is written behind, so no row UPDATE: re-read the
+                # lock instead. FOR SHARE waits for a failure's UPDATE still in flight to land.
+                is_locked = (await session.execute(
+                    select(User.is_locked).where(User.id == user.id).with_for_update(read=True)
+                )).scalar()
                 await session.commit()
-        return None
+                if is_locked is None:
+                    return None, False
+                if is_locked:
+                    return None, True
+                record_last_login(user.id)
+                return user, False
+            row = (await session.execute(
+                update(User)
+                .where(User.id == user.id, User.is_locked.is_(False))
+                .values(failed_login_attempts=0, last_login_at=func.now())
+                .returning(User.failed_login_attempts, User.last_login_at)
+                .execution_options(synchronize_session=False)
+            )).first()
+            await session.commit()
+            if row is None:
+                return None, True
+            cls._set_loaded(user, row)
+            return user, False
+
+        row = (await session.execute(
+            update(User)
+            .where(User.id == user.id, User.is_locked.is_(False))
+            .values(
+                failed_login_attempts=User.failed_login_attempts + 1,
+                is_locked=User.failed_login_attempts + 1 >= get_settings().max_login_attempts,
+            )
+            .returning(User.failed_login_attempts, User.is_locked)
+            .execution_options(synchronize_session=False)
+        )).first()
+        if row is None:
+            # Another attempt locked the account after our read, or the user was deleted meanwhile
+            is_locked = (await session.execute(select(User.is_locked).where(User.id == user.id))).scalar()
+            await session.commit()
+            return None, bool(is_locked)
+        if row.is_locked:
+            # This failure locked the account: tokens issued before it stop working too
+            await TokenRevocationService.revoke_user_tokens(session, user.id)
+        await session.commit()
+        cls._set_loaded(user, row)
+        return None, row.is_locked
+
+    @staticmethod
+    def _set_loaded(user: User, row):
+        """Copy columns returned by a Core UPDATE onto the session's copy of the user."""
+        for key, value in row._mapping.items():
+            set_committed_value(user, key, value)
+
+    @classmethod
+    async def login_user(cls, session: AsyncSession, email: str, password: str) -> Optional[User]:
+        user, _ = await cls.authenticate(session, email, password)
+        return user
 
     @classmethod
     async def is_account_locked(cls, session: AsyncSession, email: str) -> bool:
@@ -174,14 +377,18 @@ class UserService:
 
     @classmethod
     async def reset_password(cls, session: AsyncSession, user_id: UUID, new_password: str) -> bool:
-        hashed_password = hash_password(new_password)
+        hashed_password = await hash_password_async(new_password)
         user = await cls.get_by_id(session, user_id)
         if user:
             user.hashed_password = hashed_password
             user.failed_login_attempts = 0  # Resetting failed login attempts
             user.is_locked = False  # Unlocking the user account, if locked
+            user.token_version = User.token_version + 1  # Sign out tokens issued before the reset
             session.add(user)
+            await RefreshTokenService.revoke_all_for_user(session, user_id)
+            await TokenRevocationService.revoke_user_tokens(session, user_id)
             await session.commit()
+            invalidate_cached_user(user_id)
             return True
         return False
 
@@ -194,6 +401,7 @@ class UserService:
             user.role = UserRole.AUTHENTICATED
             session.add(user)
             await session.commit()
+            invalidate_cached_user(user_id)
             return True
         return False
 
@@ -218,10 +426,67 @@ class UserService:
             user.failed_login_attempts = 0  # Optionally reset failed login attempts
             session.add(user)
             await session.commit()
+            invalidate_cached_user(user_id)
             return True
         return False
 
     
+    @classmethod
+    def _text_search_filter(cls, q: str):
+        """
+        Case-insensitive substring match on first_name, last_name, email and nickname.
+
+        Each branch is written as `lower(col) LIKE pattern` so it matches the expressions of
+        the ix_users_*_trgm GIN indexes; Postgres can then combine them with a BitmapOr
+        instead of scanning the table. LIKE wildcards typed by the user are escaped.
+        """
+        escaped = q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        return or_(*(
+            func.lower(column).like(pattern, escape="\\")
+            for column in (User.first_name, User.last_name, User.email, User.nickname)
+        ))
+
+    @classmethod
+    async def _estimate_count(cls, session: AsyncSession, stmt) -> Optional[int]:
+        """
+        Approximate row count for ``stmt`` without running it.
+
+        An unfiltered listing uses ``pg_class.reltuples`` (maintained by VACUUM/ANALYZE); a filtered
+        one uses the planner's row estimate for the query. Returns None when no estimate exists yet,
+        e.g. for a table that has never been analyzed.
+        """
+        if stmt.whereclause is None:
+            result = await session.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+                {"table": User.__tablename__},
+            )
+            estimate = result.scalar()
+            return estimate if estimate is not None and estimate >= 0 else None
+        compiled = stmt.compile(dialect=session.bind.dialect, compile_kwargs={"literal_binds": True})
+        # Sent as is: through text() a ":word" inside a literal search pattern would read as a bind
+        connection = await session.connection()
+        plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @classmethod
+    def _search_filters(cls, q: Optional[str], role: Optional[UserRole], is_professional: Optional[bool]) -> List:
+        """The WHERE criteria for the ``search_users`` filters, shared with ``bulk_delete``."""
+        filters = []
+
+        # Text search
+        if q:
+            filters.append(cls._text_search_filter(q))
+
+        # Role filter
+        if role:
+            filters.append(User.role == role)
+
+        # Professional status filter
+        if is_professional is not None:
+            filters.append(User.is_professional == is_professional)
+        return filters
+
     @classmethod
     async def search_users(
         cls,
@@ -232,46 +497,59 @@ class UserService:
         is_professional: Optional[bool] = None,
         skip: int = 0,
         limit: int = 10,
-    ) -> Tuple[List[User], int]:
-        # 1) Build count query
-        count_stmt = select(func.count()).select_from(User)
-
-        # 2) Build main select
-        sel_stmt = select(User)
+        after: Optional[Tuple[datetime, UUID]] = None,
+        include_total: bool = True,
+        total_mode: TotalMode = TotalMode.EXACT,
+        peek: bool = False,
+    ) -> Tuple[List[User], Optional[int]]:
+        """
+        Filtered user listing, newest first, ordered by ``(created_at, id)``.
 
-        # 3) Text search
-        if q:
-            p = f"%{q.lower()}%"
-            text_filter = or_(
-                func.lower(User.first_name).like(p),
-                func.lower(User.last_name).like(p),
-                func.lower(User.email).like(p),
-                func.lower(User.nickname).like(p),
-            )
-            sel_stmt = sel_stmt.where(text_filter)
-            count_stmt = count_stmt.where(text_filter)
+        Pages are addressed either by ``skip`` (OFFSET) or, when ``after`` holds the
+        ``(created_at, id)`` of the last row of the previous page, by keyset: the rows strictly
+        after that key are read straight off ``ix_users_created_at_id``, so deep pages cost the
+        same as the first one and concurrent inserts do not shift rows between pages.
 
-        # 4) Role filter
-        if role:
-            sel_stmt = sel_stmt.where(User.role == role)
-            count_stmt = count_stmt.where(User.role == role)
+        ``total_mode`` picks how the total is produced: an exact COUNT(*), a planner estimate
+        (see ``_estimate_count``), or none. ``include_total=False`` is shorthand for
+        ``TotalMode.NONE``. The total is None whenever it was not computed.
 
-        # 5) Professional status filter
-        if is_professional is not None:
-            sel_stmt = sel_stmt.where(User.is_professional == is_professional)
-            count_stmt = count_stmt.where(User.is_professional == is_professional)
-
-        # 6) Execute count
-        total = (await session.execute(count_stmt)).scalar_one()
-
-        # 7) Apply pagination & ordering
-        sel_stmt = (
-            sel_stmt
-            .order_by(User.created_at.desc())
-            .offset(skip)
-            .limit(limit)
-        )
+        ``peek`` fetches one row past ``limit`` so the caller can tell whether a next page exists;
+        that row is returned but not counted as seen when an estimated total is adjusted.
+        """
+        if not include_total:
+            total_mode = TotalMode.NONE
+
+        # 1-4) Collect the filters shared by the page and the total
+        filters = cls._search_filters(q, role, is_professional)
+
+        # 5) Compute the total
+        total = None
+        if total_mode == TotalMode.EXACT:
+            count_stmt = select(func.count()).select_from(User).where(*filters)
+            total = (await session.execute(count_stmt)).scalar_one()
+        elif total_mode == TotalMode.ESTIMATED:
+            total = await cls._estimate_count(session, select(User.id).where(*filters))
+
+        # 6) Build main select
+        sel_stmt = select(User).where(*filters)
+
+        # 7) Apply pagination & ordering; id breaks ties between rows created in one transaction
+        fetch = limit + 1 if peek else limit
+        sel_stmt = sel_stmt.order_by(User.created_at.desc(), User.id.desc()).limit(fetch)
+        if after is not None:
+            sel_stmt = sel_stmt.where(tuple_(User.created_at, User.id) < tuple_(*after))
+        else:
+            sel_stmt = sel_stmt.offset(skip)
         result = await session.execute(sel_stmt)
         users = result.scalars().all()
 
-        return users, total
\ No newline at end of file
+        # 8) An estimate is never below the rows already seen, and a short page pins it down exactly
+        if total_mode == TotalMode.ESTIMATED and after is None:
+            seen = skip + len(users[:limit])
+            if len(users) < fetch and (users or skip == 0):
+                total = seen
+            elif total is not None:
+                total = max(total, seen)
+
+        return users, total
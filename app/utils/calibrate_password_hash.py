@@ -0,0 +1,35 @@
+"""
+Recommend a bcrypt cost (PASSWORD_HASH_ROUNDS) for this host:
+
+    python -m app.utils.calibrate_password_hash --target-ms 250
+
+Times one hash at each cost, picks the highest that stays within the target latency, and estimates
+how many logins per second the password worker pool can then verify. Run it on each instance type;
+hashes made at another cost are rehashed as their users log in.
+"""
+from builtins import print
+import argparse
+from app.utils.security import calibrate_rounds
+from settings.config import get_settings
+
+
+def main(args):
+    settings = get_settings()
+    recommended, timings = calibrate_rounds(args.target_ms / 1000, args.min_rounds, args.max_rounds, args.samples)
+    for rounds, seconds in timings.items():
+        marker = " <- recommended" if rounds == recommended else ""
+        print(f"rounds={rounds:<3} {seconds * 1000:9.1f} ms/hash{marker}")
+    if timings[recommended] > args.target_ms / 1000:
+        print(f"Even rounds={recommended} exceeds {args.target_ms:g} ms on this host; not going lower.")
+    per_second = settings.password_hash_pool_size / timings[recommended]
+    print(f"PASSWORD_HASH_ROUNDS={recommended} (currently {settings.password_hash_rounds}): "
+          f"about {per_second:.0f} logins/s with {settings.password_hash_pool_size} hashing workers")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=250.0, help="Acceptable time for one hash")
+    parser.add_argument("--min-rounds", type=int, default=10, help="Never recommend less than this")
+    parser.add_argument("--max-rounds", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=3, help="Timings per cost; the fastest is used")
+    main(parser.parse_args())
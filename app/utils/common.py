@@ -1,8 +1,6 @@
 import logging.config
 import os
-from app.dependencies import get_settings
 
-settings = get_settings()
 def setup_logging():
     """
     Sets up logging for the application using a configuration file.
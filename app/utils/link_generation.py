@@ -1,6 +1,6 @@
 from builtins import dict, int, max, str
-from typing import List, Callable
-from urllib.parse import urlencode
+from typing import List, Callable, Optional
+from urllib.parse import parse_qsl, urlencode
 from uuid import UUID
 
 from fastapi import Request
@@ -12,8 +12,10 @@ def create_link(rel: str, href: str, method: str = "GET", action: str = None) ->
     return Link(rel=rel, href=href, method=method, action=action)
 
 def create_pagination_link(rel: str, base_url: str, params: dict) -> PaginationLink:
-    # Ensure parameters are added in a specific order
-    query_string = f"skip={params['skip']}&limit={params['limit']}"
+    # Ensure parameters are added in a specific order: the position (cursor or skip), limit, then any filters
+    position = ('cursor', params['cursor']) if 'cursor' in params else ('skip', params['skip'])
+    rest = [(k, v) for k, v in params.items() if k not in ('cursor', 'skip', 'limit')]
+    query_string = urlencode([position, ('limit', params['limit']), *rest])
     return PaginationLink(rel=rel, href=f"{base_url}?{query_string}")
 
 def create_user_links(user_id: UUID, request: Request) -> List[Link]:
@@ -30,19 +32,41 @@ def create_user_links(user_id: UUID, request: Request) -> List[Link]:
         for rel, action, method, action_desc in actions
     ]
 
-def generate_pagination_links(request: Request, skip: int, limit: int, total_items: int) -> List[PaginationLink]:
-    base_url = str(request.url)
-    total_pages = (total_items + limit - 1) // limit
+def generate_pagination_links(request: Request, skip: int, limit: int, total_items: Optional[int],
+                              cursor: Optional[str] = None, next_cursor: Optional[str] = None,
+                              has_next: Optional[bool] = None) -> List[PaginationLink]:
+    """
+    Build self/first/next links, plus last/prev in skip/limit mode.
+
+    When the request was addressed by ``cursor`` the links stay in cursor mode; a cursor only
+    points forward, so there is no prev or last link there. Without an exact ``total_items``
+    there is no last link either, and ``has_next`` decides whether a next link is added.
+    """
+    base_url, _, query = str(request.url).partition('?')
+    # Keep search filters on every link, but not the position parameters we are about to rewrite
+    filters = {k: v for k, v in parse_qsl(query) if k not in ('skip', 'limit', 'cursor')}
+
+    if cursor is not None:
+        links = [
+            create_pagination_link("self", base_url, {'cursor': cursor, 'limit': limit, **filters}),
+            create_pagination_link("first", base_url, {'skip': 0, 'limit': limit, **filters}),
+        ]
+        if next_cursor is not None:
+            links.append(create_pagination_link("next", base_url, {'cursor': next_cursor, 'limit': limit, **filters}))
+        return links
+
     links = [
-        create_pagination_link("self", base_url, {'skip': skip, 'limit': limit}),
-        create_pagination_link("first", base_url, {'skip': 0, 'limit': limit}),
-        create_pagination_link("last", base_url, {'skip': max(0, (total_pages - 1) * limit), 'limit': limit})
+        create_pagination_link("self", base_url, {'skip': skip, 'limit': limit, **filters}),
+        create_pagination_link("first", base_url, {'skip': 0, 'limit': limit, **filters}),
     ]
+    if total_items is not None:
+        total_pages = (total_items + limit - 1) // limit
+        links.append(create_pagination_link("last", base_url, {'skip': max(0, (total_pages - 1) * limit), 'limit': limit, **filters}))
 
-    if skip + limit < total_items:
-        links.append(create_pagination_link("next", base_url, {'skip': skip + limit, 'limit': limit}))
+    if has_next if has_next is not None else total_items is not None and skip + limit < total_items:
+        links.append(create_pagination_link("next", base_url, {'skip': skip + limit, 'limit': limit, **filters}))
 
     if skip > 0:
-        links.append(create_pagination_link("prev", base_url, {'skip': max(skip - limit, 0), 'limit': limit}))
+        links.append(create_pagination_link("prev", base_url, {'skip': max(skip - limit, 0), 'limit': limit, **filters}))
 
     return links
@@ -1,10 +1,75 @@
-from builtins import str
+from builtins import int, len, open, str
+import math
 import random
+from functools import lru_cache
+from pathlib import Path
+from typing import Sequence as SequenceType, Tuple
+from sqlalchemy import Sequence, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+WORDS_DIR = Path(__file__).resolve().parent / "nickname_words"
+NICKNAME_NUMBERS = 10000
+
+
+@lru_cache(maxsize=None)
+def load_words(name: str) -> Tuple[str, ...]:
+    """Read the word list nickname_words/<name>.txt, once per process."""
+    with open(WORDS_DIR / f"{name}.txt", "r", encoding="utf-8") as file:
+        return tuple(word for word in (line.strip() for line in file) if word)
 
 
 def generate_nickname() -> str:
     """Generate a URL-safe nickname using adjectives and animal names."""
-    adjectives = ["clever", "jolly", "brave", "sly", "gentle"]
-    animals = ["panda", "fox", "raccoon", "koala", "lion"]
-    number = random.randint(0, 999)
-    return f"{random.choice(adjectives)}_{random.choice(animals)}_{number}"
+    adjective = random.choice(load_words("adjectives"))
+    animal = random.choice(load_words("animals"))
+    return f"{adjective}_{animal}_{random.randrange(NICKNAME_NUMBERS)}"
+
+
+class NicknameAllocator:
+    """
+    Hands out unique nicknames without asking the database whether they are taken.
+
+    Every position n of a Postgres sequence maps to a name through the affine permutation
+    ``(multiplier * n + offset) mod space`` of the adjective x animal x number space, so distinct
+    positions always give distinct names while consecutive signups still look unrelated.
+
+    The sequence steps by ``block_size``: one ``nextval`` reserves ``block_size`` positions for this
+    process, so only one allocation in ``block_size`` costs a query. Unused positions are simply
+    skipped, and several processes can share the sequence without coordinating.
+    """
+    def __init__(self, sequence: Sequence, adjectives: SequenceType[str], animals: SequenceType[str],
+                 numbers: int = NICKNAME_NUMBERS):
+        self.sequence = sequence
+        self.block_size = sequence.increment or 1
+        self.adjectives = adjectives
+        self.animals = animals
+        self.numbers = numbers
+        self.space = len(adjectives) * len(animals) * numbers
+        # Any multiplier coprime with the space gives a permutation; start near the golden ratio so
+        # neighbouring positions land far apart. Both constants depend only on the word lists.
+        self.multiplier = int(self.space * 0.6180339887)
+        while math.gcd(self.multiplier, self.space) != 1:
+            self.multiplier += 1
+        self.offset = self.space // 3
+        self._next = 0
+        self._end = 0
+
+    @classmethod
+    def from_word_files(cls, sequence: Sequence) -> "NicknameAllocator":
+        return cls(sequence, load_words("adjectives"), load_words("animals"))
+
+    def nickname_for(self, position: int) -> str:
+        """The nickname at a sequence position; positions below ``space`` never share a name."""
+        index = (self.multiplier * position + self.offset) % self.space
+        index, number = divmod(index, self.numbers)
+        adjective, animal = divmod(index, len(self.animals))
+        return f"{self.adjectives[adjective]}_{self.animals[animal]}_{number}"
+
+    async def allocate(self, session: AsyncSession) -> str:
+        """Return the next nickname, reserving a new block from the sequence when this one is used up."""
+        if self._next >= self._end:
+            start = (await session.execute(select(self.sequence.next_value()))).scalar_one()
+            self._next, self._end = start, start + self.block_size
+        position = self._next
+        self._next += 1
+        return self.nickname_for(position)
@@ -0,0 +1,22 @@
+from builtins import ValueError, len, str
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+from uuid import UUID
+
+
+def encode_cursor(created_at: datetime, user_id: UUID) -> str:
+    """Encode the sort key of the last row on a page as an opaque, URL-safe token."""
+    raw = json.dumps([created_at.isoformat(), str(user_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Inverse of ``encode_cursor``; raises ``ValueError`` for anything that is not a valid cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, user_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(user_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid pagination cursor") from e
@@ -0,0 +1,88 @@
+from builtins import dict, float, int, len, max, object, round, str, zip
+import bisect
+import time
+from typing import Dict, Sequence
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Upper bounds, in milliseconds, of the latency histogram buckets; the last bucket is unbounded
+DEFAULT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class Histogram:
+    """Cumulative latency histogram with fixed bucket bounds in milliseconds."""
+    def __init__(self, bounds_ms: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.bounds_ms = tuple(bounds_ms)
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.bounds_ms, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def snapshot(self) -> dict:
+        labels = [f"<={bound:g}" for bound in self.bounds_ms] + [f">{self.bounds_ms[-1]:g}"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+class PoolStats:
+    """Counters kept by ``InstrumentedAsyncPool``."""
+    def __init__(self):
+        self.waiting = 0
+        self.timeouts = 0
+        self.acquire = Histogram()
+        self.connect = Histogram()
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    ``AsyncAdaptedQueuePool`` that times every checkout and every new connection.
+
+    ``acquire`` covers the whole checkout, so it includes waiting for a connection to be returned
+    and, when the pool grows, opening a new one; ``connect`` covers opening connections alone.
+    ``waiting`` is the number of checkouts in progress right now.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        stats = self.stats
+        stats.waiting += 1
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.waiting -= 1
+            stats.acquire.observe(time.perf_counter() - start)
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            self.stats.connect.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Live pool state and latency histograms."""
+        stats = self.stats
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            "waiting": stats.waiting,
+            "timeouts": stats.timeouts,
+            "acquire": stats.acquire.snapshot(),
+            "connect": stats.connect.snapshot(),
+        }
@@ -0,0 +1,166 @@
+from builtins import Exception, ImportError, RuntimeError, enumerate, float, getattr, int, len, list, max, min, str, sum
+import logging
+import math
+import secrets
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Sequence, Tuple
+from fastapi import Request
+from settings.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+class RateLimitExceeded(Exception):
+    """Raised when a client is over a rate limit; ``retry_after`` is in seconds."""
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limit exceeded, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class InMemoryRateLimiter:
+    """
+    Sliding-window log limiter for a single process: at most ``limit`` hits per ``window`` seconds
+    per key. Rejected hits are not counted, so a client that backs off for ``retry_after`` gets in.
+    """
+    def __init__(self, clock: Callable[[], float] = time.monotonic, max_keys: int = 100000):
+        self.clock = clock
+        self.max_keys = max_keys
+        self._hits: Dict[str, Deque[float]] = {}
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        """Count a hit on ``key``; returns 0 if it is allowed, otherwise seconds until one will be."""
+        return await self.hit_many([(key, limit)], window)
+
+    async def hit_many(self, checks: Sequence[Tuple[str, int]], window: float) -> float:
+        """
+        Count a hit on every ``(key, limit)`` in ``checks`` if all of them allow it; otherwise count
+        none and return the seconds until every one of them will.
+        """
+        now = self.clock()
+        new_keys = sum(1 for key, _ in checks if key not in self._hits)
+        if new_keys and len(self._hits) + new_keys > self.max_keys:
+            self._sweep(now, window)
+        retry_after = 0.0
+        logs = []
+        for key, limit in checks:
+            hits = self._hits.get(key)
+            if hits is None:
+                hits = self._hits[key] = deque()
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) >= limit:
+                retry_after = max(retry_after, (hits[0] if hits else now) + window - now, 0.001)
+            logs.append(hits)
+        if retry_after:
+            return retry_after
+        for hits in logs:
+            hits.append(now)
+        return 0.0
+
+    def _sweep(self, now: float, window: float):
+        for key in [key for key, hits in self._hits.items() if not hits or hits[-1] <= now - window]:
+            del self._hits[key]
+
+    def reset(self):
+        self._hits.clear()
+
+class RedisRateLimiter:
+    """
+    The same sliding-window log kept in Redis sorted sets, shared by every worker and node.
+
+    ``client`` is any ``redis.asyncio``-compatible client. Each hit is one MULTI pipeline that drops
+    expired entries, adds this hit and counts the window for every key; a rejected hit is removed
+    from all of them again. If Redis
+    is unreachable the request is allowed rather than locking everyone out of logging in.
+    """
+    def __init__(self, client, prefix: str = "ratelimit:", clock: Callable[[], float] = time.time):
+        self.client = client
+        self.prefix = prefix
+        self.clock = clock
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRateLimiter":
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("rate_limit_backend 'redis' needs the redis package installed") from e
+        return cls(redis.from_url(url))
+
+    async def hit(self, key: str, limit: int, window: float) -> float:
+        return await self.hit_many([(key, limit)], window)
+
+    async def hit_many(self, checks: Sequence[Tuple[str, int]], window: float) -> float:
+        now = self.clock()
+        member = f"{now:.6f}:{secrets.token_hex(4)}"
+        keys = [self.prefix + key for key, _ in checks]
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                for key in keys:
+                    pipe.zremrangebyscore(key, 0, now - window)
+                    pipe.zadd(key, {member: now})
+                    pipe.zcard(key)
+                    pipe.zrange(key, 0, 0, withscores=True)
+                    pipe.pexpire(key, int(math.ceil(window * 1000)))
+                results = await pipe.execute()
+            retry_after = 0.0
+            for i, (_, limit) in enumerate(checks):
+                _, _, count, oldest, _ = results[5 * i:5 * i + 5]
+                if count > limit:
+                    retry_after = max(retry_after, oldest[0][1] + window - now, 0.001)
+            if retry_after:
+                for key in keys:
+                    await self.client.zrem(key, member)
+        except Exception as e:
+            logger.error(f"Rate limit check failed, allowing request: {e}")
+            return 0.0
+        return retry_after
+
+_limiter = None
+
+def get_rate_limiter():
+    """The process-wide limiter for the configured ``rate_limit_backend``."""
+    global _limiter
+    if _limiter is None:
+        settings = get_settings()
+        if settings.rate_limit_backend == "redis":
+            _limiter = RedisRateLimiter.from_url(settings.rate_limit_redis_url)
+        else:
+            _limiter = InMemoryRateLimiter()
+    return _limiter
+
+def reset_rate_limiter():
+    """Forget the process-wide limiter; the next call builds a new one from settings."""
+    global _limiter
+    _limiter = None
+
+def client_ip(request: Request) -> str:
+    """
+    The caller's address. Each of the ``rate_limit_forwarded_hops`` proxies in front of the app
+    (nginx by default) appends the address it saw to ``X-Forwarded-For``, so the entry that many
+    places from the end is the one the outermost trusted proxy saw; anything before it is
+    client-supplied and ignored.
+    """
+    hops = get_settings().rate_limit_forwarded_hops
+    forwarded = request.headers.get("x-forwarded-for")
+    if hops > 0 and forwarded:
+        addresses = [address.strip() for address in forwarded.split(",") if address.strip()]
+        if addresses:
+            return addresses[-min(hops, len(addresses))]
+    return request.client.host if request.client else "unknown"
+
+async def enforce_rate_limit(request: Request, action: str, email: Optional[str] = None):
+    """
+    Count a ``login`` or ``register`` attempt against the per-IP and per-email limits for
+    ``action`` and raise RateLimitExceeded if either is exhausted. Runs before any bcrypt work.
+    """
+    settings = get_settings()
+    if not settings.rate_limit_enabled:
+        return
+    limiter = get_rate_limiter()
+    window = settings.rate_limit_window_seconds
+    checks = [(f"{action}:ip:{client_ip(request)}", getattr(settings, f"rate_limit_{action}_per_ip"))]
+    if email:
+        checks.append((f"{action}:email:{email.strip().lower()}", getattr(settings, f"rate_limit_{action}_per_email")))
+    # Both keys are counted or neither is, so a rejected attempt costs the address nothing
+    retry_after = await limiter.hit_many(checks, window)
+    if retry_after:
+        raise RateLimitExceeded(retry_after)
@@ -0,0 +1,67 @@
+from builtins import ValueError, bool, float, frozenset, str
+import hashlib
+import math
+import time
+from typing import Optional
+from fastapi import Request, Response
+from app.utils.rate_limit import client_ip
+from app.utils.ttl_cache import TTLCache
+from settings.config import get_settings
+
+# Set on write responses so a browser's next reads go to the primary, whichever worker serves them
+PRIMARY_COOKIE = "read_primary_until"
+# The same deadline as a response header, for API clients without cookies to echo back as a request
+# header; like the cookie, every worker honours it
+PRIMARY_HEADER = "Read-Primary-Until"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Clients of this worker that wrote recently. Only a fallback for clients that echo neither the
+# cookie nor the header: it covers reads served by the same worker, not by the others
+_recent_writers: Optional[TTLCache] = None
+
+def _writers() -> TTLCache:
+    global _recent_writers
+    window = get_settings().read_your_writes_seconds
+    if _recent_writers is None or _recent_writers.ttl != window:
+        _recent_writers = TTLCache(100000, window)
+    return _recent_writers
+
+def client_key(request: Request) -> str:
+    """Who is asking: the credential the request carries, or its address for anonymous callers."""
+    credential = request.headers.get("authorization") or request.headers.get("x-api-key")
+    if credential:
+        return "credential:" + hashlib.sha256(credential.encode()).hexdigest()
+    return "ip:" + client_ip(request)
+
+def record_write(request: Request, response: Response):
+    """After a successful non-GET request, pin the client's reads to the primary for the window."""
+    window = get_settings().read_your_writes_seconds
+    if window <= 0 or request.method in SAFE_METHODS or response.status_code >= 400:
+        return
+    _writers().set(client_key(request), True)
+    until = f"{time.time() + window:.3f}"
+    response.set_cookie(PRIMARY_COOKIE, until, max_age=math.ceil(window), httponly=True, samesite="lax")
+    response.headers[PRIMARY_HEADER] = until
+
+def _before(deadline: Optional[str]) -> bool:
+    if deadline:
+        try:
+            return float(deadline) > time.time()
+        except ValueError:
+            pass
+    return False
+
+def reads_must_use_primary(request: Request) -> bool:
+    """
+    True while the client is inside the read-your-writes window of its last write. Guaranteed on
+    every worker for clients that send back the cookie or the ``Read-Primary-Until`` header; for
+    others only on the worker that served the write.
+    """
+    if get_settings().read_your_writes_seconds <= 0:
+        return False
+    if _before(request.cookies.get(PRIMARY_COOKIE)) or _before(request.headers.get(PRIMARY_HEADER)):
+        return True
+    return client_key(request) in _writers()
+
+def clear_recent_writers():
+    _writers().clear()
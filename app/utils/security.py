@@ -1,19 +1,33 @@
 # app/security.py
-from builtins import Exception, ValueError, bool, int, str
+from builtins import Exception, ValueError, bool, dict, int, len, min, range, str
+import asyncio
 import secrets
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
 import bcrypt
 from logging import getLogger
+from settings.config import get_settings
 
 # Set up logging
 logger = getLogger(__name__)
 
-def hash_password(password: str, rounds: int = 12) -> str:
+class PasswordHashingBusyError(Exception):
+    """Raised when the password hashing queue is full and the job is rejected."""
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+_pending_jobs = 0
+
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
     """
     Hashes a password using bcrypt with a specified cost factor.
     
     Args:
         password (str): The plain text password to hash.
         rounds (int): The cost factor that determines the computational cost of hashing.
+            Defaults to the ``password_hash_rounds`` setting.
 
     Returns:
         str: The hashed password.
@@ -21,6 +35,8 @@ def hash_password(password: str, rounds: int = 12) -> str:
     Raises:
         ValueError: If hashing the password fails.
     """
+    if rounds is None:
+        rounds = get_settings().password_hash_rounds
     try:
         salt = bcrypt.gensalt(rounds=rounds)
         hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
@@ -49,5 +65,95 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         logger.error("Error verifying password: %s", e)
         raise ValueError("Authentication process encountered an unexpected error") from e
 
+def hash_rounds(hashed_password: str) -> Optional[int]:
+    """The bcrypt cost a hash was made with, or None if it is not a bcrypt hash."""
+    parts = hashed_password.split("$")
+    if len(parts) != 4 or parts[1] not in ("2a", "2b", "2y") or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True when a stored hash does not match the current cost policy, weaker or stronger."""
+    return hash_rounds(hashed_password) != get_settings().password_hash_rounds
+
+def calibrate_rounds(target_seconds: float, min_rounds: int = 10, max_rounds: int = 16,
+                     samples: int = 3) -> Tuple[int, Dict[int, float]]:
+    """
+    Time bcrypt on this host and recommend a cost for ``target_seconds`` per hash.
+
+    Costs from ``min_rounds`` upwards are timed (best of ``samples``) until one exceeds the target.
+    Returns the highest cost within the target, never less than ``min_rounds``, with every timing.
+    """
+    timings: Dict[int, float] = {}
+    recommended = min_rounds
+    for rounds in range(min_rounds, max_rounds + 1):
+        salt = bcrypt.gensalt(rounds=rounds)
+        best = None
+        for _ in range(samples):
+            start = time.perf_counter()
+            bcrypt.hashpw(b"calibration-password", salt)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[rounds] = best
+        if best > target_seconds:
+            break
+        recommended = rounds
+    return recommended, timings
+
+def _get_executor() -> Executor:
+    """Lazily create the worker pool used for bcrypt work, as configured in settings."""
+    global _executor
+    if _executor is None:
+        settings = get_settings()
+        with _executor_lock:
+            if _executor is None:
+                if settings.password_hash_executor == "process":
+                    _executor = ProcessPoolExecutor(max_workers=settings.password_hash_pool_size)
+                else:
+                    _executor = ThreadPoolExecutor(
+                        max_workers=settings.password_hash_pool_size,
+                        thread_name_prefix="password-hash",
+                    )
+    return _executor
+
+async def _run_in_pool(func, *args):
+    """
+    Run a blocking password function on the worker pool without stalling the event loop.
+
+    At most ``password_hash_pool_size + password_hash_max_queue`` jobs may be in flight;
+    anything beyond that is rejected with PasswordHashingBusyError instead of queueing forever.
+    """
+    global _pending_jobs
+    settings = get_settings()
+    with _executor_lock:
+        if _pending_jobs >= settings.password_hash_pool_size + settings.password_hash_max_queue:
+            raise PasswordHashingBusyError("Password hashing queue is full")
+        _pending_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), func, *args)
+    finally:
+        with _executor_lock:
+            _pending_jobs -= 1
+
+async def hash_password_async(password: str, rounds: Optional[int] = None) -> str:
+    """Async variant of hash_password that runs bcrypt on the password worker pool."""
+    # Resolved here: a process pool worker would not see settings changed in this process
+    if rounds is None:
+        rounds = get_settings().password_hash_rounds
+    return await _run_in_pool(hash_password, password, rounds)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Async variant of verify_password that runs bcrypt on the password worker pool."""
+    return await _run_in_pool(verify_password, plain_password, hashed_password)
+
+def shutdown_password_executor(wait: bool = True):
+    """Shut down the password worker pool; it is recreated on next use."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
 def generate_verification_token():
     return secrets.token_urlsafe(16)  # Generates a secure 16-byte URL-safe token
\ No newline at end of file
@@ -1,17 +1,89 @@
 # smtp_client.py
-from builtins import Exception, int, str
+from builtins import Exception, bool, float, int, str
+import asyncio
+import queue
 import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from settings.config import settings
 import logging
 
+class _PooledConnection:
+    """An authenticated SMTP connection plus the exit stack that closes it."""
+    def __init__(self, smtp, stack: ExitStack):
+        self.smtp = smtp
+        self.stack = stack
+        self.last_used = time.monotonic()
+
+    def close(self):
+        try:
+            self.stack.close()  # sends QUIT and closes the socket
+        except Exception as e:
+            logging.debug(f"Error closing SMTP connection: {str(e)}")
+
 class SMTPClient:
-    def __init__(self, server: str, port: int, username: str, password: str):
+    """
+    SMTP client that keeps a small pool of authenticated connections alive between messages.
+
+    Connections idle for longer than ``keepalive_seconds`` are checked with NOOP before reuse,
+    and a send that fails on a reused connection is retried once on a fresh one.
+    ``send_email_async`` runs delivery on a dedicated thread pool so callers never block the event loop.
+    ``timeout`` bounds connecting and every later read or write on the socket, so an unresponsive
+    server cannot hold a worker thread indefinitely.
+    """
+    def __init__(self, server: str, port: int, username: str, password: str,
+                 use_tls: bool = True, pool_size: int = 2, keepalive_seconds: int = 30, timeout: float = 10.0):
         self.server = server
         self.port = port
         self.username = username
         self.password = password
+        self.use_tls = use_tls
+        self.pool_size = pool_size
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._executor = None
+
+    def _connect(self) -> _PooledConnection:
+        stack = ExitStack()
+        try:
+            smtp = stack.enter_context(smtplib.SMTP(self.server, self.port, timeout=self.timeout))
+            if self.use_tls:
+                smtp.starttls()  # Use TLS
+            if self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            stack.close()
+            raise
+        return _PooledConnection(smtp, stack)
+
+    def _is_alive(self, conn: _PooledConnection) -> bool:
+        if time.monotonic() - conn.last_used < self.keepalive_seconds:
+            return True
+        try:
+            return conn.smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _acquire(self):
+        """Return ``(connection, reused)``, preferring a healthy idle connection."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect(), False
+            if self._is_alive(conn):
+                return conn, True
+            conn.close()
+
+    def _release(self, conn: _PooledConnection):
+        conn.last_used = time.monotonic()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
 
     def send_email(self, subject: str, html_content: str, recipient: str):
         try:
@@ -21,13 +93,43 @@ class SMTPClient:
             message['To'] = recipient
             message.attach(MIMEText(html_content, 'html'))
 
-            with smtplib.SMTP(self.server, self.port) as server:
-                server.starttls()  # Use TLS
-                server.login(self.username, self.password)
-                server.sendmail(self.username, recipient, message.as_string())
+            conn, reused = self._acquire()
+            try:
+                conn.smtp.sendmail(self.username, recipient, message.as_string())
+            except (smtplib.SMTPServerDisconnected, OSError):
+                conn.close()
+                if not reused:
+                    raise
+                # The server dropped a pooled connection; reconnect and try once more
+                conn = self._connect()
+                try:
+                    conn.smtp.sendmail(self.username, recipient, message.as_string())
+                except Exception:
+                    conn.close()
+                    raise
+            except Exception:
+                conn.close()
+                raise
+            self._release(conn)
             logging.info(f"Email sent to {recipient}")
         except Exception as e:
             logging.error(f"Failed to send email: {str(e)}")
             raise
 
+    async def send_email_async(self, subject: str, html_content: str, recipient: str):
+        """Deliver an email on the client's worker threads without blocking the event loop."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="smtp")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.send_email, subject, html_content, recipient)
 
+    def close(self):
+        """Close pooled connections and stop the worker threads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -1,11 +1,68 @@
+import html
+import re
+import secrets
+import string
 import markdown2
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+EMAIL_STYLES = {
+    'body': 'font-family: Arial, sans-serif; font-size: 16px; color: #333333; background-color: #ffffff; line-height: 1.5;',
+    'h1': 'font-size: 24px; color: #333333; font-weight: bold; margin-top: 20px; margin-bottom: 10px;',
+    'p': 'font-size: 16px; color: #666666; margin: 10px 0; line-height: 1.6;',
+    'a': 'color: #0056b3; text-decoration: none; font-weight: bold;',
+    'footer': 'font-size: 12px; color: #777777; padding: 20px 0;',
+    'ul': 'list-style-type: none; padding: 0;',
+    'li': 'margin-bottom: 10px;'
+}
+_STYLED_TAG = re.compile('<(%s)>' % '|'.join(tag for tag in EMAIL_STYLES if tag != 'body'))
+
+class CompiledTemplate:
+    """
+    A markdown template rendered to styled HTML once, split into static HTML and the
+    ``str.format`` fields that still need a value, so rendering is just string joins.
+    """
+    _formatter = string.Formatter()
+
+    def __init__(self, parts: List[Tuple[str, Optional[Tuple[str, str, Optional[str]]]]], mtime: float = 0.0):
+        self.parts = parts
+        self.mtime = mtime
+
+    @classmethod
+    def compile(cls, source: str, style, mtime: float = 0.0) -> "CompiledTemplate":
+        # Swap every {field} for an inert marker, run markdown and styling once, then split on the markers
+        nonce = secrets.token_hex(6)
+        fields = []
+        marked = []
+        for literal, field_name, format_spec, conversion in cls._formatter.parse(source):
+            marked.append(literal)
+            if field_name is not None:
+                marked.append(f"tmpl{nonce}x{len(fields)}x")
+                fields.append((field_name, format_spec, conversion))
+        rendered = style(markdown2.markdown(''.join(marked))) if ''.join(marked).strip() else ''
+        pieces = re.split(f"tmpl{nonce}x(\\d+)x", rendered)
+        parts = [(pieces[i], fields[int(pieces[i + 1])] if i + 1 < len(pieces) else None) for i in range(0, len(pieces), 2)]
+        return cls(parts, mtime)
+
+    def render(self, context: dict) -> str:
+        out = []
+        for static, field in self.parts:
+            out.append(static)
+            if field is not None:
+                field_name, format_spec, conversion = field
+                value, _ = self._formatter.get_field(field_name, (), context)
+                value = self._formatter.format_field(self._formatter.convert_field(value, conversion), format_spec)
+                out.append(html.escape(value, quote=True))
+        return ''.join(out)
 
 class TemplateManager:
-    def __init__(self):
+    def __init__(self, auto_reload: bool = False):
         # Dynamically determine the root path of the project
         self.root_dir = Path(__file__).resolve().parent.parent.parent  # Adjust this depending on the structure
         self.templates_dir = self.root_dir / 'email_templates'
+        # Re-check template mtimes on every render; meant for development
+        self.auto_reload = auto_reload
+        self._compiled: Dict[str, CompiledTemplate] = {}
 
     def _read_template(self, filename: str) -> str:
         """Private method to read template content."""
@@ -13,34 +70,38 @@ class TemplateManager:
         with open(template_path, 'r', encoding='utf-8') as file:
             return file.read()
 
+    def _style_tags(self, html: str) -> str:
+        """Inline the per-tag styles in a single pass over the HTML."""
+        return _STYLED_TAG.sub(lambda m: f'<{m.group(1)} style="{EMAIL_STYLES[m.group(1)]}">', html)
+
     def _apply_email_styles(self, html: str) -> str:
         """Apply advanced CSS styles inline for email compatibility with excellent typography."""
-        styles = {
-            'body': 'font-family: Arial, sans-serif; font-size: 16px; color: #333333; background-color: #ffffff; line-height: 1.5;',
-            'h1': 'font-size: 24px; color: #333333; font-weight: bold; margin-top: 20px; margin-bottom: 10px;',
-            'p': 'font-size: 16px; color: #666666; margin: 10px 0; line-height: 1.6;',
-            'a': 'color: #0056b3; text-decoration: none; font-weight: bold;',
-            'footer': 'font-size: 12px; color: #777777; padding: 20px 0;',
-            'ul': 'list-style-type: none; padding: 0;',
-            'li': 'margin-bottom: 10px;'
-        }
         # Wrap entire HTML content in <div> with body style
-        styled_html = f'<div style="{styles["body"]}">{html}</div>'
-        # Apply styles to each HTML element
-        for tag, style in styles.items():
-            if tag != 'body':  # Skip the body style since it's already applied to the <div>
-                styled_html = styled_html.replace(f'<{tag}>', f'<{tag} style="{style}">')
-        return styled_html
+        return f'<div style="{EMAIL_STYLES["body"]}">{self._style_tags(html)}</div>'
 
-    def render_template(self, template_name: str, **context) -> str:
-        """Render a markdown template with given context, applying advanced email styles."""
-        header = self._read_template('header.md')
-        footer = self._read_template('footer.md')
+    def _mtime(self, filename: str) -> float:
+        try:
+            return (self.templates_dir / filename).stat().st_mtime
+        except OSError:
+            return 0.0
+
+    def _get_compiled(self, filename: str) -> CompiledTemplate:
+        compiled = self._compiled.get(filename)
+        if compiled is not None and not (self.auto_reload and self._mtime(filename) != compiled.mtime):
+            return compiled
+        mtime = self._mtime(filename)
+        compiled = CompiledTemplate.compile(self._read_template(filename), self._style_tags, mtime)
+        self._compiled[filename] = compiled
+        return compiled
 
-        # Read main template and format it with provided context
-        main_template = self._read_template(f'{template_name}.md')
-        main_content = main_template.format(**context)
+    def preload(self):
+        """Compile the header, footer and every template in the templates directory up front."""
+        for path in sorted(self.templates_dir.glob('*.md')):
+            self._get_compiled(path.name)
 
-        full_markdown = f"{header}\n{main_content}\n{footer}"
-        html_content = markdown2.markdown(full_markdown)
-        return self._apply_email_styles(html_content)
+    def render_template(self, template_name: str, **context) -> str:
+        """Render a markdown template with given context, applying advanced email styles."""
+        header = self._get_compiled('header.md').render(context)
+        footer = self._get_compiled('footer.md').render(context)
+        main_content = self._get_compiled(f'{template_name}.md').render(context)
+        return f'<div style="{EMAIL_STYLES["body"]}">{header}{main_content}{footer}</div>'
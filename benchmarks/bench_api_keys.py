@@ -0,0 +1,97 @@
+"""
+Cost of a service call authenticated with an API key versus logging in with a password first:
+
+    python -m benchmarks.bench_api_keys --iterations 200
+
+Every variant fetches GET /users/{id}. A password caller pays bcrypt on each login; an API key is
+one indexed lookup plus an HMAC, or nothing at all once its verification is cached in process.
+"""
+from builtins import print, range
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from app.database import Base, Database
+from app.dependencies import get_settings
+from app.main import app
+from app.models.api_key_model import ApiKey
+from app.models.user_model import User, UserRole
+from app.services.api_key_service import (
+    ApiKeyService, clear_api_key_cache, start_api_key_usage_recorder, stop_api_key_usage_recorder,
+)
+from app.utils.security import hash_password
+from benchmarks.common import print_summary
+
+PASSWORD = "Bench*Password1"
+
+
+async def timed_gets(client, path, headers, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    return samples
+
+
+async def main(args):
+    settings = get_settings()
+    # Repeated logins by one user would trip the rate limiter, which is not what is measured here
+    settings.rate_limit_enabled = False
+    Database.initialize(settings.database_url)
+    engine = Database._engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = Database.get_session_factory()
+    run_id = uuid4().hex[:8]
+    admin = User(
+        nickname=f"bench_apikey_{run_id}", email=f"bench_apikey_{run_id}@example.com",
+        hashed_password=hash_password(PASSWORD), role=UserRole.ADMIN, email_verified=True,
+    )
+    async with session_factory() as session:
+        session.add(admin)
+        await session.commit()
+        api_key, key = await ApiKeyService.create(session, f"bench-{run_id}", [UserRole.ADMIN], admin.id)
+
+    # Usage is counted by the batched recorder, as it is in the running app
+    await start_api_key_usage_recorder(session_factory)
+    path = f"/users/{admin.id}"
+    login_samples = []
+    try:
+        async with AsyncClient(app=app, base_url="http://benchmark") as client:
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                response = await client.post("/login/", data={"username": admin.email, "password": PASSWORD})
+                response.raise_for_status()
+                headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+                (await client.get(path, headers=headers)).raise_for_status()
+                login_samples.append((time.perf_counter() - start) * 1000)
+
+            cache_size = settings.api_key_cache_size
+            settings.api_key_cache_size = 0
+            uncached = await timed_gets(client, path, {"X-API-Key": key}, args.iterations)
+            settings.api_key_cache_size = cache_size
+            clear_api_key_cache()
+            cached = await timed_gets(client, path, {"X-API-Key": key}, args.iterations)
+        print_summary("login + GET (bcrypt)", login_samples)
+        print_summary("GET with X-API-Key, uncached", uncached)
+        print_summary("GET with X-API-Key, cached", cached)
+    finally:
+        await stop_api_key_usage_recorder()
+        async with session_factory() as session:
+            await session.execute(delete(ApiKey).where(ApiKey.id == api_key.id))
+            await session.execute(delete(User).where(User.id == admin.id))
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,95 @@
+"""
+Throughput of an admin ``GET /users/{id}`` with and without the per-request user lookup.
+
+Runs the same request load twice: once loading the caller with ``get_current_user`` (the default),
+once with ``auth_trust_token_claims`` so ``require_role`` authorizes from the signed claims:
+
+    python -m benchmarks.bench_auth_claims --requests 5000 --concurrency 20
+"""
+from builtins import dict, len, list, print, range, str
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from app.database import Base, Database
+from app.dependencies import get_settings
+from app.main import app
+from app.models.user_model import User, UserRole
+from app.services.jwt_service import access_token_lifetime, create_access_token
+from app.utils.security import hash_password
+from benchmarks.common import print_summary
+
+
+async def worker(client: AsyncClient, path: str, headers: dict, remaining: list, samples: list):
+    while remaining:
+        remaining.pop()
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+
+
+async def run(client: AsyncClient, admin: User, requests: int, concurrency: int, report: bool = True):
+    settings = get_settings()
+    token = create_access_token(
+        data={"sub": str(admin.id), "role": admin.role.name, "ver": admin.token_version},
+        expires_delta=access_token_lifetime(),
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+    label = "trusted claims" if settings.auth_trust_token_claims else "user lookup"
+    samples = []
+    remaining = list(range(requests))
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        worker(client, f"/users/{admin.id}", headers, remaining, samples) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    if not report:
+        return
+    print_summary(f"GET /users/{{id}} ({label})", samples)
+    print(f"{'':<32} {len(samples)} requests in {elapsed:.2f}s = {len(samples) / elapsed:8.1f} req/s")
+
+
+async def main(args):
+    settings = get_settings()
+    Database.initialize(settings.database_url)
+    engine = Database._engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = Database.get_session_factory()
+    run_id = uuid4().hex[:8]
+    admin = User(
+        nickname=f"bench_admin_{run_id}", email=f"bench_admin_{run_id}@example.com",
+        hashed_password=hash_password("Bench*Password1"), role=UserRole.ADMIN, email_verified=True,
+    )
+    async with session_factory() as session:
+        session.add(admin)
+        await session.commit()
+
+    trust_claims = settings.auth_trust_token_claims
+    try:
+        async with AsyncClient(app=app, base_url="http://benchmark") as client:
+            # Warm up connections and statement caches before measuring
+            settings.auth_trust_token_claims = False
+            await run(client, admin, args.concurrency * 10, args.concurrency, report=False)
+            for trusted in (False, True):
+                settings.auth_trust_token_claims = trusted
+                await run(client, admin, args.requests, args.concurrency)
+    finally:
+        settings.auth_trust_token_claims = trust_claims
+        async with session_factory() as session:
+            await session.execute(delete(User).where(User.id == admin.id))
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
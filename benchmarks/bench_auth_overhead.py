@@ -0,0 +1,45 @@
+"""
+Per-request cost of the auth dependency, verifying the bearer token every time versus reusing
+the verified-token cache in ``jwt_service.decode_token``:
+
+    python -m benchmarks.bench_auth_overhead --calls 100000
+
+No database is involved: this times ``get_token_claims``, the part every authenticated request pays.
+"""
+from builtins import min, print, range, str
+import argparse
+import time
+from uuid import uuid4
+
+from app.dependencies import get_settings, get_token_claims
+from app.services.jwt_service import clear_token_cache, create_access_token, token_cache_stats
+
+
+def time_calls(token: str, calls: int) -> float:
+    """Mean microseconds per get_token_claims call."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        get_token_claims(token)
+    return (time.perf_counter() - start) / calls * 1_000_000
+
+
+def main(args):
+    settings = get_settings()
+    cache_size = settings.jwt_verify_cache_size
+    token = create_access_token(data={"sub": str(uuid4()), "role": "ADMIN", "ver": 0})
+    try:
+        for label, size in (("jwt.decode every call", 0), (f"verified-token cache ({cache_size})", cache_size)):
+            settings.jwt_verify_cache_size = size
+            clear_token_cache()
+            time_calls(token, min(args.calls, 1000))  # warm-up
+            per_call = time_calls(token, args.calls)
+            print(f"{label:<36} {per_call:8.2f} us/call")
+        print(f"cache stats: {token_cache_stats()}")
+    finally:
+        settings.jwt_verify_cache_size = cache_size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=100_000)
+    main(parser.parse_args())
@@ -0,0 +1,108 @@
+"""
+p99 latency of ``GET /users/{id}`` while logins run concurrently.
+
+Compares the worker-pool password helpers with the previous behaviour of calling bcrypt
+directly on the event loop (``--blocking``):
+
+    python -m benchmarks.bench_login_contention
+    python -m benchmarks.bench_login_contention --blocking
+"""
+from builtins import len, range, str
+import argparse
+import asyncio
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from app.database import Base, Database
+from app.dependencies import get_settings
+from app.main import app
+from app.models.user_model import User, UserRole
+from app.services import user_service
+from app.services.jwt_service import create_access_token
+from app.utils.security import hash_password, verify_password
+from benchmarks.common import print_summary
+
+PASSWORD = "Bench*Password1"
+
+
+async def seed_users(session_factory, count: int):
+    hashed = hash_password(PASSWORD)
+    run_id = uuid4().hex[:8]
+    admin = User(
+        nickname=f"bench_admin_{run_id}", email=f"bench_admin_{run_id}@example.com",
+        hashed_password=hashed, role=UserRole.ADMIN, email_verified=True,
+    )
+    logins = [
+        User(
+            nickname=f"bench_{run_id}_{i}", email=f"bench_{run_id}_{i}@example.com",
+            hashed_password=hashed, role=UserRole.AUTHENTICATED, email_verified=True,
+        )
+        for i in range(count)
+    ]
+    async with session_factory() as session:
+        session.add_all([admin, *logins])
+        await session.commit()
+    return admin, logins
+
+
+async def login_loop(client: AsyncClient, users, stop: asyncio.Event):
+    i = 0
+    while not stop.is_set():
+        user = users[i % len(users)]
+        await client.post("/login/", data={"username": user.email, "password": PASSWORD})
+        i += 1
+
+
+async def main(args):
+    settings = get_settings()
+    # Every login comes from one client address; this measures bcrypt, not the rate limiter
+    settings.rate_limit_enabled = False
+    Database.initialize(settings.database_url)
+    engine = Database._engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    if args.blocking:
+        async def blocking_verify(plain, hashed):
+            return verify_password(plain, hashed)
+        user_service.verify_password_async = blocking_verify
+
+    session_factory = Database.get_session_factory()
+    admin, logins = await seed_users(session_factory, args.login_users)
+    token = create_access_token(data={"sub": str(admin.id), "role": admin.role.name}, expires_delta=timedelta(minutes=30))
+    headers = {"Authorization": f"Bearer {token}"}
+
+    samples = []
+    async with AsyncClient(app=app, base_url="http://benchmark") as client:
+        stop = asyncio.Event()
+        loggers_in = [asyncio.create_task(login_loop(client, logins, stop)) for _ in range(args.login_concurrency)]
+        deadline = time.perf_counter() + args.duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await client.get(f"/users/{admin.id}", headers=headers)
+            samples.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(args.interval)
+        stop.set()
+        await asyncio.gather(*loggers_in)
+
+    mode = "blocking bcrypt" if args.blocking else f"{settings.password_hash_executor} pool"
+    print_summary(f"GET /users/{{id}} ({mode})", samples)
+
+    async with session_factory() as session:
+        await session.execute(delete(User).where(User.id.in_([admin.id, *[u.id for u in logins]])))
+        await session.commit()
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocking", action="store_true", help="call bcrypt directly on the event loop")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to sample for")
+    parser.add_argument("--interval", type=float, default=0.01, help="pause between GET requests")
+    parser.add_argument("--login-users", type=int, default=20)
+    parser.add_argument("--login-concurrency", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
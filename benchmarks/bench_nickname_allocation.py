@@ -0,0 +1,119 @@
+"""
+Cost of picking a free nickname when the users table already holds 100k / 1M rows.
+
+Compares the previous scheme (5 adjectives x 5 animals x 1000 numbers, one lookup per attempt),
+a random draw from the current word lists with the same lookup loop, and ``NicknameAllocator``:
+
+    python -m benchmarks.bench_nickname_allocation --existing 100000 1000000
+
+Each run seeds the table, reports latency and database queries per nickname, and drops it again.
+"""
+from builtins import dict, len, list, max, print, range, str
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import select, text
+
+from app.database import Base, Database
+from app.dependencies import get_settings
+from app.models.user_model import User, nickname_sequence
+from app.utils.nickname_gen import NicknameAllocator, generate_nickname
+from benchmarks.common import print_summary
+
+LEGACY_ADJECTIVES = ["clever", "jolly", "brave", "sly", "gentle"]
+LEGACY_ANIMALS = ["panda", "fox", "raccoon", "koala", "lion"]
+
+SEED_SQL = """
+INSERT INTO users (id, nickname, email, role, is_professional, failed_login_attempts,
+                   is_locked, email_verified, hashed_password, created_at, updated_at)
+SELECT gen_random_uuid(), n.nickname, 'seed' || n.i || '@example.com', 'AUTHENTICATED',
+       false, 0, false, true, 'x', now(), now()
+FROM unnest(CAST(:nicknames AS text[])) WITH ORDINALITY AS n(nickname, i)
+"""
+
+
+def legacy_generate_nickname() -> str:
+    return f"{random.choice(LEGACY_ADJECTIVES)}_{random.choice(LEGACY_ANIMALS)}_{random.randint(0, 999)}"
+
+
+def seed_nicknames(allocator: NicknameAllocator, existing: int):
+    """
+    Every legacy name first (the old space only holds 25k), then names the allocator already handed
+    out. A few allocator names coincide with legacy ones; create() retries those, here they are dropped.
+    """
+    legacy = [f"{a}_{b}_{n}" for a in LEGACY_ADJECTIVES for b in LEGACY_ANIMALS for n in range(1000)]
+    allocated = [allocator.nickname_for(p) for p in range(max(0, existing - len(legacy)))]
+    return list(dict.fromkeys(legacy + allocated))[:existing], len(allocated)
+
+
+async def probe_loop(session, generate, max_attempts: int):
+    """The old create path: draw, look it up, repeat until free. Returns (queries, found)."""
+    for attempt in range(1, max_attempts + 1):
+        taken = (await session.execute(select(User.id).where(User.nickname == generate()))).first()
+        if taken is None:
+            return attempt, True
+    return max_attempts, False
+
+
+async def run_probe(session_factory, label, generate, count: int, max_attempts: int):
+    samples, queries, exhausted = [], 0, 0
+    async with session_factory() as session:
+        for _ in range(count):
+            start = time.perf_counter()
+            used, found = await probe_loop(session, generate, max_attempts)
+            samples.append((time.perf_counter() - start) * 1000)
+            queries += used
+            exhausted += not found
+    print_summary(label, samples)
+    print(f"{'':<32} {queries / count:.2f} queries/nickname, {exhausted}/{count} gave up after {max_attempts} attempts")
+
+
+async def run_allocator(session_factory, allocator: NicknameAllocator, count: int):
+    samples, queries = [], 0
+    async with session_factory() as session:
+        for _ in range(count):
+            before = allocator._end
+            start = time.perf_counter()
+            await allocator.allocate(session)
+            samples.append((time.perf_counter() - start) * 1000)
+            queries += allocator._end != before
+    print_summary("NicknameAllocator", samples)
+    print(f"{'':<32} {queries / count:.2f} queries/nickname")
+
+
+async def bench(engine, session_factory, existing: int, args):
+    allocator = NicknameAllocator.from_word_files(nickname_sequence)
+    nicknames, allocated = seed_nicknames(allocator, existing)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(SEED_SQL), {"nicknames": nicknames})
+        # The sequence has already handed out the positions used by the seeded names
+        await conn.execute(text("SELECT setval('users_nickname_seq', :position, false)"), {"position": allocated})
+        await conn.execute(text("ANALYZE users"))
+    try:
+        print(f"--- {existing} existing users ---")
+        await run_probe(session_factory, "legacy random + lookup", legacy_generate_nickname, args.count, args.max_attempts)
+        await run_probe(session_factory, "word lists random + lookup", generate_nickname, args.count, args.max_attempts)
+        await run_allocator(session_factory, allocator, args.count)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+
+
+async def main(args):
+    Database.initialize(get_settings().database_url)
+    engine = Database._engine
+    session_factory = Database.get_session_factory()
+    for existing in args.existing:
+        await bench(engine, session_factory, existing, args)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--count", type=int, default=1000, help="nicknames to pick per scenario")
+    parser.add_argument("--max-attempts", type=int, default=50, help="give up on the lookup loop after this many tries")
+    asyncio.run(main(parser.parse_args()))
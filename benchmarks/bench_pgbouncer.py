@@ -0,0 +1,95 @@
+"""
+Compare query throughput directly against Postgres and through a transaction pooler:
+
+    python -m benchmarks.bench_pgbouncer --clients 20 --server-connections 4
+
+Runs a search_users-style query (``email LIKE``, ``ORDER BY``, ``LIMIT``) from --clients concurrent
+clients, each in its own short transaction, in four setups: direct with asyncpg's statement
+cache, direct in PgBouncer mode, and through the pooler in both modes. The pooler is the
+stand-in from ``benchmarks.pgbouncer_standin`` unless --pooler-url points at a real PgBouncer
+(``pool_mode = transaction``). Default mode behind the pooler is expected to fail with
+"prepared statement ... does not exist"; its errors are counted, not raised.
+"""
+from builtins import Exception, len, print, range
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import Base, engine_options
+from app.dependencies import get_settings
+from benchmarks.common import print_summary
+from benchmarks.pgbouncer_standin import TransactionPoolingProxy
+
+QUERY = text(
+    "SELECT id, nickname, email FROM users WHERE email LIKE :pattern ORDER BY created_at DESC LIMIT 10"
+)
+
+
+async def run(label, url, pgbouncer_mode, args):
+    settings = get_settings().model_copy(update={"db_pgbouncer_mode": pgbouncer_mode})
+    engine = create_async_engine(url, **engine_options(
+        url, settings, pool_size=args.clients, max_overflow=0, connect_args={"ssl": False},
+    ))
+    samples = []
+    errors = 0
+
+    async def client(n):
+        nonlocal errors
+        for i in range(args.requests):
+            start = time.perf_counter()
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(QUERY, {"pattern": f"%{(n + i) % 10}%"})
+            except exc.DBAPIError:
+                errors += 1
+                continue
+            samples.append((time.perf_counter() - start) * 1000)
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(n) for n in range(args.clients)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await engine.dispose()
+    print_summary(label, samples)
+    print(f"{'':<32} {len(samples) / elapsed:.0f} req/s, errors={errors}")
+
+
+async def main(args):
+    url = get_settings().database_url
+    engine = create_async_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+    proxy = None
+    pooler_url = args.pooler_url
+    if pooler_url is None:
+        parsed = make_url(url)
+        proxy = TransactionPoolingProxy(parsed.host, parsed.port or 5432, parsed.username, parsed.database,
+                                        parsed.password, pool_size=args.server_connections)
+        port = await proxy.start()
+        pooler_url = parsed.set(host="127.0.0.1", port=port).render_as_string(hide_password=False)
+    try:
+        await run("direct, statement cache", url, False, args)
+        await run("direct, pgbouncer mode", url, True, args)
+        await run("pooler, pgbouncer mode", pooler_url, True, args)
+        await run("pooler, statement cache", pooler_url, False, args)
+    except Exception as e:
+        print(f"Benchmark failed: {e}")
+    finally:
+        if proxy is not None:
+            print(f"Stand-in ran {proxy.transactions} transactions on {args.server_connections} server connections")
+            await proxy.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent clients, each with its own connection")
+    parser.add_argument("--requests", type=int, default=50, help="Transactions per client")
+    parser.add_argument("--server-connections", type=int, default=4, help="Server connections of the stand-in pooler")
+    parser.add_argument("--pooler-url", default=None, help="A real PgBouncer to use instead of the stand-in")
+    asyncio.run(main(parser.parse_args()))
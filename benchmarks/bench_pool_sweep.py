@@ -0,0 +1,70 @@
+"""
+Sweep the connection pool size against the number of concurrent requests in one worker:
+
+    python -m benchmarks.bench_pool_sweep --pool-sizes 2 5 10 20 --concurrency 10 50 100
+
+Each simulated request checks out a connection and runs a query taking about --query-ms on the
+server. For every combination this prints request latency, throughput and the pool's own
+acquire-time stats, showing where requests start queueing for connections instead of running.
+"""
+from builtins import len, print, range
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import engine_options
+from app.dependencies import get_settings
+from benchmarks.common import print_summary
+
+
+async def open_connection(engine):
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        await asyncio.sleep(0.01)
+
+
+async def run(url, pool_size, concurrency, args):
+    engine = create_async_engine(url, **engine_options(url, pool_size=pool_size, max_overflow=0, pool_timeout=60))
+    query = text("SELECT pg_sleep(:seconds)")
+    samples = []
+
+    async def worker():
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            async with engine.connect() as conn:
+                await conn.execute(query, {"seconds": args.query_ms / 1000})
+            samples.append((time.perf_counter() - start) * 1000)
+
+    try:
+        # Open the pool's connections first so connect time is not part of the sweep
+        await asyncio.gather(*(open_connection(engine) for _ in range(pool_size)))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stats = engine.pool.snapshot()
+    finally:
+        await engine.dispose()
+    label = f"pool={pool_size} concurrency={concurrency}"
+    print_summary(label, samples)
+    acquire = stats["acquire"]
+    print(f"{'':<32} {len(samples) / elapsed:.0f} req/s, acquire mean={acquire['mean_ms']:.2f}ms "
+          f"max={acquire['max_ms']:.2f}ms, timeouts={stats['timeouts']}")
+
+
+async def main(args):
+    url = get_settings().database_url
+    for pool_size in args.pool_sizes:
+        for concurrency in args.concurrency:
+            await run(url, pool_size, concurrency, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[2, 5, 10, 20])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--requests", type=int, default=20, help="Requests per concurrent client")
+    parser.add_argument("--query-ms", type=float, default=2.0, help="Server-side time of each query")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,27 @@
+"""
+Per-call overhead of the settings dependency.
+
+Compares constructing a fresh ``Settings()`` (the previous behaviour of ``get_settings()``)
+with the cached provider:
+
+    python -m benchmarks.bench_settings
+"""
+from builtins import print, range
+import argparse
+import timeit
+
+from settings.config import Settings, get_settings
+
+
+def main(args):
+    get_settings()  # warm the cache
+    for label, func in (("Settings() per call", Settings), ("cached get_settings()", get_settings)):
+        total = min(timeit.repeat(func, number=args.calls, repeat=args.repeat))
+        print(f"{label:<24} {total / args.calls * 1e6:10.2f} us/call")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
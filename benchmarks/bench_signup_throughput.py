@@ -0,0 +1,81 @@
+"""
+Signups per second through ``UserService.create`` with concurrent sessions.
+
+bcrypt dominates a real signup, so ``--fast-hash`` swaps in a constant hash to show the
+database side of the path on its own:
+
+    python -m benchmarks.bench_signup_throughput --signups 2000 --concurrency 20 --fast-hash
+"""
+from builtins import print, range
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from sqlalchemy import delete
+
+from app.database import Base, Database
+from app.dependencies import get_settings
+from app.models.email_outbox_model import EmailOutbox
+from app.models.user_model import User
+from app.services import user_service
+from app.services.email_service import EmailService
+from app.services.user_service import UserService
+from app.utils.security import hash_password
+from app.utils.template_manager import TemplateManager
+
+PASSWORD = "Bench*Password1"
+
+
+async def signup_worker(session_factory, email_service, queue: asyncio.Queue, counts: dict):
+    while True:
+        try:
+            email = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        async with session_factory() as session:
+            user = await UserService.create(session, {"email": email, "password": PASSWORD}, email_service)
+        counts["ok" if user is not None else "failed"] += 1
+
+
+async def main(args):
+    Database.initialize(get_settings().database_url)
+    engine = Database._engine
+    session_factory = Database.get_session_factory()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    if args.fast_hash:
+        hashed = hash_password(PASSWORD)
+        async def constant_hash(password, rounds=12):
+            return hashed
+        user_service.hash_password_async = constant_hash
+
+    email_service = EmailService(template_manager=TemplateManager())
+    run_id = uuid4().hex[:8]
+    queue = asyncio.Queue()
+    for i in range(args.signups):
+        queue.put_nowait(f"signup_{run_id}_{i}@example.com")
+
+    counts = {"ok": 0, "failed": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        signup_worker(session_factory, email_service, queue, counts) for _ in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    hashing = "constant hash" if args.fast_hash else "bcrypt"
+    print(f"{counts['ok']} signups ({counts['failed']} failed, {hashing}) in {elapsed:.2f}s = {counts['ok'] / elapsed:8.1f} signups/s")
+
+    async with engine.begin() as conn:
+        pattern = f"signup_{run_id}_%"
+        await conn.execute(delete(EmailOutbox).where(EmailOutbox.recipient.like(pattern)))
+        await conn.execute(delete(User).where(User.email.like(pattern)))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--signups", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--fast-hash", action="store_true", help="replace bcrypt with a constant hash")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Email throughput in messages per second against a local aiosmtpd sink.
+
+Compares the previous transport (a fresh SMTP connection per message, sent on the event loop)
+with the pooled ``SMTPClient.send_email_async``:
+
+    python -m benchmarks.bench_smtp_throughput --messages 500
+
+aiosmtpd is a development dependency: ``pip install -r requirements-dev.txt``.
+"""
+from builtins import print, range
+import argparse
+import asyncio
+import smtplib
+import socket
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from aiosmtpd.controller import Controller
+
+from app.utils.smtp_connection import SMTPClient
+
+SENDER = "bench@example.com"
+HTML = "<p>Please verify your email.</p>" * 20
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+
+def send_with_fresh_connection(port: int, recipient: str):
+    """The transport used before pooling: connect, send one message, disconnect."""
+    message = MIMEMultipart('alternative')
+    message['Subject'] = "Verify Your Account"
+    message['From'] = SENDER
+    message['To'] = recipient
+    message.attach(MIMEText(HTML, 'html'))
+    with smtplib.SMTP("127.0.0.1", port) as server:
+        server.sendmail(SENDER, recipient, message.as_string())
+
+
+async def run_fresh(port: int, messages: int):
+    for i in range(messages):
+        send_with_fresh_connection(port, f"user{i}@example.com")
+
+
+async def run_pooled(port: int, messages: int, pool_size: int):
+    client = SMTPClient("127.0.0.1", port, SENDER, "", use_tls=False, pool_size=pool_size)
+    try:
+        await asyncio.gather(*(
+            client.send_email_async("Verify Your Account", HTML, f"user{i}@example.com")
+            for i in range(messages)
+        ))
+    finally:
+        client.close()
+
+
+def main(args):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        for label, coro in (
+            ("connection per message", lambda: run_fresh(port, args.messages)),
+            (f"pooled (pool_size={args.pool_size})", lambda: run_pooled(port, args.messages, args.pool_size)),
+        ):
+            before = handler.received
+            start = time.perf_counter()
+            asyncio.run(coro())
+            elapsed = time.perf_counter() - start
+            sent = handler.received - before
+            print(f"{label:<28} {sent} messages in {elapsed:.2f}s = {sent / elapsed:8.1f} msg/s")
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    main(parser.parse_args())
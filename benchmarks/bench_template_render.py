@@ -0,0 +1,60 @@
+"""
+Bulk render time for verification emails.
+
+Compares the previous TemplateManager behaviour (read header, footer and body from disk,
+run markdown over the whole document and one str.replace per styled tag, for every email)
+with the compiled template cache:
+
+    python -m benchmarks.bench_template_render --emails 10000
+"""
+from builtins import open, print, range
+import argparse
+import time
+
+import markdown2
+
+from app.utils.template_manager import EMAIL_STYLES, TemplateManager
+
+
+def legacy_render(tm: TemplateManager, template_name: str, **context) -> str:
+    def read(filename):
+        with open(tm.templates_dir / filename, 'r', encoding='utf-8') as file:
+            return file.read()
+    header = read('header.md')
+    footer = read('footer.md')
+    main_content = read(f'{template_name}.md').format(**context)
+    html = markdown2.markdown(f"{header}\n{main_content}\n{footer}")
+    styled_html = f'<div style="{EMAIL_STYLES["body"]}">{html}</div>'
+    for tag, style in EMAIL_STYLES.items():
+        if tag != 'body':
+            styled_html = styled_html.replace(f'<{tag}>', f'<{tag} style="{style}">')
+    return styled_html
+
+
+def contexts(count: int):
+    for i in range(count):
+        yield {
+            "name": f"User {i}",
+            "verification_url": f"http://localhost/verify-email/{i:08d}/token{i}",
+            "email": f"user{i}@example.com",
+        }
+
+
+def main(args):
+    tm = TemplateManager()
+    tm.preload()
+    for label, render in (
+        ("legacy (disk + markdown per email)", lambda ctx: legacy_render(tm, 'email_verification', **ctx)),
+        ("compiled template cache", lambda ctx: tm.render_template('email_verification', **ctx)),
+    ):
+        start = time.perf_counter()
+        for ctx in contexts(args.emails):
+            render(ctx)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<36} {args.emails} emails in {elapsed:.2f}s = {elapsed / args.emails * 1e6:8.1f} us/email")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=10000)
+    main(parser.parse_args())
@@ -0,0 +1,73 @@
+"""
+Cost of renewing a session with a refresh token versus logging in again with the password:
+
+    python -m benchmarks.bench_token_refresh --iterations 200
+
+Both go through the HTTP routes; a login runs bcrypt, a refresh is one indexed UPDATE/INSERT statement.
+"""
+from builtins import print, range
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from app.database import Base, Database
+from app.dependencies import get_settings
+from app.main import app
+from app.models.user_model import User, UserRole
+from app.utils.security import hash_password
+from benchmarks.common import print_summary
+
+PASSWORD = "Bench*Password1"
+
+
+async def main(args):
+    # Repeated logins by one user would trip the rate limiter, which is not what is measured here
+    get_settings().rate_limit_enabled = False
+    Database.initialize(get_settings().database_url)
+    engine = Database._engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    session_factory = Database.get_session_factory()
+    run_id = uuid4().hex[:8]
+    user = User(
+        nickname=f"bench_refresh_{run_id}", email=f"bench_refresh_{run_id}@example.com",
+        hashed_password=hash_password(PASSWORD), role=UserRole.AUTHENTICATED, email_verified=True,
+    )
+    async with session_factory() as session:
+        session.add(user)
+        await session.commit()
+
+    login_samples, refresh_samples = [], []
+    try:
+        async with AsyncClient(app=app, base_url="http://benchmark") as client:
+            refresh_token = None
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                response = await client.post("/login/", data={"username": user.email, "password": PASSWORD})
+                login_samples.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+                refresh_token = response.json()["refresh_token"]
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                response = await client.post("/token/refresh", json={"refresh_token": refresh_token})
+                refresh_samples.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+                refresh_token = response.json()["refresh_token"]
+        print_summary("POST /login/ (bcrypt)", login_samples)
+        print_summary("POST /token/refresh", refresh_samples)
+    finally:
+        async with session_factory() as session:
+            await session.execute(delete(User).where(User.id == user.id))
+            await session.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
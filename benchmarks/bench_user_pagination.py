@@ -0,0 +1,73 @@
+"""
+Latency of fetching a deep page of ``UserService.search_users``, OFFSET versus keyset cursor:
+
+    python -m benchmarks.bench_user_pagination --rows 1000000 --page 1000
+    python -m benchmarks.bench_user_pagination --total-mode estimated
+
+Rows are generated with ``generate_series`` (see ``bench_user_search``) and dropped afterwards.
+"""
+from builtins import print, range
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import select, text
+
+from app.database import Base, Database
+from app.dependencies import get_settings
+from app.models.user_model import User
+from app.schemas.pagination_schema import TotalMode
+from app.services.user_service import UserService
+from benchmarks.bench_user_search import SEED_SQL
+from benchmarks.common import print_summary
+
+
+async def time_page(session_factory, repeat: int, **kwargs):
+    samples = []
+    async with session_factory() as session:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await UserService.search_users(session, **kwargs)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def main(args):
+    Database.initialize(get_settings().database_url)
+    engine = Database._engine
+    session_factory = Database.get_session_factory()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(SEED_SQL), {"rows": args.rows})
+        await conn.execute(text("ANALYZE users"))
+
+    skip = (args.page - 1) * args.limit
+    try:
+        # The cursor a client would hold after walking to the requested page: the last row of the previous one
+        async with session_factory() as session:
+            row = (await session.execute(
+                select(User.created_at, User.id)
+                .order_by(User.created_at.desc(), User.id.desc())
+                .offset(skip - 1).limit(1)
+            )).one()
+        after = (row.created_at, row.id)
+
+        mode = TotalMode(args.total_mode)
+        offset_samples = await time_page(session_factory, args.repeat, skip=skip, limit=args.limit, total_mode=mode)
+        cursor_samples = await time_page(session_factory, args.repeat, after=after, limit=args.limit, total_mode=mode)
+        print_summary(f"page {args.page}, skip/limit, total={mode.value}", offset_samples)
+        print_summary(f"page {args.page}, cursor, total={mode.value}", cursor_samples)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--total-mode", choices=[m.value for m in TotalMode], default=TotalMode.EXACT.value)
+    asyncio.run(main(parser.parse_args()))
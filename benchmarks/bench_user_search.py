@@ -0,0 +1,74 @@
+"""
+Latency of ``UserService.search_users(q=...)`` on a large users table, with and without the
+trigram indexes:
+
+    python -m benchmarks.bench_user_search --rows 1000000
+
+Rows are generated server-side with ``generate_series`` into an empty database; the table is
+dropped again afterwards. Needs the pg_trgm extension.
+"""
+from builtins import print, range
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from app.database import Base, Database
+from app.dependencies import get_settings
+from app.services.user_service import UserService
+from benchmarks.common import print_summary
+
+SEARCH_COLUMNS = ("first_name", "last_name", "email", "nickname")
+
+SEED_SQL = """
+INSERT INTO users (id, nickname, email, first_name, last_name, role, is_professional,
+                   failed_login_attempts, is_locked, email_verified, hashed_password, created_at, updated_at)
+SELECT gen_random_uuid(), 'nick_' || md5(i::text), 'user' || i || '@example.com',
+       'first_' || substr(md5(i::text || 'f'), 1, 8), 'last_' || substr(md5(i::text || 'l'), 1, 8),
+       'AUTHENTICATED', false, 0, false, true, 'x', now() - (i || ' seconds')::interval, now()
+FROM generate_series(1, :rows) AS i
+"""
+
+
+async def time_searches(session_factory, queries, repeat: int):
+    samples = []
+    async with session_factory() as session:
+        for _ in range(repeat):
+            for q in queries:
+                start = time.perf_counter()
+                await UserService.search_users(session, q=q, limit=10)
+                samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def main(args):
+    Database.initialize(get_settings().database_url)
+    engine = Database._engine
+    session_factory = Database.get_session_factory()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(SEED_SQL), {"rows": args.rows})
+        await conn.execute(text("ANALYZE users"))
+
+    queries = ["first_3a", "user12345", "nick_ff0", "last_b7"]
+    try:
+        samples = await time_searches(session_factory, queries, args.repeat)
+        print_summary(f"search_users, trigram indexes ({args.rows} rows)", samples)
+
+        async with engine.begin() as conn:
+            for column in SEARCH_COLUMNS:
+                await conn.execute(text(f"DROP INDEX IF EXISTS ix_users_{column}_trgm"))
+        samples = await time_searches(session_factory, queries, args.repeat)
+        print_summary(f"search_users, no indexes ({args.rows} rows)", samples)
+    finally:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
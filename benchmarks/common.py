@@ -0,0 +1,40 @@
+"""
+Shared helpers for the scripts in this directory.
+
+Benchmarks run against the database configured in settings (the same one the test suite uses),
+so start Postgres first, e.g. ``docker compose up -d postgres``, then run a script as a module:
+
+    python -m benchmarks.bench_login_contention
+"""
+from builtins import int, len, max, min, round, sorted, str
+import statistics
+from typing import Dict, List, Sequence
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """Return the usual latency summary for a list of millisecond samples."""
+    return {
+        "n": len(samples_ms),
+        "mean": statistics.fmean(samples_ms) if samples_ms else 0.0,
+        "p50": percentile(samples_ms, 50),
+        "p95": percentile(samples_ms, 95),
+        "p99": percentile(samples_ms, 99),
+        "max": max(samples_ms) if samples_ms else 0.0,
+    }
+
+
+def print_summary(label: str, samples_ms: List[float]):
+    s = summarize(samples_ms)
+    print(
+        f"{label:<32} n={s['n']:<6} mean={s['mean']:.2f}ms p50={s['p50']:.2f}ms "
+        f"p95={s['p95']:.2f}ms p99={s['p99']:.2f}ms max={s['max']:.2f}ms"
+    )
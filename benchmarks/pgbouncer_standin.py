@@ -0,0 +1,178 @@
+"""
+A minimal PgBouncer-style transaction pooler for local benchmarks and tests.
+
+Clients connect to the proxy as if it were Postgres. Each client is attached to one of a small,
+fixed set of server connections only while it has a transaction or an unfinished request open;
+at every ReadyForQuery in the idle state the server connection goes back to the pool, so the
+next transaction may run on a different server connection, exactly as with ``pool_mode =
+transaction``. Prepared statements are not tracked, like PgBouncer before 1.21 (or with
+``max_prepared_statements = 0``).
+
+Only trust, cleartext and md5 authentication towards the server are supported; clients are not
+authenticated at all. Not for anything but local measurements.
+"""
+from builtins import ConnectionError, Exception, RuntimeError, bytes, dict, int, len, list, str
+import asyncio
+import hashlib
+import struct
+from typing import Dict, Optional, Tuple
+
+SSL_REQUEST = 80877103
+CANCEL_REQUEST = 80877102
+PROTOCOL_3 = 196608
+
+
+async def read_message(reader: asyncio.StreamReader) -> Tuple[bytes, bytes]:
+    """One backend/frontend message as ``(type, raw bytes including the header)``."""
+    header = await reader.readexactly(5)
+    length = struct.unpack("!I", header[1:5])[0]
+    return header[:1], header + await reader.readexactly(length - 4)
+
+
+def message(kind: bytes, payload: bytes = b"") -> bytes:
+    return kind + struct.pack("!I", len(payload) + 4) + payload
+
+
+class ServerConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        self.writer.close()
+
+
+class TransactionPoolingProxy:
+    def __init__(self, host: str, port: int, user: str, database: str, password: Optional[str] = None,
+                 pool_size: int = 2):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.database = database
+        self.password = password
+        self.pool_size = pool_size
+        self.parameters: Dict[str, str] = {}
+        self.transactions = 0
+        self._pool: "asyncio.Queue[ServerConnection]" = asyncio.Queue()
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self, listen_host: str = "127.0.0.1", listen_port: int = 0) -> int:
+        """Open the server connections and start listening; returns the port clients connect to."""
+        for _ in range(self.pool_size):
+            self._pool.put_nowait(await self._open_server_connection())
+        self._server = await asyncio.start_server(self._serve_client, listen_host, listen_port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    async def _open_server_connection(self) -> ServerConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        params = b"".join(f"{k}\0{v}\0".encode() for k, v in (("user", self.user), ("database", self.database)))
+        body = struct.pack("!I", PROTOCOL_3) + params + b"\0"
+        writer.write(struct.pack("!I", len(body) + 4) + body)
+        while True:
+            kind, raw = await read_message(reader)
+            payload = raw[5:]
+            if kind == b"R":
+                code = struct.unpack("!I", payload[:4])[0]
+                if code == 3:
+                    writer.write(message(b"p", (self.password or "").encode() + b"\0"))
+                elif code == 5:
+                    inner = hashlib.md5(((self.password or "") + self.user).encode()).hexdigest()
+                    outer = hashlib.md5(inner.encode() + payload[4:8]).hexdigest()
+                    writer.write(message(b"p", b"md5" + outer.encode() + b"\0"))
+                elif code != 0:
+                    raise RuntimeError(f"Authentication method {code} is not supported by the stand-in")
+            elif kind == b"S":
+                name, value = payload[:-1].split(b"\0", 1)
+                self.parameters[name.decode()] = value.decode()
+            elif kind == b"E":
+                raise ConnectionError(payload.decode(errors="replace"))
+            elif kind == b"Z":
+                return ServerConnection(reader, writer)
+
+    async def _client_startup(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        while True:
+            length = struct.unpack("!I", await reader.readexactly(4))[0]
+            body = await reader.readexactly(length - 4)
+            code = struct.unpack("!I", body[:4])[0]
+            if code == SSL_REQUEST:
+                writer.write(b"N")
+                continue
+            if code == CANCEL_REQUEST:
+                return False
+            break
+        writer.write(message(b"R", struct.pack("!I", 0)))
+        for name, value in self.parameters.items():
+            writer.write(message(b"S", f"{name}\0{value}\0".encode()))
+        writer.write(message(b"K", struct.pack("!II", 0, 0)))
+        writer.write(message(b"Z", b"I"))
+        await writer.drain()
+        return True
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = _ClientSession(self, writer)
+        try:
+            if not await self._client_startup(reader, writer):
+                return
+            while True:
+                kind, raw = await read_message(reader)
+                if kind == b"X":
+                    break
+                await session.send(kind, raw)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            await session.close()
+            writer.close()
+
+
+class _ClientSession:
+    """The server connection a client holds for its current transaction, if any."""
+    def __init__(self, proxy: TransactionPoolingProxy, client_writer: asyncio.StreamWriter):
+        self.proxy = proxy
+        self.client_writer = client_writer
+        self.server: Optional[ServerConnection] = None
+        self.outstanding = 0
+        self._pump: Optional[asyncio.Task] = None
+
+    async def send(self, kind: bytes, raw: bytes):
+        if self.server is None:
+            self.server = await self.proxy._pool.get()
+            self._pump = asyncio.ensure_future(self._forward_responses(self.server))
+        if kind in (b"Q", b"S"):
+            self.outstanding += 1
+        self.server.writer.write(raw)
+        await self.server.writer.drain()
+
+    async def _forward_responses(self, server: ServerConnection):
+        try:
+            while True:
+                kind, raw = await read_message(server.reader)
+                self.client_writer.write(raw)
+                if kind == b"Z":
+                    self.outstanding -= 1
+                    if self.outstanding == 0 and raw[5:6] == b"I":
+                        # Transaction over: the server connection is free for any client
+                        self.server = None
+                        self.proxy.transactions += 1
+                        self.proxy._pool.put_nowait(server)
+                        await self.client_writer.drain()
+                        return
+                await self.client_writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def close(self):
+        if self.server is not None:
+            # The client went away mid-transaction; replace the connection rather than reuse it
+            if self._pump is not None:
+                self._pump.cancel()
+            self.server.close()
+            self.server = None
+            self.proxy._pool.put_nowait(await self.proxy._open_server_connection())
@@ -31,11 +31,15 @@ from faker import Faker
 from app.main import app
 from app.database import Base, Database
 from app.models.user_model import User, UserRole
-from app.dependencies import get_db, get_settings
+from app.dependencies import get_db, get_read_db, get_settings
 from app.utils.security import hash_password
 from app.utils.template_manager import TemplateManager
 from app.services.email_service import EmailService
-from app.services.jwt_service import create_access_token
+from app.services import token_revocation_service
+from app.services.api_key_service import clear_api_key_cache
+from app.services.jwt_service import clear_token_cache, create_access_token
+from app.utils.rate_limit import reset_rate_limiter
+from app.utils.read_your_writes import clear_recent_writers
 
 fake = Faker()
 
@@ -58,6 +62,7 @@ def email_service():
 async def async_client(db_session):
     async with AsyncClient(app=app, base_url="http://testserver") as client:
         app.dependency_overrides[get_db] = lambda: db_session
+        app.dependency_overrides[get_read_db] = lambda: db_session
         try:
             yield client
         finally:
@@ -81,6 +86,20 @@ async def setup_database():
          await conn.run_sync(Base.metadata.drop_all)
     await engine.dispose()
 
+# Process-wide auth state must not leak from one test into the next
+@pytest.fixture(scope="function", autouse=True)
+def reset_auth_state(monkeypatch):
+    monkeypatch.setattr(token_revocation_service, "_revocations", None)
+    clear_token_cache()
+    clear_api_key_cache()
+    reset_rate_limiter()
+    clear_recent_writers()
+    yield
+    clear_token_cache()
+    clear_api_key_cache()
+    reset_rate_limiter()
+    clear_recent_writers()
+
 @pytest.fixture(scope="function")
 async def db_session(setup_database):
     async with AsyncSessionScoped() as session:
@@ -164,10 +183,11 @@ async def users_with_same_role_50_users(db_session):
     users = []
     for _ in range(50):
         user_data = {
-            "nickname": fake.user_name(),
+            # unique: 50 draws from Faker's user_name/email pools collide often enough to flake
+            "nickname": fake.unique.user_name(),
             "first_name": fake.first_name(),
             "last_name": fake.last_name(),
-            "email": fake.email(),
+            "email": fake.unique.email(),
             "hashed_password": fake.password(),
             "role": UserRole.AUTHENTICATED,
             "email_verified": False,
@@ -1,4 +1,4 @@
-from builtins import str
+from builtins import Exception, frozenset, len, range, str
 import pytest
 import app.routers.user_routes as user_routes
 from app.routers.user_routes import upgrade_to_pro, update_my_profile
@@ -8,14 +8,18 @@ from fastapi import HTTPException
 import app.routers.user_routes as ur_mod
 from app.services.user_service import UserService
 from app.dependencies import get_current_user
+from app.schemas.api_key_schema import ApiKeyPrincipal
+from app.schemas.token_schema import TokenClaims
 from app.schemas.user_schemas import UserProfileDTO, UserProfileUpdate
 from app.main import app
 from datetime import datetime
 from app.models.user_model import User, UserRole
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils.nickname_gen import generate_nickname
 from app.utils.security import hash_password
-from app.services.jwt_service import decode_token  # Import your FastAPI app
+from app.services.jwt_service import create_access_token, decode_token  # Import your FastAPI app
+from settings.config import get_settings
 
 # Example of a test function using the async_client fixture
 @pytest.mark.asyncio
@@ -63,13 +67,15 @@ async def test_update_user_email_access_allowed(async_client, admin_user, admin_
 
 
 @pytest.mark.asyncio
-async def test_delete_user(async_client, admin_user, admin_token):
+async def test_delete_user(async_client, db_session, admin_user, admin_token):
     headers = {"Authorization": f"Bearer {admin_token}"}
-    delete_response = await async_client.delete(f"/users/{admin_user.id}", headers=headers)
+    admin_id = admin_user.id
+    delete_response = await async_client.delete(f"/users/{admin_id}", headers=headers)
     assert delete_response.status_code == 204
-    # Verify the user is deleted
-    fetch_response = await async_client.get(f"/users/{admin_user.id}", headers=headers)
-    assert fetch_response.status_code == 404
+    # Verify the user is deleted; the admin deleted itself, so its own token is revoked too
+    fetch_response = await async_client.get(f"/users/{admin_id}", headers=headers)
+    assert fetch_response.status_code == 401
+    assert await UserService.get_by_id(db_session, admin_id) is None
 
 @pytest.mark.asyncio
 async def test_create_user_duplicate_email(async_client, verified_user):
@@ -82,6 +88,23 @@ async def test_create_user_duplicate_email(async_client, verified_user):
     assert response.status_code == 400
     assert "Email already exists" in response.json().get("detail", "")
 
+@pytest.mark.asyncio
+async def test_admin_create_user_duplicate_email(async_client, admin_user, admin_token):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.post("/users/", json={"email": admin_user.email, "password": "AnotherPassword123!"}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already exists"
+
+@pytest.mark.asyncio
+async def test_admin_create_user_failure_is_not_reported_as_duplicate(async_client, admin_token, monkeypatch):
+    async def create(session, user_data, email_service):
+        return None
+    monkeypatch.setattr(UserService, "create", create)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.post("/users/", json={"email": "new_user@example.com", "password": "AnotherPassword123!"}, headers=headers)
+    assert response.status_code == 500
+    assert response.json()["detail"] == "User could not be created"
+
 @pytest.mark.asyncio
 async def test_create_user_invalid_email(async_client):
     user_data = {
@@ -377,13 +400,13 @@ async def test_login_locked_account(
 ):
     """
     If the account is locked, login should return 400 with the appropriate detail.
-    Covers the `if await UserService.is_account_locked(...)` branch.
+    Covers the `if locked:` branch.
     """
-    # 1) Patch is_account_locked → Truee
-    async def fake_is_locked(session, username):
-        return True
+    # 1) Patch authenticate → locked
+    async def fake_authenticate(session, username, password):
+        return None, True
 
-    monkeypatch.setattr(UserService, "is_account_locked", fake_is_locked)
+    monkeypatch.setattr(UserService, "authenticate", fake_authenticate)
 
     # 2) Attempt login
     resp = await async_client.post(
@@ -400,30 +423,29 @@ async def test_login_locked_account(
 async def test_login_success(async_client: AsyncClient, db_session: AsyncSession, monkeypatch):
     """
     If credentials are valid, login should return a bearer token.
-    Covers the path where is_account_locked → False and login_user returns a user.
+    Covers the path where authenticate returns a user and no lock.
     """
-    # 1) Patch is_account_locked → False
-    async def fake_is_locked(session, username):
-        return False
-    monkeypatch.setattr(UserService, "is_account_locked", fake_is_locked)
-
-    # 2) Patch login_user → return dummy user with id and role
+    # 1) Patch authenticate → return dummy user with id and role
     class DummyUser:
         id = uuid4()
         role = UserRole.AUTHENTICATED
-    async def fake_login_user(session, username, password):
-        return DummyUser()
-    monkeypatch.setattr(UserService, "login_user", fake_login_user)
+        token_version = 0
+    async def fake_authenticate(session, username, password):
+        return DummyUser(), False
+    monkeypatch.setattr(UserService, "authenticate", fake_authenticate)
 
-    # 3) Patch create_access_token in the router module so we get a predictable token
+    # 2) Patch create_access_token in the router module so we get a predictable token
     import app.routers.user_routes as ur_mod
     monkeypatch.setattr(
         ur_mod,
         "create_access_token",
         lambda data, expires_delta: "fake-jwt-token"
     )
+    async def fake_issue(session, user_id, family_id=None):
+        return "fake-refresh-token"
+    monkeypatch.setattr(ur_mod.RefreshTokenService, "issue", fake_issue)
 
-    # 4) Perform login requestt
+    # 3) Perform login requestt
     resp = await async_client.post(
         "/login/",
         data={"username": "user@example.com", "password": "ValidPass!"},
@@ -431,26 +453,21 @@ async def test_login_success(async_client: AsyncClient, db_session: AsyncSession
     )
     assert resp.status_code == 200
     body = resp.json()
-    assert body == {"access_token": "fake-jwt-token", "token_type": "bearer"}
+    assert body == {"access_token": "fake-jwt-token", "token_type": "bearer", "refresh_token": "fake-refresh-token"}
 
 
 @pytest.mark.asyncio
 async def test_login_invalid_credentials(async_client: AsyncClient, db_session: AsyncSession, monkeypatch):
     """
-    If credentials are invalid (login_user returns None), login should return 401.
+    If credentials are invalid (authenticate returns no user), login should return 401.
     Covers the final `raise HTTPException(status_code=401)` branch.
     """
-    # 1) Patch is_account_locked → False
-    async def fake_is_locked(session, username):
-        return False
-    monkeypatch.setattr(UserService, "is_account_locked", fake_is_locked)
-
-    # 2) Patch login_user → None
-    async def fake_login_user(session, username, password):
-        return None
-    monkeypatch.setattr(UserService, "login_user", fake_login_user)
+    # 1) Patch authenticate → no user, not locked
+    async def fake_authenticate(session, username, password):
+        return None, False
+    monkeypatch.setattr(UserService, "authenticate", fake_authenticate)
 
-    # 3) Attempt login with bad creds
+    # 2) Attempt login with bad creds
     resp = await async_client.post(
         "/login/",
         data={"username": "doesnotexist@example.com", "password": "wrong"},
@@ -524,6 +541,18 @@ async def test_upgrade_to_pro_insufficient_privileges(db_session: AsyncSession,
     assert exc_info.value.status_code == 403
     assert exc_info.value.detail == "Insufficient privileges"
 
+@pytest.mark.asyncio
+async def test_upgrade_to_pro_accepts_claims_and_api_keys(db_session: AsyncSession, user):
+    """
+    Token claims and API keys are checked by role and scopes like a loaded User.
+    """
+    manager_claims = TokenClaims(id=uuid4(), role=UserRole.MANAGER)
+    assert await upgrade_to_pro(user.id, db_session, manager_claims) == {"message": "Upgraded to professional status"}
+    reader_key = ApiKeyPrincipal(id=uuid4(), name="reader", scopes=frozenset({"AUTHENTICATED"}))
+    with pytest.raises(HTTPException) as exc_info:
+        await upgrade_to_pro(user.id, db_session, reader_key)
+    assert exc_info.value.status_code == 403
+
 @pytest.mark.asyncio
 async def test_upgrade_to_pro_user_not_found(db_session: AsyncSession, admin_user):
     """
@@ -633,4 +662,311 @@ async def test_update_my_profile_direct_success(
     # 6) Confirm DB was updated and refresh() happened
     refreshed = await db_session.get(User, manager_user.id)
     assert refreshed.first_name == "UpdatedFirst"
-    assert refreshed.bio == "New bio"
\ No newline at end of file
+    assert refreshed.bio == "New bio"
+
+@pytest.mark.asyncio
+async def test_list_users_cursor_pagination_visits_every_user_once(async_client, admin_token, users_with_same_role_50_users):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    seen = []
+    response = await async_client.get("/users/", params={"limit": 7}, headers=headers)
+    while True:
+        assert response.status_code == 200
+        body = response.json()
+        seen.extend(item["id"] for item in body["items"])
+        if body["next_cursor"] is None:
+            break
+        assert any(link["rel"] == "next" for link in body["links"])
+        response = await async_client.get("/users/", params={"limit": 7, "cursor": body["next_cursor"]}, headers=headers)
+        assert response.json()["page"] is None
+    # 50 users created in one transaction share created_at, so this also covers the id tiebreak
+    assert len(seen) == len(set(seen)) == body["total"]
+
+@pytest.mark.asyncio
+async def test_list_users_invalid_cursor(async_client, admin_token):
+    response = await async_client.get("/users/", params={"cursor": "not-a-cursor"}, headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_list_users_without_total(async_client, admin_token, users_with_same_role_50_users):
+    response = await async_client.get(
+        "/users/", params={"limit": 10, "total_mode": "none"}, headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] is None and body["total_is_estimate"] is False
+    rels = {link["rel"] for link in body["links"]}
+    assert "next" in rels and "last" not in rels
+
+@pytest.mark.asyncio
+async def test_list_users_estimated_total_with_colon_in_search(async_client, admin_token, users_with_same_role_50_users):
+    response = await async_client.get(
+        "/users/", params={"q": "a :b", "total_mode": "estimated"}, headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    assert response.json()["total"] == 0
+
+@pytest.mark.asyncio
+async def test_login_token_carries_token_version(async_client, verified_user, monkeypatch):
+    monkeypatch.setattr(get_settings(), "auth_trust_token_claims", True)
+    form_data = {"username": verified_user.email, "password": "MySuperPassword$1234"}
+    response = await async_client.post("/login/", data=urlencode(form_data), headers={"Content-Type": "application/x-www-form-urlencoded"})
+    assert response.status_code == 200
+    decoded = decode_token(response.json()["access_token"])
+    assert decoded["ver"] == verified_user.token_version
+    lifetime = decoded["exp"] - datetime.utcnow().timestamp()
+    assert 0 < lifetime <= get_settings().claims_access_token_expire_minutes * 60 + 1
+
+@pytest.mark.asyncio
+async def test_require_role_loads_user_by_default(async_client, admin_user):
+    # A well-signed admin token for a user that is not in the database
+    token = create_access_token(data={"sub": str(uuid4()), "role": "ADMIN"})
+    response = await async_client.get(f"/users/{admin_user.id}", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_require_role_trusts_claims_when_enabled(async_client, admin_user, monkeypatch):
+    monkeypatch.setattr(get_settings(), "auth_trust_token_claims", True)
+    token = create_access_token(data={"sub": str(uuid4()), "role": "ADMIN"})
+    response = await async_client.get(f"/users/{admin_user.id}", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["id"] == str(admin_user.id)
+
+    token = create_access_token(data={"sub": str(uuid4()), "role": "AUTHENTICATED"})
+    response = await async_client.get(f"/users/{admin_user.id}", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+
+    token = create_access_token(data={"sub": str(uuid4())})
+    response = await async_client.get(f"/users/{admin_user.id}", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_stale_token_version_rejected(async_client, db_session, admin_user, admin_token):
+    await UserService.update(db_session, admin_user.id, {"role": "ADMIN"})
+    response = await async_client.get(f"/users/{admin_user.id}", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 401
+
+    token = create_access_token(data={"sub": str(admin_user.id), "role": "ADMIN", "ver": 1})
+    response = await async_client.get(f"/users/{admin_user.id}", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_refresh_token_flow(async_client, verified_user, monkeypatch):
+    form_data = {"username": verified_user.email, "password": "MySuperPassword$1234"}
+    response = await async_client.post("/login/", data=urlencode(form_data), headers={"Content-Type": "application/x-www-form-urlencoded"})
+    assert response.status_code == 200
+    refresh_token = response.json()["refresh_token"]
+
+    async def no_bcrypt(*args):
+        raise AssertionError("refreshing must not verify a password")
+    monkeypatch.setattr(user_routes.UserService, "authenticate", no_bcrypt)
+
+    response = await async_client.post("/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["refresh_token"] != refresh_token
+    decoded = decode_token(body["access_token"])
+    assert decoded["sub"] == str(verified_user.id) and decoded["role"] == "AUTHENTICATED"
+
+    # A refresh token works once
+    response = await async_client.post("/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_revoked_refresh_token_is_rejected(async_client, db_session, verified_user):
+    from app.services.refresh_token_service import RefreshTokenService
+    refresh_token = await RefreshTokenService.issue(db_session, verified_user.id)
+    await db_session.commit()
+    response = await async_client.post("/token/revoke", json={"refresh_token": refresh_token})
+    assert response.status_code == 204
+    response = await async_client.post("/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_locking_account_revokes_its_tokens(async_client, verified_user, monkeypatch):
+    monkeypatch.setattr(get_settings(), "auth_trust_token_claims", True)
+    token = create_access_token(data={"sub": str(verified_user.id), "role": "ADMIN"})
+    headers = {"Authorization": f"Bearer {token}"}
+    assert (await async_client.get(f"/users/{verified_user.id}", headers=headers)).status_code == 200
+    for _ in range(get_settings().max_login_attempts):
+        await async_client.post("/login/", data={"username": verified_user.email, "password": "wrong"})
+    # Claims mode never loads the user, so only the revocation watermark can stop this token
+    assert (await async_client.get(f"/users/{verified_user.id}", headers=headers)).status_code == 401
+
+@pytest.mark.asyncio
+async def test_logout_revokes_access_token(async_client, db_session, verified_user, admin_token):
+    from app.services.refresh_token_service import RefreshTokenService
+    refresh_token = await RefreshTokenService.issue(db_session, verified_user.id)
+    await db_session.commit()
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.post("/token/revoke", json={"refresh_token": refresh_token}, headers=headers)
+    assert response.status_code == 204
+    assert (await async_client.get(f"/users/{verified_user.id}", headers=headers)).status_code == 401
+
+@pytest.mark.asyncio
+async def test_api_key_authorizes_by_scope(async_client, verified_user, admin_token):
+    admin_headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.post("/api-keys/", json={"name": "billing", "scopes": ["MANAGER"]}, headers=admin_headers)
+    assert response.status_code == 201
+    created = response.json()
+    key_headers = {"X-API-Key": created["key"]}
+    assert (await async_client.get(f"/users/{verified_user.id}", headers=key_headers)).status_code == 200
+    # MANAGER does not cover admin-only endpoints
+    assert (await async_client.get("/api-keys/", headers=key_headers)).status_code == 403
+    listed = (await async_client.get("/api-keys/", headers=admin_headers)).json()
+    assert [k["id"] for k in listed] == [created["id"]] and "key" not in listed[0]
+    assert listed[0]["usage_count"] == 2
+
+    assert (await async_client.delete(f"/api-keys/{created['id']}", headers=admin_headers)).status_code == 204
+    assert (await async_client.get(f"/users/{verified_user.id}", headers=key_headers)).status_code == 401
+
+@pytest.mark.asyncio
+async def test_invalid_api_key_is_rejected(async_client, verified_user):
+    response = await async_client.get(f"/users/{verified_user.id}", headers={"X-API-Key": "umk_00000000_nope"})
+    assert response.status_code == 401
+    assert (await async_client.get(f"/users/{verified_user.id}")).status_code == 401
+
+@pytest.mark.asyncio
+async def test_login_rate_limited_per_email(async_client, verified_user, monkeypatch):
+    monkeypatch.setattr(get_settings(), "rate_limit_login_per_email", 2)
+    monkeypatch.setattr(get_settings(), "max_login_attempts", 10)
+    for _ in range(2):
+        response = await async_client.post("/login/", data={"username": verified_user.email, "password": "wrong"})
+        assert response.status_code == 401
+    response = await async_client.post("/login/", data={"username": verified_user.email, "password": "MySuperPassword$1234"})
+    assert response.status_code == 429
+    assert 0 < int(response.headers["Retry-After"]) <= get_settings().rate_limit_window_seconds
+
+@pytest.mark.asyncio
+async def test_register_rate_limited_per_forwarded_ip(async_client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "rate_limit_register_per_ip", 1)
+    user_data = {"email": "ratelimited@example.com", "password": "sS#fdasrongPassword123!"}
+    headers = {"X-Forwarded-For": "203.0.113.7"}
+    assert (await async_client.post("/register/", json=user_data, headers=headers)).status_code != 429
+    other = dict(user_data, email="ratelimited2@example.com")
+    assert (await async_client.post("/register/", json=other, headers=headers)).status_code == 429
+    assert (await async_client.post("/register/", json=other, headers={"X-Forwarded-For": "203.0.113.8"})).status_code != 429
+
+@pytest.mark.asyncio
+async def test_reads_go_to_primary_after_a_write(async_client, verified_user, admin_token, monkeypatch):
+    from app.database import Database
+    from app.dependencies import get_read_db
+    from app.utils.read_your_writes import PRIMARY_COOKIE
+    from tests.conftest import AsyncTestingSessionLocal
+    replica_reads = []
+    def replica_factory():
+        replica_reads.append(True)
+        return AsyncTestingSessionLocal()
+    monkeypatch.setattr(Database, "get_read_session_factory", classmethod(lambda cls: replica_factory))
+    monkeypatch.setattr(Database, "get_session_factory", classmethod(lambda cls: AsyncTestingSessionLocal))
+    del app.dependency_overrides[get_read_db]
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    assert (await async_client.get(f"/users/{verified_user.id}", headers=headers)).status_code == 200
+    assert len(replica_reads) == 1
+    response = await async_client.put(f"/users/{verified_user.id}", json={"first_name": "Written"}, headers=headers)
+    assert response.status_code == 200 and PRIMARY_COOKIE in response.cookies
+    # Within the window the same client reads from the primary, even without sending the cookie back
+    async_client.cookies.clear()
+    response = await async_client.get(f"/users/{verified_user.id}", headers=headers)
+    assert response.json()["first_name"] == "Written"
+    assert len(replica_reads) == 1
+
+    monkeypatch.setattr(get_settings(), "read_your_writes_seconds", 0)
+    assert (await async_client.get(f"/users/{verified_user.id}", headers=headers)).status_code == 200
+    assert len(replica_reads) == 2
+
+@pytest.mark.asyncio
+async def test_echoed_primary_header_pins_reads_on_any_worker(async_client, verified_user, admin_token, monkeypatch):
+    from app.database import Database
+    from app.dependencies import get_read_db
+    from app.utils.read_your_writes import PRIMARY_HEADER, clear_recent_writers
+    from tests.conftest import AsyncTestingSessionLocal
+    replica_reads = []
+    def replica_factory():
+        replica_reads.append(True)
+        return AsyncTestingSessionLocal()
+    monkeypatch.setattr(Database, "get_read_session_factory", classmethod(lambda cls: replica_factory))
+    monkeypatch.setattr(Database, "get_session_factory", classmethod(lambda cls: AsyncTestingSessionLocal))
+    del app.dependency_overrides[get_read_db]
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    response = await async_client.put(f"/users/{verified_user.id}", json={"first_name": "Written"}, headers=headers)
+    assert response.status_code == 200
+    until = response.headers[PRIMARY_HEADER]
+    # Another worker: no cookie and no memory of the write, only the header the client echoes
+    async_client.cookies.clear()
+    clear_recent_writers()
+    response = await async_client.get(f"/users/{verified_user.id}", headers={**headers, PRIMARY_HEADER: until})
+    assert response.json()["first_name"] == "Written"
+    assert replica_reads == []
+    # Without it, that worker reads from the replica
+    assert (await async_client.get(f"/users/{verified_user.id}", headers=headers)).status_code == 200
+    assert replica_reads == [True]
+    # An expired deadline no longer pins
+    response = await async_client.get(f"/users/{verified_user.id}", headers={**headers, PRIMARY_HEADER: "1.0"})
+    assert response.status_code == 200 and replica_reads == [True, True]
+
+@pytest.mark.asyncio
+async def test_bulk_delete_users_by_filter(async_client, db_session, admin_user, admin_token, users_with_same_role_50_users, monkeypatch):
+    monkeypatch.setattr(get_settings(), "bulk_delete_batch_size", 20)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.post("/users/bulk-delete", json={"role": "AUTHENTICATED"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        "deleted": 50,
+        "batches": [{"batch": 1, "deleted": 20}, {"batch": 2, "deleted": 20}, {"batch": 3, "deleted": 10}],
+        "completed": True,
+        "error": None,
+    }
+    assert await UserService.get_by_id(db_session, admin_user.id) is not None
+
+@pytest.mark.asyncio
+async def test_bulk_delete_users_by_ids_never_deletes_caller(async_client, admin_user, admin_token, users_with_same_role_50_users):
+    ids = [str(admin_user.id)] + [str(u.id) for u in users_with_same_role_50_users[:5]]
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.post("/users/bulk-delete", json={"ids": ids}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["deleted"] == 5
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", [{}, {"q": ""}, {"ids": [], "role": "ANONYMOUS"}])
+async def test_bulk_delete_users_needs_ids_or_filter(async_client, admin_token, body):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.post("/users/bulk-delete", json=body, headers=headers)
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_bulk_delete_users_requires_admin(async_client, manager_token):
+    headers = {"Authorization": f"Bearer {manager_token}"}
+    response = await async_client.post("/users/bulk-delete", json={"role": "ANONYMOUS"}, headers=headers)
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_bulk_delete_users_reports_batches_done_before_a_failure(async_client, admin_token, users_with_same_role_50_users, monkeypatch):
+    monkeypatch.setattr(get_settings(), "bulk_delete_batch_size", 20)
+    delete_where = UserService._delete_where.__func__
+    calls = []
+    async def failing_second_batch(cls, session, *criteria):
+        calls.append(1)
+        if len(calls) == 2:
+            raise OperationalError("DELETE", {}, Exception("connection lost"))
+        return await delete_where(cls, session, *criteria)
+    monkeypatch.setattr(UserService, "_delete_where", classmethod(failing_second_batch))
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await async_client.post("/users/bulk-delete", json={"role": "AUTHENTICATED"}, headers=headers)
+    assert response.status_code == 500
+    body = response.json()
+    assert body["deleted"] == 20 and body["batches"] == [{"batch": 1, "deleted": 20}]
+    assert body["completed"] is False and "Batch 2" in body["error"]
+
+@pytest.mark.asyncio
+async def test_db_pool_stats_for_admins_only(async_client, admin_token, manager_token):
+    response = await async_client.get("/admin/db-pool", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["replicas"] == []
+    assert {"size", "checked_out", "waiting", "timeouts", "acquire", "connect"} <= stats["primary"].keys()
+    assert stats["primary"]["acquire"]["count"] >= 0
+    response = await async_client.get("/admin/db-pool", headers={"Authorization": f"Bearer {manager_token}"})
+    assert response.status_code == 403
+    assert (await async_client.get("/admin/db-pool")).status_code == 401
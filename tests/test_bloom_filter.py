@@ -0,0 +1,19 @@
+from builtins import all, range, sum
+from app.utils.bloom_filter import BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter.from_items((f"jti-{i}" for i in range(1000)), capacity=1000)
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    assert bloom.count == 1000
+
+
+def test_bloom_filter_false_positive_rate_at_capacity():
+    bloom = BloomFilter.from_items((f"jti-{i}" for i in range(5000)), capacity=5000, error_rate=0.01)
+    false_positives = sum(f"other-{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_empty_bloom_filter_contains_nothing():
+    bloom = BloomFilter(capacity=0)
+    assert "anything" not in bloom
@@ -0,0 +1,146 @@
+from builtins import dict, range, sorted
+import asyncio
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.database import Database, _session_factory_for, engine_options
+from app.dependencies import get_settings
+from app.utils.pool_stats import Histogram, InstrumentedAsyncPool
+from tests.conftest import TEST_DATABASE_URL
+
+
+def test_engine_options_from_settings(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "db_pool_size", 7)
+    monkeypatch.setattr(settings, "db_statement_cache_size", 0)
+    monkeypatch.setattr(settings, "db_server_settings", {"application_name": "user-api"})
+    options = engine_options("postgresql+asyncpg://u:p@db/app", max_overflow=0)
+    assert options["poolclass"] is InstrumentedAsyncPool
+    assert options["pool_size"] == 7 and options["max_overflow"] == 0
+    assert options["connect_args"] == {"statement_cache_size": 0, "server_settings": {"application_name": "user-api"}}
+    # asyncpg-only options are left out for other drivers
+    assert "connect_args" not in engine_options("sqlite+aiosqlite://")
+
+
+def test_histogram_buckets():
+    histogram = Histogram(bounds_ms=(1, 10))
+    for seconds in (0.0005, 0.001, 0.005, 0.5):
+        histogram.observe(seconds)
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"<=1": 2, "<=10": 1, ">10": 1}
+    assert snapshot["count"] == 4 and snapshot["max_ms"] == 500
+
+
+async def test_pool_reports_checkouts_waiters_and_timeouts():
+    engine = create_async_engine(TEST_DATABASE_URL, **engine_options(
+        TEST_DATABASE_URL, pool_size=1, max_overflow=0, pool_timeout=0.2,
+        connect_args={"server_settings": {"application_name": "pool-stats-test"}},
+    ))
+    pool = engine.pool
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("SHOW application_name"))).scalar() == "pool-stats-test"
+            assert pool.snapshot()["checked_out"] == 1
+
+            async def checkout():
+                async with engine.connect():
+                    pass
+            waiter = asyncio.ensure_future(checkout())
+            await asyncio.sleep(0.05)
+            assert pool.snapshot()["waiting"] == 1
+            with pytest.raises(exc.TimeoutError):
+                await waiter
+        snapshot = pool.snapshot()
+        assert snapshot["timeouts"] == 1 and snapshot["waiting"] == 0 and snapshot["checked_out"] == 0
+        assert snapshot["connect"]["count"] == 1
+        assert snapshot["acquire"]["count"] == 2 and snapshot["acquire"]["max_ms"] >= 200
+    finally:
+        await engine.dispose()
+
+
+def test_database_pool_stats():
+    stats = Database.pool_stats()
+    assert dict(stats).keys() >= {"size", "checked_out", "waiting", "acquire", "connect"}
+
+
+@pytest.fixture
+async def two_replicas(monkeypatch):
+    """One Postgres instance behind two logical replica URLs, told apart by application_name."""
+    engines = [
+        create_async_engine(TEST_DATABASE_URL, **engine_options(
+            TEST_DATABASE_URL, connect_args={"server_settings": {"application_name": name}}))
+        for name in ("replica-a", "replica-b")
+    ]
+    monkeypatch.setattr(Database, "_replica_engines", engines)
+    monkeypatch.setattr(Database, "_replica_session_factories", [_session_factory_for(e) for e in engines])
+    yield engines
+    for engine in engines:
+        await engine.dispose()
+
+
+async def replica_name(factory):
+    async with factory() as session:
+        return (await session.execute(text("SHOW application_name"))).scalar()
+
+
+async def test_read_sessions_round_robin(two_replicas):
+    names = [await replica_name(Database.get_read_session_factory()) for _ in range(4)]
+    assert sorted(names) == ["replica-a", "replica-a", "replica-b", "replica-b"]
+    assert names[0] != names[1] and names[1] != names[2]
+
+
+async def test_read_sessions_least_loaded(two_replicas, monkeypatch):
+    monkeypatch.setattr(get_settings(), "database_replica_selection", "least_loaded")
+    async with two_replicas[0].connect():
+        assert {await replica_name(Database.get_read_session_factory()) for _ in range(3)} == {"replica-b"}
+
+
+def test_read_sessions_without_replicas_use_primary(monkeypatch):
+    monkeypatch.setattr(Database, "_replica_session_factories", [])
+    assert Database.get_read_session_factory() is Database.get_session_factory()
+    assert Database.replica_pool_stats() == []
+
+
+@pytest.fixture
+async def transaction_pooler():
+    """A PgBouncer-style stand-in in transaction pooling mode, with two server connections."""
+    from benchmarks.pgbouncer_standin import TransactionPoolingProxy
+    url = make_url(TEST_DATABASE_URL)
+    proxy = TransactionPoolingProxy(url.host, url.port or 5432, url.username, url.database, url.password, pool_size=2)
+    port = await proxy.start()
+    yield url.set(host="127.0.0.1", port=port).render_as_string(hide_password=False)
+    await proxy.close()
+
+
+async def run_transactions(url, clients=4, rounds=5):
+    engine = create_async_engine(url, **engine_options(url, connect_args={"ssl": False}))
+    query = text("SELECT count(*) FROM users WHERE email LIKE :pattern")
+
+    async def client(n):
+        for i in range(rounds):
+            async with engine.connect() as conn:
+                await conn.execute(query, {"pattern": f"%{n}-{i}%"})
+    try:
+        await asyncio.gather(*(client(n) for n in range(clients)))
+    finally:
+        await engine.dispose()
+
+
+async def test_pgbouncer_mode_options(monkeypatch):
+    monkeypatch.setattr(get_settings(), "db_pgbouncer_mode", True)
+    connect_args = engine_options("postgresql+asyncpg://u:p@pgbouncer/app")["connect_args"]
+    assert connect_args["statement_cache_size"] == 0 and connect_args["prepared_statement_cache_size"] == 0
+    name_func = connect_args["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+
+async def test_default_mode_breaks_behind_transaction_pooler(transaction_pooler):
+    # One client in turn gets each of the two server connections, so its cached statement is missing
+    with pytest.raises(exc.DBAPIError, match="prepared statement"):
+        await run_transactions(transaction_pooler, clients=1)
+
+
+async def test_pgbouncer_mode_works_behind_transaction_pooler(transaction_pooler, monkeypatch):
+    monkeypatch.setattr(get_settings(), "db_pgbouncer_mode", True)
+    await run_transactions(transaction_pooler)
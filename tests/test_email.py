@@ -1,3 +1,7 @@
+from builtins import len, range
+import smtplib
+import socket
+import time
 import pytest
 from app.utils.smtp_connection import SMTPClient
 from app.services.email_service import EmailService
@@ -45,3 +49,74 @@ async def test_send_markdown_email(email_service, monkeypatch):
     assert "## Hi Test User" in content
     assert "(http://example.com/verify?token=abc123)" in content
     assert recipient == "test@example.com"
+
+
+@pytest.fixture
+def smtp_sink():
+    """Local SMTP server that records every message it receives."""
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+
+    class RecordingHandler:
+        def __init__(self):
+            self.messages = []
+            self.peers = set()
+
+        async def handle_DATA(self, server, session, envelope):
+            self.messages.append(envelope)
+            self.peers.add(session.peer)
+            return "250 Message accepted for delivery"
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = RecordingHandler()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        yield handler, port
+    finally:
+        controller.stop()
+
+
+@pytest.mark.asyncio
+async def test_send_email_async_reuses_pooled_connection(smtp_sink):
+    handler, port = smtp_sink
+    client = SMTPClient(server="127.0.0.1", port=port, username="sender@example.com", password="", use_tls=False, pool_size=1)
+    try:
+        for i in range(3):
+            await client.send_email_async(f"Subject {i}", "<p>Hello!</p>", f"user{i}@example.com")
+    finally:
+        client.close()
+
+    assert [m.rcpt_tos for m in handler.messages] == [["user0@example.com"], ["user1@example.com"], ["user2@example.com"]]
+    # All three messages went over the same SMTP session
+    assert len(handler.peers) == 1
+
+
+@pytest.mark.asyncio
+async def test_send_email_reconnects_after_server_drops_connection(smtp_sink):
+    handler, port = smtp_sink
+    client = SMTPClient(server="127.0.0.1", port=port, username="sender@example.com", password="", use_tls=False, pool_size=1)
+    try:
+        await client.send_email_async("First", "<p>1</p>", "first@example.com")
+        # Simulate the server closing the idle connection behind our back
+        client._idle.queue[0].smtp.sock.shutdown(socket.SHUT_RDWR)
+        await client.send_email_async("Second", "<p>2</p>", "second@example.com")
+    finally:
+        client.close()
+
+    assert [m.rcpt_tos for m in handler.messages] == [["first@example.com"], ["second@example.com"]]
+    assert len(handler.peers) == 2
+
+
+def test_connect_times_out_on_a_silent_server():
+    # Accepts the connection but never sends the SMTP greeting
+    with socket.socket() as silent:
+        silent.bind(("127.0.0.1", 0))
+        silent.listen()
+        client = SMTPClient(server="127.0.0.1", port=silent.getsockname()[1], username="sender@example.com",
+                            password="", use_tls=False, timeout=0.2)
+        started = time.monotonic()
+        with pytest.raises(smtplib.SMTPServerDisconnected, match="timed out"):
+            client.send_email("Subject", "<p>Hello!</p>", "user@example.com")
+        assert time.monotonic() - started < 5
@@ -49,3 +49,20 @@ def test_generate_pagination_links(mock_request):
     assert len(links) >= 4
     expected_self_url = "http://testserver/users?limit=5&skip=10"
     assert normalize_url(str(links[0].href)) == normalize_url(expected_self_url), "Self link should match expected URL"
+
+def test_generate_pagination_links_keeps_filters(mock_request):
+    mock_request.url = "http://testserver/users?q=john&skip=10&limit=5"
+    links = generate_pagination_links(mock_request, 10, 5, 50)
+    assert normalize_url(str(links[0].href)) == normalize_url("http://testserver/users?limit=5&q=john&skip=10")
+
+def test_generate_pagination_links_cursor_mode(mock_request):
+    links = generate_pagination_links(mock_request, 0, 5, 50, cursor="abc", next_cursor="def")
+    by_rel = {link.rel: normalize_url(str(link.href)) for link in links}
+    assert sorted(by_rel) == ["first", "next", "self"]
+    assert by_rel["self"] == normalize_url("http://testserver/users?cursor=abc&limit=5")
+    assert by_rel["next"] == normalize_url("http://testserver/users?cursor=def&limit=5")
+
+def test_generate_pagination_links_without_total(mock_request):
+    links = generate_pagination_links(mock_request, 10, 5, None, has_next=True)
+    rels = sorted(link.rel for link in links)
+    assert rels == ["first", "next", "prev", "self"]
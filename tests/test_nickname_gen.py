@@ -0,0 +1,38 @@
+import re
+from builtins import len, range, set
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy import Sequence
+
+from app.utils.nickname_gen import NicknameAllocator, generate_nickname, load_words
+
+NICKNAME_PATTERN = re.compile(r'^[\w-]+$')
+
+
+def test_word_lists_load_once_and_are_clean():
+    assert load_words("adjectives") is load_words("adjectives")
+    for name in ("adjectives", "animals"):
+        words = load_words(name)
+        assert len(words) > 100
+        assert len(set(words)) == len(words)
+    assert NICKNAME_PATTERN.match(generate_nickname())
+
+
+def test_allocator_is_a_permutation_of_the_name_space():
+    allocator = NicknameAllocator(Sequence("seq", increment=10), ["red", "blue", "green"], ["fox", "owl"], numbers=7)
+    names = [allocator.nickname_for(position) for position in range(allocator.space)]
+    assert len(set(names)) == allocator.space == 42
+    assert all(NICKNAME_PATTERN.match(name) and len(name) <= 50 for name in names)
+
+
+async def test_allocator_reserves_blocks_from_the_sequence():
+    allocator = NicknameAllocator.from_word_files(Sequence("seq", start=0, increment=100))
+    session = MagicMock()
+    session.execute = AsyncMock(side_effect=[
+        MagicMock(scalar_one=MagicMock(return_value=0)),
+        MagicMock(scalar_one=MagicMock(return_value=500)),
+    ])
+    names = [await allocator.allocate(session) for _ in range(150)]
+    assert session.execute.await_count == 2
+    assert len(set(names)) == 150
+    assert names[100] == allocator.nickname_for(500)
@@ -0,0 +1,164 @@
+from builtins import ConnectionError, dict, len, list, object, range, sorted, str
+import pytest
+from starlette.requests import Request
+from app.dependencies import get_settings
+from app.utils.rate_limit import InMemoryRateLimiter, RateLimitExceeded, RedisRateLimiter, client_ip, enforce_rate_limit
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """Local stand-in for the sorted-set commands RedisRateLimiter uses."""
+    def __init__(self):
+        self.zsets = {}
+        self.ttl = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def zrem(self, key, member):
+        return int(self.zsets.get(key, {}).pop(member, None) is not None)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    async def execute(self):
+        results = []
+        for name, args, kwargs in self.commands:
+            zset = self.redis.zsets.setdefault(args[0], {})
+            if name == "zremrangebyscore":
+                expired = [m for m, score in zset.items() if args[1] <= score <= args[2]]
+                for member in expired:
+                    del zset[member]
+                results.append(len(expired))
+            elif name == "zadd":
+                zset.update(args[1])
+                results.append(1)
+            elif name == "zcard":
+                results.append(len(zset))
+            elif name == "zrange":
+                ordered = sorted(zset.items(), key=lambda item: item[1])
+                results.append(ordered[args[1]:args[2] + 1])
+            elif name == "pexpire":
+                self.redis.ttl[args[0]] = args[1]
+                results.append(True)
+        return results
+
+
+class BrokenRedis:
+    def pipeline(self, transaction=True):
+        raise ConnectionError("connection refused")
+
+
+def make_request(headers=None, host="10.0.0.9"):
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request({"type": "http", "headers": raw_headers, "client": (host, 1234)})
+
+
+@pytest.fixture(params=["memory", "redis"])
+def limiter_and_clock(request):
+    clock = FakeClock()
+    if request.param == "memory":
+        return InMemoryRateLimiter(clock=clock), clock
+    return RedisRateLimiter(FakeRedis(), clock=clock), clock
+
+
+async def test_limit_and_retry_after(limiter_and_clock):
+    limiter, clock = limiter_and_clock
+    for _ in range(3):
+        assert await limiter.hit("k", 3, 60) == 0
+    clock.now += 10
+    assert await limiter.hit("k", 3, 60) == pytest.approx(50)
+    # Other keys have their own window
+    assert await limiter.hit("other", 3, 60) == 0
+
+
+async def test_window_slides(limiter_and_clock):
+    limiter, clock = limiter_and_clock
+    assert await limiter.hit("k", 2, 60) == 0
+    clock.now += 30
+    assert await limiter.hit("k", 2, 60) == 0
+    assert await limiter.hit("k", 2, 60) > 0
+    clock.now += 30.5
+    # The first hit left the window; rejected hits were never counted
+    assert await limiter.hit("k", 2, 60) == 0
+    assert await limiter.hit("k", 2, 60) == pytest.approx(29.5)
+
+
+async def test_hit_many_counts_all_keys_or_none(limiter_and_clock):
+    limiter, clock = limiter_and_clock
+    assert await limiter.hit_many([("ip", 3), ("email", 1)], 60) == 0
+    clock.now += 10
+    assert await limiter.hit_many([("ip", 3), ("email", 1)], 60) == pytest.approx(50)
+    # The rejected attempt left the other key alone
+    assert await limiter.hit_many([("ip", 3), ("other", 1)], 60) == 0
+    assert await limiter.hit("ip", 3, 60) == 0
+    assert await limiter.hit("ip", 3, 60) > 0
+
+
+async def test_redis_limiter_sets_expiry_and_fails_open():
+    redis = FakeRedis()
+    limiter = RedisRateLimiter(redis, clock=FakeClock())
+    await limiter.hit("k", 1, 60)
+    assert redis.ttl == {"ratelimit:k": 60000}
+    assert await RedisRateLimiter(BrokenRedis()).hit("k", 1, 60) == 0
+
+
+async def test_in_memory_limiter_sweeps_idle_keys():
+    clock = FakeClock()
+    limiter = InMemoryRateLimiter(clock=clock, max_keys=2)
+    await limiter.hit("a", 1, 60)
+    await limiter.hit("b", 1, 60)
+    clock.now += 61
+    await limiter.hit("c", 1, 60)
+    assert list(limiter._hits) == ["c"]
+
+
+def test_client_ip_honours_trusted_forwarded_hops(monkeypatch):
+    headers = {"X-Forwarded-For": "1.1.1.1, 2.2.2.2, 3.3.3.3"}
+    assert client_ip(make_request(headers)) == "3.3.3.3"
+    monkeypatch.setattr(get_settings(), "rate_limit_forwarded_hops", 2)
+    assert client_ip(make_request(headers)) == "2.2.2.2"
+    monkeypatch.setattr(get_settings(), "rate_limit_forwarded_hops", 0)
+    assert client_ip(make_request(headers)) == "10.0.0.9"
+    assert client_ip(make_request()) == "10.0.0.9"
+
+
+async def test_enforce_rate_limit_by_ip_and_email(monkeypatch):
+    monkeypatch.setattr(get_settings(), "rate_limit_login_per_ip", 4)
+    monkeypatch.setattr(get_settings(), "rate_limit_login_per_email", 2)
+    await enforce_rate_limit(make_request(), "login", "a@example.com")
+    await enforce_rate_limit(make_request(), "login", "A@example.com ")
+    with pytest.raises(RateLimitExceeded):
+        await enforce_rate_limit(make_request(), "login", "a@example.com")
+    # The rejected attempt did not count against the address
+    await enforce_rate_limit(make_request(), "login", "b@example.com")
+    await enforce_rate_limit(make_request(), "login", "c@example.com")
+    # The address is out of attempts whatever email it tries next
+    with pytest.raises(RateLimitExceeded):
+        await enforce_rate_limit(make_request(), "login", "d@example.com")
+    await enforce_rate_limit(make_request(host="10.0.0.10"), "login", "c@example.com")
+
+
+async def test_enforce_rate_limit_disabled(monkeypatch):
+    monkeypatch.setattr(get_settings(), "rate_limit_enabled", False)
+    monkeypatch.setattr(get_settings(), "rate_limit_login_per_ip", 0)
+    await enforce_rate_limit(make_request(), "login", "a@example.com")
@@ -1,7 +1,12 @@
 # test_security.py
-from builtins import RuntimeError, ValueError, isinstance, str
+from builtins import RuntimeError, ValueError, isinstance, list, str
 import pytest
-from app.utils.security import hash_password, verify_password
+from app.dependencies import get_settings
+from app.utils import security
+from app.utils.security import (
+    PasswordHashingBusyError, calibrate_rounds, hash_password, hash_password_async, hash_rounds, needs_rehash,
+    verify_password, verify_password_async
+)
 
 def test_hash_password():
     """Test that hashing password returns a bcrypt hashed string."""
@@ -65,3 +70,49 @@ def test_hash_password_internal_error(monkeypatch):
     with pytest.raises(ValueError):
         hash_password("test")
 
+
+async def test_hash_password_async_roundtrip():
+    """Test that the async helpers hash and verify on the worker pool."""
+    hashed = await hash_password_async("secure_password", rounds=4)
+    assert hashed.startswith('$2b$04$')
+    assert await verify_password_async("secure_password", hashed) is True
+    assert await verify_password_async("wrong_password", hashed) is False
+
+async def test_verify_password_async_invalid_hash():
+    """Test that errors raised on the worker propagate to the caller."""
+    with pytest.raises(ValueError):
+        await verify_password_async("secure_password", "invalid_hash_format")
+
+async def test_password_pool_rejects_when_queue_full(monkeypatch):
+    """Test that jobs beyond the pool size plus queue bound are rejected."""
+    monkeypatch.setattr(get_settings(), "password_hash_pool_size", 1)
+    monkeypatch.setattr(get_settings(), "password_hash_max_queue", 0)
+    monkeypatch.setattr(security, "_pending_jobs", 1)
+    with pytest.raises(PasswordHashingBusyError):
+        await hash_password_async("test", rounds=4)
+
+def test_hash_password_uses_configured_rounds(monkeypatch):
+    """Test that the cost comes from settings unless given explicitly."""
+    monkeypatch.setattr(get_settings(), "password_hash_rounds", 5)
+    assert hash_rounds(hash_password("secure_password")) == 5
+    assert hash_rounds(hash_password("secure_password", 4)) == 4
+
+async def test_hash_password_async_uses_configured_rounds(monkeypatch):
+    monkeypatch.setattr(get_settings(), "password_hash_rounds", 5)
+    assert hash_rounds(await hash_password_async("secure_password")) == 5
+
+def test_needs_rehash(monkeypatch):
+    """Test that hashes both weaker and stronger than the policy are flagged."""
+    monkeypatch.setattr(get_settings(), "password_hash_rounds", 5)
+    assert not needs_rehash(hash_password("secure_password", 5))
+    assert needs_rehash(hash_password("secure_password", 4))
+    assert needs_rehash(hash_password("secure_password", 6))
+    assert hash_rounds("invalid_hash_format") is None and needs_rehash("invalid_hash_format")
+
+def test_calibrate_rounds():
+    """Test that calibration stops at the first cost over the target and recommends the one before."""
+    recommended, timings = calibrate_rounds(target_seconds=60, min_rounds=4, max_rounds=6, samples=1)
+    assert recommended == 6 and list(timings) == [4, 5, 6]
+    recommended, timings = calibrate_rounds(target_seconds=0, min_rounds=4, max_rounds=6, samples=1)
+    # Nothing fits a zero target: the floor is returned and no higher cost is timed
+    assert recommended == 4 and list(timings) == [4]
@@ -0,0 +1,92 @@
+import pytest
+from builtins import len
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+from sqlalchemy import select
+from app.models.api_key_model import ApiKey
+from app.models.user_model import UserRole
+from app.services import api_key_service
+from app.services.api_key_service import ApiKeyService, ApiKeyUsageRecorder, api_key_cache_stats
+from tests.conftest import AsyncTestingSessionLocal
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_keys_are_stored_as_digests(db_session, admin_user):
+    api_key, key = await ApiKeyService.create(db_session, "billing", [UserRole.MANAGER], admin_user.id)
+    assert key.startswith(f"umk_{api_key.prefix}_")
+    stored = (await db_session.execute(select(ApiKey.key_hash))).scalars().all()
+    assert stored == [ApiKeyService.digest(key)]
+    assert api_key.scopes == ["MANAGER"]
+
+
+async def test_verify_returns_scopes_without_bcrypt(db_session):
+    _, key = await ApiKeyService.create(db_session, "billing", [UserRole.ADMIN, UserRole.MANAGER])
+    with patch("app.utils.security.bcrypt.checkpw") as checkpw:
+        principal = await ApiKeyService.verify(db_session, key)
+    checkpw.assert_not_called()
+    assert principal.name == "billing"
+    assert principal.scopes == {"ADMIN", "MANAGER"}
+
+
+async def test_verify_rejects_malformed_and_wrong_secret(db_session):
+    api_key, key = await ApiKeyService.create(db_session, "billing", [UserRole.ADMIN])
+    assert await ApiKeyService.verify(db_session, "not-a-key") is None
+    # Right prefix, wrong secret: found by the index, refused by the digest comparison
+    assert await ApiKeyService.verify(db_session, f"umk_{api_key.prefix}_guessed") is None
+    assert await ApiKeyService.verify(db_session, key) is not None
+
+
+async def test_verify_is_cached(db_session):
+    _, key = await ApiKeyService.create(db_session, "billing", [UserRole.ADMIN])
+    await ApiKeyService.verify(db_session, key)
+    hits = api_key_cache_stats()["hits"]
+    with patch.object(db_session, "execute") as execute:
+        assert await ApiKeyService.verify(db_session, key) is not None
+    execute.assert_not_called()
+    assert api_key_cache_stats()["hits"] == hits + 1
+
+
+async def test_revoked_and_expired_keys_are_rejected(db_session):
+    api_key, key = await ApiKeyService.create(db_session, "billing", [UserRole.ADMIN])
+    assert await ApiKeyService.verify(db_session, key) is not None
+    assert await ApiKeyService.revoke(db_session, api_key.id)
+    assert await ApiKeyService.verify(db_session, key) is None
+    assert not await ApiKeyService.revoke(db_session, api_key.id)
+
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    _, expired = await ApiKeyService.create(db_session, "old", [UserRole.ADMIN], expires_at=past)
+    assert await ApiKeyService.verify(db_session, expired) is None
+
+
+async def test_usage_recorder_batches_counts(db_session):
+    api_key, key = await ApiKeyService.create(db_session, "billing", [UserRole.ADMIN])
+    other, _ = await ApiKeyService.create(db_session, "reports", [UserRole.MANAGER])
+    recorder = ApiKeyUsageRecorder(AsyncTestingSessionLocal)
+    for _ in range(3):
+        recorder.record(api_key.id)
+    recorder.record(other.id)
+    assert await recorder.flush() == 2
+    assert await recorder.flush() == 0
+    db_session.expire_all()
+    rows = {row.id: row for row in (await db_session.execute(select(ApiKey))).scalars()}
+    assert rows[api_key.id].usage_count == 3 and rows[other.id].usage_count == 1
+    assert rows[api_key.id].last_used_at is not None
+
+
+async def test_authenticate_records_use(db_session, monkeypatch):
+    api_key, key = await ApiKeyService.create(db_session, "billing", [UserRole.ADMIN])
+    # Without a running recorder the use is written inline
+    await ApiKeyService.authenticate(db_session, key)
+    await db_session.refresh(api_key)
+    assert api_key.usage_count == 1
+
+    recorder = ApiKeyUsageRecorder(AsyncTestingSessionLocal)
+    monkeypatch.setattr(api_key_service, "_usage_recorder", recorder)
+    await ApiKeyService.authenticate(db_session, key)
+    await ApiKeyService.authenticate(db_session, key)
+    await db_session.refresh(api_key)
+    assert api_key.usage_count == 1
+    await recorder.flush()
+    await db_session.refresh(api_key)
+    assert api_key.usage_count == 3
@@ -0,0 +1,136 @@
+import asyncio
+import pytest
+from builtins import Exception, ValueError, all, len, range, sorted
+from sqlalchemy import select, update
+from app.models.email_outbox_model import EmailOutbox, OutboxStatus
+from app.services.email_outbox_service import EmailOutboxDispatcher, EmailOutboxService
+from tests.conftest import AsyncTestingSessionLocal
+
+pytestmark = pytest.mark.asyncio
+
+
+class RecordingEmailService:
+    def __init__(self, fail_for=()):
+        self.sent = []
+        self.fail_for = set(fail_for)
+
+    async def send_user_email(self, user_data, email_type):
+        if user_data["email"] in self.fail_for:
+            raise Exception("SMTP unavailable")
+        self.sent.append((user_data["email"], email_type))
+
+
+class SlowEmailService(RecordingEmailService):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    async def send_user_email(self, user_data, email_type):
+        await asyncio.sleep(self.delay)
+        await super().send_user_email(user_data, email_type)
+
+
+async def queue_messages(db_session, count):
+    for i in range(count):
+        EmailOutboxService.enqueue(db_session, "email_verification", {"email": f"user{i}@example.com", "name": "Test", "verification_url": "http://x"})
+    await db_session.commit()
+
+
+async def fetch_outbox(db_session):
+    db_session.expire_all()
+    return (await db_session.execute(select(EmailOutbox).order_by(EmailOutbox.recipient))).scalars().all()
+
+
+async def test_dispatcher_sends_and_marks_messages_sent(db_session):
+    await queue_messages(db_session, 3)
+    email_service = RecordingEmailService()
+    dispatcher = EmailOutboxDispatcher(AsyncTestingSessionLocal, email_service, batch_size=10, concurrency=2)
+
+    assert await dispatcher.run_once() == 3
+    assert sorted(email for email, _ in email_service.sent) == ["user0@example.com", "user1@example.com", "user2@example.com"]
+    outbox = await fetch_outbox(db_session)
+    assert all(m.status == OutboxStatus.SENT and m.sent_at is not None and m.attempts == 1 for m in outbox)
+    # Nothing left to claim
+    assert await dispatcher.run_once() == 0
+
+
+async def test_dispatcher_claims_in_batches(db_session):
+    await queue_messages(db_session, 5)
+    dispatcher = EmailOutboxDispatcher(AsyncTestingSessionLocal, RecordingEmailService(), batch_size=2)
+
+    assert await dispatcher.run_once() == 2
+    assert await dispatcher.run_once() == 2
+    assert await dispatcher.run_once() == 1
+
+
+async def test_dispatcher_retries_with_backoff_then_gives_up(db_session):
+    await queue_messages(db_session, 2)
+    email_service = RecordingEmailService(fail_for={"user1@example.com"})
+    dispatcher = EmailOutboxDispatcher(AsyncTestingSessionLocal, email_service, max_attempts=2, backoff_base_seconds=60)
+
+    assert await dispatcher.run_once() == 2
+    sent, failed = await fetch_outbox(db_session)
+    assert sent.status == OutboxStatus.SENT
+    assert failed.status == OutboxStatus.PENDING
+    assert failed.attempts == 1
+    assert failed.last_error == "SMTP unavailable"
+    assert failed.next_attempt_at > sent.sent_at
+
+    # Not due yet because of the backoff
+    assert await dispatcher.run_once() == 0
+
+    # Make it due again; the second failure exhausts max_attempts
+    await db_session.execute(update(EmailOutbox).where(EmailOutbox.id == failed.id).values(next_attempt_at=sent.created_at))
+    await db_session.commit()
+    assert await dispatcher.run_once() == 1
+    _, failed = await fetch_outbox(db_session)
+    assert failed.status == OutboxStatus.FAILED
+    assert failed.attempts == 2
+
+
+async def test_claimed_rows_are_skipped_by_other_dispatchers(db_session):
+    await queue_messages(db_session, 1)
+    async with AsyncTestingSessionLocal() as first:
+        claimed = await EmailOutboxService.claim_batch(first, limit=10, lease_seconds=60)
+        assert len(claimed) == 1
+        async with AsyncTestingSessionLocal() as second:
+            assert await EmailOutboxService.claim_batch(second, limit=10, lease_seconds=60) == []
+
+
+async def test_slow_send_is_not_delivered_twice(db_session):
+    await queue_messages(db_session, 1)
+    slow = SlowEmailService(delay=3)
+    dispatcher = EmailOutboxDispatcher(AsyncTestingSessionLocal, slow, lease_seconds=2, send_timeout=0.5,
+                                       backoff_base_seconds=60)
+    other = RecordingEmailService()
+    other_dispatcher = EmailOutboxDispatcher(AsyncTestingSessionLocal, other, lease_seconds=2, send_timeout=0.5)
+
+    async def after_lease():
+        await asyncio.sleep(2.2)
+        return await other_dispatcher.run_once()
+
+    attempted, claimed_again = await asyncio.gather(dispatcher.run_once(), after_lease())
+    assert (attempted, claimed_again) == (1, 0)
+    assert slow.sent == [] and other.sent == []
+    [message] = await fetch_outbox(db_session)
+    assert message.status == OutboxStatus.PENDING
+    assert message.last_error == "Send timed out after 0.5s"
+
+
+async def test_messages_not_started_by_half_lease_are_handed_back(db_session):
+    await queue_messages(db_session, 3)
+    email_service = SlowEmailService(delay=0.4)
+    dispatcher = EmailOutboxDispatcher(AsyncTestingSessionLocal, email_service, concurrency=1, lease_seconds=1,
+                                       send_timeout=0.45)
+
+    assert await dispatcher.run_once() == 2
+    assert len(email_service.sent) == 2
+    outbox = await fetch_outbox(db_session)
+    [unsent] = [m for m in outbox if m.status != OutboxStatus.SENT]
+    assert unsent.status == OutboxStatus.PENDING and unsent.attempts == 0
+    assert await dispatcher.run_once() == 1
+
+
+async def test_send_timeout_must_fit_in_the_lease():
+    with pytest.raises(ValueError):
+        EmailOutboxDispatcher(AsyncTestingSessionLocal, RecordingEmailService(), lease_seconds=60, send_timeout=30)
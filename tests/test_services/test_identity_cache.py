@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from builtins import int, len, range
+from sqlalchemy import text
+from app.services.identity_cache import UserIdentityCache
+from app.services.user_service import UserService
+from tests.conftest import AsyncTestingSessionLocal, engine
+
+pytestmark = pytest.mark.asyncio
+
+
+async def eventually(condition, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return True
+        await asyncio.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+async def identity_cache():
+    cache = UserIdentityCache(engine, maxsize=100, ttl=60.0, reconnect_delay=0.05)
+    cache.start()
+    await asyncio.wait_for(cache.listening.wait(), timeout=5)
+    try:
+        yield cache
+    finally:
+        await cache.stop()
+
+
+async def test_load_serves_repeat_lookups_from_cache(identity_cache, verified_user):
+    user_id = verified_user.id
+    async with AsyncTestingSessionLocal() as session:
+        first = await identity_cache.load(session, user_id)
+    async with AsyncTestingSessionLocal() as session:
+        second = await identity_cache.load(session, user_id)
+        assert second is not first
+        assert second.email == verified_user.email and second.role == verified_user.role
+        # The cached user is attached to the session and can still be changed and committed
+        second.first_name = "Cached"
+        await session.commit()
+    assert identity_cache.stats()["hits"] == 1 and identity_cache.stats()["misses"] == 1
+    async with AsyncTestingSessionLocal() as session:
+        name = (await session.execute(text("SELECT first_name FROM users WHERE id = :id"), {"id": user_id})).scalar_one()
+    assert name == "Cached"
+
+
+async def test_change_from_another_connection_invalidates(identity_cache, verified_user):
+    user_id = verified_user.id
+    async with AsyncTestingSessionLocal() as session:
+        await identity_cache.load(session, user_id)
+    assert user_id in identity_cache.cache
+
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE users SET role = 'ADMIN' WHERE id = :id"), {"id": user_id})
+    assert await eventually(lambda: user_id not in identity_cache.cache)
+
+    async with AsyncTestingSessionLocal() as session:
+        assert (await identity_cache.load(session, user_id)).role.name == "ADMIN"
+
+
+async def test_login_bookkeeping_does_not_invalidate(identity_cache, verified_user):
+    user_id = verified_user.id
+    async with AsyncTestingSessionLocal() as session:
+        await identity_cache.load(session, user_id)
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE users SET last_login_at = now(), failed_login_attempts = 1 WHERE id = :id"), {"id": user_id})
+        await conn.execute(text("UPDATE users SET nickname = nickname || '_x' WHERE id = :id"), {"id": user_id})
+    # Notifications arrive in commit order, so once the nickname change lands the first one has been seen
+    assert await eventually(lambda: user_id not in identity_cache.cache)
+    assert identity_cache.stats()["invalidations"] == 1
+
+
+async def test_user_service_mutations_invalidate_locally(identity_cache, db_session, verified_user, monkeypatch):
+    import app.services.identity_cache as identity_cache_module
+    monkeypatch.setattr(identity_cache_module, "_identity_cache", identity_cache)
+    user_id = verified_user.id
+    async with AsyncTestingSessionLocal() as session:
+        await identity_cache.load(session, user_id)
+    # Without waiting for the notification: the service drops the entry as soon as it commits
+    await UserService.update(db_session, user_id, {"first_name": "Changed"})
+    assert user_id not in identity_cache.cache
+
+
+async def test_put_skips_snapshot_read_before_an_invalidation(identity_cache, verified_user):
+    epoch = identity_cache._epoch
+    identity_cache.invalidate(verified_user.id)
+    identity_cache.put(verified_user, epoch)
+    assert verified_user.id not in identity_cache.cache
+
+
+async def test_nothing_is_cached_without_listener(verified_user):
+    cache = UserIdentityCache(engine)
+    async with AsyncTestingSessionLocal() as session:
+        assert (await cache.load(session, verified_user.id)).id == verified_user.id
+    assert len(cache.cache) == 0
@@ -0,0 +1,57 @@
+from datetime import timedelta
+import pytest
+from app.services import jwt_service
+from app.services.jwt_service import clear_token_cache, create_access_token, decode_token, token_cache_stats
+from settings.config import get_settings
+
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    clear_token_cache()
+    yield
+    clear_token_cache()
+
+
+def test_decode_token_reuses_verified_payload():
+    token = create_access_token(data={"sub": "abc", "role": "admin"})
+    before = token_cache_stats()
+    first = decode_token(token)
+    first["role"] = "tampered"  # Callers get their own copy
+    second = decode_token(token)
+    assert second["sub"] == "abc" and second["role"] == "ADMIN"
+    after = token_cache_stats()
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+
+def test_cached_token_expires_on_time(monkeypatch):
+    token = create_access_token(data={"sub": "abc"}, expires_delta=timedelta(seconds=30))
+    assert decode_token(token) is not None
+    exp = decode_token(token)["exp"]
+    monkeypatch.setattr(jwt_service.time, "time", lambda: exp - 0.001)
+    assert decode_token(token) is not None
+    monkeypatch.setattr(jwt_service.time, "time", lambda: exp)
+    assert decode_token(token) is None
+
+
+def test_key_rotation_rejects_cached_token(monkeypatch):
+    token = create_access_token(data={"sub": "abc"})
+    assert decode_token(token) is not None
+    monkeypatch.setattr(get_settings(), "jwt_secret_key", "a_rotated_secret_key")
+    assert decode_token(token) is None
+
+
+def test_invalid_tokens_are_not_cached():
+    token = create_access_token(data={"sub": "abc"})
+    tampered = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+    assert decode_token(tampered) is None
+    assert decode_token(tampered) is None
+    assert token_cache_stats()["size"] == 0
+
+
+def test_cache_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(get_settings(), "jwt_verify_cache_size", 0)
+    token = create_access_token(data={"sub": "abc"})
+    assert decode_token(token) is not None
+    assert decode_token(token) is not None
+    assert token_cache_stats()["hits"] == 0
@@ -0,0 +1,74 @@
+import pytest
+from builtins import len
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, select, update
+from app.models.user_model import User
+from app.services.login_activity_service import LastLoginRecorder, start_last_login_recorder, stop_last_login_recorder
+from app.services import user_service
+from app.services.user_service import UserService
+from tests.conftest import AsyncTestingSessionLocal
+
+pytestmark = pytest.mark.asyncio
+
+
+async def fetch_last_login(db_session, user_id):
+    db_session.expire_all()
+    return (await db_session.execute(select(User.last_login_at).where(User.id == user_id))).scalar_one()
+
+
+async def test_flush_coalesces_and_never_moves_backwards(db_session, user, verified_user):
+    user_id, verified_user_id = user.id, verified_user.id
+    recorder = LastLoginRecorder(AsyncTestingSessionLocal)
+    newest = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    recorder.record(user_id, newest - timedelta(minutes=5))
+    recorder.record(user_id, newest)
+    recorder.record(verified_user_id, newest)
+    assert await recorder.flush() == 2
+    assert await fetch_last_login(db_session, user_id) == newest
+
+    recorder.record(user_id, newest - timedelta(days=1))
+    await recorder.flush()
+    assert await fetch_last_login(db_session, user_id) == newest
+
+
+async def test_successful_login_is_written_behind(db_session, verified_user):
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    sync_engine = db_session.bind.sync_engine
+    user_id = verified_user.id
+
+    await start_last_login_recorder(AsyncTestingSessionLocal)
+    try:
+        event.listen(sync_engine, "before_cursor_execute", record)
+        try:
+            user, locked = await UserService.authenticate(db_session, verified_user.email, "MySuperPassword$1234")
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", record)
+        assert user is not None and not locked
+        # The projection read and the lock re-check; no UPDATE on the users row for this login
+        assert len(statements) == 2 and all(s.lstrip().startswith("SELECT") for s in statements)
+        assert statements[1].rstrip().endswith("FOR SHARE")
+        assert await fetch_last_login(db_session, user_id) is None
+    finally:
+        # Shutdown flushes the buffered timestamp
+        await stop_last_login_recorder()
+    assert await fetch_last_login(db_session, user_id) is not None
+
+
+async def test_lock_set_during_bcrypt_is_honoured_with_write_behind(db_session, verified_user, monkeypatch):
+    user_id = verified_user.id
+    async def verify_while_locked_elsewhere(password, hashed_password):
+        # Concurrent bad guesses lock the account while this login's bcrypt check runs
+        async with AsyncTestingSessionLocal() as other:
+            await other.execute(update(User).where(User.id == user_id).values(is_locked=True))
+            await other.commit()
+        return True
+    monkeypatch.setattr(user_service, "verify_password_async", verify_while_locked_elsewhere)
+
+    await start_last_login_recorder(AsyncTestingSessionLocal)
+    try:
+        assert await UserService.authenticate(db_session, verified_user.email, "MySuperPassword$1234") == (None, True)
+    finally:
+        await stop_last_login_recorder()
+    assert await fetch_last_login(db_session, user_id) is None
@@ -0,0 +1,69 @@
+import pytest
+from builtins import len
+from sqlalchemy import select, text, update
+from app.models.refresh_token_model import RefreshToken
+from app.models.user_model import User
+from app.services.refresh_token_service import RefreshTokenService
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.asyncio
+
+
+async def issue(db_session, user_id):
+    token = await RefreshTokenService.issue(db_session, user_id)
+    await db_session.commit()
+    return token
+
+
+async def test_tokens_are_stored_hashed(db_session, verified_user):
+    token = await issue(db_session, verified_user.id)
+    stored = (await db_session.execute(select(RefreshToken.token_hash))).scalars().all()
+    assert stored == [RefreshTokenService.hash_token(token)]
+    assert token not in stored
+
+
+async def test_rotate_returns_successor_in_same_family(db_session, verified_user):
+    token = await issue(db_session, verified_user.id)
+    row, successor = await RefreshTokenService.rotate(db_session, token)
+    assert successor != token
+    assert row.user_id == verified_user.id
+    assert row.role == verified_user.role and row.token_version == verified_user.token_version
+    families = (await db_session.execute(select(RefreshToken.family_id))).scalars().all()
+    assert len(families) == 2 and len(set(families)) == 1
+    assert await RefreshTokenService.rotate(db_session, successor) is not None
+
+
+async def test_replayed_token_revokes_family(db_session, verified_user):
+    token = await issue(db_session, verified_user.id)
+    _, successor = await RefreshTokenService.rotate(db_session, token)
+    assert await RefreshTokenService.rotate(db_session, token) is None
+    # The attacker's replay also locks out whoever holds the successor
+    assert await RefreshTokenService.rotate(db_session, successor) is None
+
+
+async def test_rotate_rejects_unknown_expired_and_locked(db_session, verified_user):
+    assert await RefreshTokenService.rotate(db_session, "not-a-token") is None
+
+    expired = await issue(db_session, verified_user.id)
+    await db_session.execute(
+        update(RefreshToken)
+        .where(RefreshToken.token_hash == RefreshTokenService.hash_token(expired))
+        .values(expires_at=text("now() - interval '1 second'"))
+    )
+    await db_session.commit()
+    assert await RefreshTokenService.rotate(db_session, expired) is None
+
+    token = await issue(db_session, verified_user.id)
+    await db_session.execute(update(User).where(User.id == verified_user.id).values(is_locked=True))
+    await db_session.commit()
+    assert await RefreshTokenService.rotate(db_session, token) is None
+
+
+async def test_revoke_and_password_reset(db_session, verified_user):
+    token = await issue(db_session, verified_user.id)
+    await RefreshTokenService.revoke(db_session, token)
+    assert await RefreshTokenService.rotate(db_session, token) is None
+
+    token = await issue(db_session, verified_user.id)
+    await UserService.reset_password(db_session, verified_user.id, "NewPassword123!")
+    assert await RefreshTokenService.rotate(db_session, token) is None
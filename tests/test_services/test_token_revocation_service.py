@@ -0,0 +1,143 @@
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+import pytest
+from sqlalchemy import func, select, update
+from app.models.token_revocation_model import RevokedToken, TokenWatermark
+from app.services.token_revocation_service import (
+    RevocationList, TokenRevocationService, TokenRevocationSync, get_revocation_list, is_token_revoked,
+)
+from tests.conftest import AsyncTestingSessionLocal
+
+
+def test_revocation_list_watermark_and_jti():
+    revocations = RevocationList(capacity=100)
+    user_id = uuid4()
+    now = time.time()
+    assert not revocations.is_revoked("a", user_id, now)
+    revocations.add_token("a")
+    assert revocations.is_revoked("a", user_id, now)
+    assert not revocations.is_revoked("b", user_id, now)
+
+    revocations.add_watermark(user_id, now)
+    assert revocations.is_revoked("b", user_id, now - 1)
+    assert revocations.is_revoked("b", user_id, None)
+    assert not revocations.is_revoked("b", user_id, now + 1)
+    assert not revocations.is_revoked("b", uuid4(), now - 1)
+
+
+def test_replace_keeps_revocations_made_during_the_load():
+    revocations = RevocationList(capacity=100)
+    user_id = uuid4()
+    revocations.add_token("stale")
+    revocations.begin_load()
+    revocations.add_token("during-load")
+    revocations.add_watermark(user_id, 100.0)
+    revocations.replace(["loaded"], {})
+    assert revocations.is_revoked("loaded", user_id, 200.0)
+    assert revocations.is_revoked("during-load", user_id, 200.0)
+    assert revocations.is_revoked("x", user_id, 50.0)
+    assert not revocations.is_revoked("stale", user_id, 200.0)
+
+
+@pytest.mark.asyncio
+async def test_other_workers_learn_revocations_on_sync(db_session, user):
+    jti = uuid4().hex
+    await TokenRevocationService.revoke_token(db_session, jti, user.id, datetime.now(timezone.utc) + timedelta(minutes=5))
+    await TokenRevocationService.revoke_user_tokens(db_session, user.id)
+    await db_session.commit()
+    # This worker knows immediately
+    assert is_token_revoked(jti, uuid4(), time.time())
+    assert is_token_revoked(None, user.id, time.time() - 1)
+
+    other_worker = RevocationList(capacity=100)
+    assert not other_worker.is_revoked(jti, uuid4(), time.time())
+    await TokenRevocationSync(AsyncTestingSessionLocal, other_worker).sync_once()
+    assert other_worker.is_revoked(jti, uuid4(), time.time())
+    assert other_worker.is_revoked(None, user.id, time.time() - 1)
+    assert not other_worker.is_revoked(None, user.id, time.time() + 1)
+
+
+@pytest.mark.asyncio
+async def test_revocations_take_effect_in_this_worker_on_commit(db_session, user):
+    await TokenRevocationService.revoke_token(db_session, "staged", user.id, datetime.now(timezone.utc) + timedelta(minutes=5))
+    await TokenRevocationService.revoke_user_tokens(db_session, user.id)
+    assert not is_token_revoked("staged", uuid4(), time.time())
+    assert not is_token_revoked(None, user.id, time.time() - 1)
+    await db_session.commit()
+    assert is_token_revoked("staged", uuid4(), time.time())
+    assert is_token_revoked(None, user.id, time.time() - 1)
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_revocations_never_take_effect(db_session, user):
+    user_id = user.id
+    await TokenRevocationService.revoke_token(db_session, "rolled-back", user_id, datetime.now(timezone.utc) + timedelta(minutes=5))
+    await TokenRevocationService.revoke_user_tokens(db_session, user_id)
+    await db_session.rollback()
+    # Nor does a later commit of the same session apply them
+    await db_session.commit()
+    assert not is_token_revoked("rolled-back", uuid4(), time.time())
+    assert not is_token_revoked(None, user_id, time.time() - 1)
+
+
+@pytest.mark.asyncio
+async def test_prune_deletes_expired_entries_and_load_skips_them(db_session, user):
+    await TokenRevocationService.revoke_token(db_session, "old", user.id, datetime.now(timezone.utc) - timedelta(seconds=1))
+    await TokenRevocationService.revoke_user_tokens(db_session, user.id)
+    await db_session.execute(update(TokenWatermark).values(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    await db_session.commit()
+    jtis, watermarks, _ = await TokenRevocationService.load(db_session)
+    assert jtis == [] and watermarks == {}
+    assert await TokenRevocationService.prune(db_session)
+    await db_session.commit()
+    assert (await db_session.execute(select(RevokedToken))).first() is None
+    assert (await db_session.execute(select(TokenWatermark))).first() is None
+
+
+@pytest.mark.asyncio
+async def test_prune_is_skipped_while_another_worker_prunes(db_session, user):
+    await TokenRevocationService.revoke_token(db_session, "old", user.id, datetime.now(timezone.utc) - timedelta(seconds=1))
+    await db_session.commit()
+    async with AsyncTestingSessionLocal() as other_worker:
+        assert await TokenRevocationService.prune(other_worker)
+        assert not await TokenRevocationService.prune(db_session)
+        await db_session.commit()
+        await other_worker.commit()
+    assert (await db_session.execute(select(func.count()).select_from(RevokedToken))).scalar() == 0
+
+
+@pytest.mark.asyncio
+async def test_sync_loads_only_what_changed_between_full_reloads(db_session, user):
+    worker = RevocationList(capacity=100)
+    sync = TokenRevocationSync(AsyncTestingSessionLocal, worker, full_interval=3600)
+    await TokenRevocationService.revoke_token(db_session, "before", user.id, datetime.now(timezone.utc) + timedelta(minutes=5))
+    await db_session.commit()
+    await sync.sync_once()
+    assert worker.is_revoked("before", uuid4(), time.time())
+
+    await TokenRevocationService.revoke_token(db_session, "after", user.id, datetime.now(timezone.utc) + timedelta(minutes=5))
+    await TokenRevocationService.revoke_user_tokens(db_session, user.id)
+    # Older than the look-back: an incremental load does not read it again
+    await db_session.execute(update(RevokedToken).where(RevokedToken.jti == "before")
+                             .values(created_at=func.now() - timedelta(hours=1)))
+    await db_session.commit()
+    loaded_at = sync._loaded_at
+    jtis, watermarks, _ = await TokenRevocationService.load(db_session, loaded_at)
+    await db_session.commit()
+    assert jtis == ["after"] and list(watermarks) == [user.id]
+    await sync.sync_once()
+    assert worker.is_revoked("after", uuid4(), time.time())
+    assert worker.is_revoked(None, user.id, time.time() - 1)
+    assert worker.is_revoked("before", uuid4(), time.time())
+
+
+@pytest.mark.asyncio
+async def test_watermark_only_moves_forward(db_session, user):
+    later = datetime.now(timezone.utc)
+    await TokenRevocationService.revoke_user_tokens(db_session, user.id, later)
+    await TokenRevocationService.revoke_user_tokens(db_session, user.id, later - timedelta(minutes=1))
+    await db_session.commit()
+    _, watermarks, _ = await TokenRevocationService.load(db_session)
+    assert watermarks[user.id] == pytest.approx(later.timestamp())
+    assert get_revocation_list().is_revoked(None, user.id, later.timestamp() - 0.5)
@@ -1,12 +1,20 @@
 
+import asyncio
 import pytest
-from builtins import range
-from uuid import UUID
-from sqlalchemy import select
+from contextlib import contextmanager
+from builtins import all, classmethod, len, range, sorted, str, sum
+from uuid import UUID, uuid4
+from sqlalchemy import delete, event, func, select, text
 from app.dependencies import get_settings
+from app.models.email_outbox_model import EmailOutbox, OutboxStatus
+from app.models.token_revocation_model import TokenWatermark
 from app.models.user_model import User, UserRole
-from app.services.user_service import UserService
+from app.schemas.pagination_schema import TotalMode
+from app.services import user_service
+from app.services.token_revocation_service import TokenRevocationService, is_token_revoked
+from app.services.user_service import EmailAlreadyExistsError, UserService
 from app.utils.nickname_gen import generate_nickname
+from tests.conftest import AsyncTestingSessionLocal
 
 pytestmark = pytest.mark.asyncio
 
@@ -49,11 +57,14 @@ async def test_create_user_with_valid_data(db_session, email_service, monkeypatc
     assert fetched is not None
     assert fetched.email == user_data["email"]
 
-    # 5) Email verification was triggered exactly once
-    assert "sent" in calls
-    sent_payload, sent_type = calls["sent"]
-    assert sent_payload["email"] == user_data["email"]
-    assert sent_type == "email_verification"
+    # 5) Email verification was queued in the outbox exactly once, not sent inline
+    assert "sent" not in calls
+    outbox = (await db_session.execute(select(EmailOutbox))).scalars().all()
+    assert len(outbox) == 1
+    assert outbox[0].recipient == user_data["email"]
+    assert outbox[0].email_type == "email_verification"
+    assert outbox[0].status == OutboxStatus.PENDING
+    assert str(created_user.id) in outbox[0].payload["verification_url"]
 
 # Test creating a user with invalid data
 async def test_create_user_with_invalid_data(db_session, email_service):
@@ -108,6 +119,35 @@ async def test_update_user_invalid_data(db_session, user):
     updated_user = await UserService.update(db_session, user.id, {"email": "invalidemail"})
     assert updated_user is None
 
+@contextmanager
+def recorded_statements(session):
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    sync_engine = session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+
+# Test that an update is one UPDATE ... RETURNING that also refreshes the loaded user
+async def test_update_user_single_statement(db_session, user):
+    with recorded_statements(db_session) as statements:
+        updated_user = await UserService.update(db_session, user.id, {"first_name": "Returned", "bio": "New bio"})
+    assert len(statements) == 1
+    assert statements[0].lstrip().startswith("UPDATE users") and "RETURNING" in statements[0]
+    assert updated_user is user
+    assert updated_user.first_name == "Returned" and updated_user.bio == "New bio"
+    assert updated_user.updated_at is not None
+
+# Test that updating a missing user is one statement and returns None
+async def test_update_user_does_not_exist(db_session):
+    with recorded_statements(db_session) as statements:
+        updated_user = await UserService.update(db_session, uuid4(), {"first_name": "Nobody"})
+    assert updated_user is None
+    assert len(statements) == 1
+
 # Test deleting a user who exists
 async def test_delete_user_exists(db_session, user):
     deletion_success = await UserService.delete(db_session, user.id)
@@ -119,6 +159,34 @@ async def test_delete_user_does_not_exist(db_session):
     deletion_success = await UserService.delete(db_session, non_existent_user_id)
     assert deletion_success is False
 
+# Test that a delete is one statement that also revokes the user's tokens
+async def test_delete_user_single_statement(db_session, user):
+    with recorded_statements(db_session) as statements:
+        assert await UserService.delete(db_session, user.id) is True
+    assert len(statements) == 1 and "DELETE FROM users" in statements[0] and "RETURNING" in statements[0]
+    watermark = await db_session.get(TokenWatermark, user.id)
+    assert watermark is not None
+    assert is_token_revoked(None, user.id, watermark.revoked_before.timestamp() - 1)
+    assert await UserService.delete(db_session, user.id) is False
+
+# Test bulk deleting by id in batches; unknown ids and duplicates are ignored
+async def test_bulk_delete_by_ids(db_session, users_with_same_role_50_users):
+    ids = [u.id for u in users_with_same_role_50_users[:25]]
+    batches = [n async for n in UserService.bulk_delete(db_session, ids=ids + ids[:3] + [uuid4()], batch_size=10)]
+    assert batches == [10, 10, 5]
+    remaining = (await db_session.execute(select(func.count()).select_from(User))).scalar_one()
+    assert remaining == 25
+
+# Test bulk deleting by filter in batches, never deleting the excluded caller
+async def test_bulk_delete_by_filter(db_session, users_with_same_role_50_users, admin_user):
+    keep = users_with_same_role_50_users[0]
+    batches = [n async for n in UserService.bulk_delete(
+        db_session, role=UserRole.AUTHENTICATED, exclude=keep.id, batch_size=20,
+    )]
+    assert batches == [20, 20, 9]
+    remaining = (await db_session.execute(select(User.id))).scalars().all()
+    assert sorted(remaining) == sorted([keep.id, admin_user.id])
+
 # Test listing users with pagination
 async def test_list_users_with_pagination(db_session, users_with_same_role_50_users):
     users_page_1 = await UserService.list_users(db_session, skip=0, limit=10)
@@ -147,11 +215,9 @@ async def test_register_user_with_valid_data(db_session, email_service, monkeypa
 
     # … your existing ID, field and persistence assertions …
 
-    # 4) Email‐verification call made
-    assert "sent" in calls
-    sent_payload, sent_type = calls["sent"]
-    assert sent_payload["email"] == user_data["email"]
-    assert sent_type == "email_verification"
+    # 4) Email‐verification queued for the dispatcher
+    outbox = (await db_session.execute(select(EmailOutbox))).scalars().all()
+    assert [(m.recipient, m.email_type) for m in outbox] == [(user_data["email"], "email_verification")]
 
 # Test attempting to register a user with invalid data
 async def test_register_user_with_invalid_data(db_session, email_service):
@@ -196,6 +262,16 @@ async def test_reset_password(db_session, user):
     reset_success = await UserService.reset_password(db_session, user.id, new_password)
     assert reset_success is True
 
+async def test_token_version_bumped_on_role_change_and_reset(db_session, user):
+    user_id = user.id
+    await UserService.update(db_session, user_id, {"first_name": "Unchanged"})
+    assert (await UserService.get_by_id(db_session, user_id)).token_version == 0
+    await UserService.update(db_session, user_id, {"role": "MANAGER"})
+    assert (await UserService.get_by_id(db_session, user_id)).token_version == 1
+    await UserService.reset_password(db_session, user_id, "NewPassword123!")
+    db_session.expire_all()
+    assert (await UserService.get_by_id(db_session, user_id)).token_version == 2
+
 # Test verifying a user's email
 async def test_verify_email_with_token(db_session, user):
     token = "valid_token_example"  # This should be set in your user setup if it depends on a real token
@@ -210,3 +286,177 @@ async def test_unlock_user_account(db_session, locked_user):
     assert unlocked, "The account should be unlocked"
     refreshed_user = await UserService.get_by_id(db_session, locked_user.id)
     assert not refreshed_user.is_locked, "The user should no longer be locked"
+
+# Test that LIKE wildcards in the search text are matched literally
+async def test_search_users_escapes_like_wildcards(db_session, user):
+    user.first_name = "Agent_50%"
+    await db_session.commit()
+    users, total = await UserService.search_users(db_session, q="t_50%")
+    assert total == 1 and users[0].id == user.id
+    users, total = await UserService.search_users(db_session, q="t%5")
+    assert total == 0 and users == []
+
+# Test that text search is answered from the trigram indexes rather than a table scan
+async def test_search_users_uses_trigram_indexes(db_session, users_with_same_role_50_users):
+    installed = (await db_session.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))).scalar()
+    if not installed:
+        pytest.skip("pg_trgm is not available on this server")
+    compiled = UserService._text_search_filter("john").compile(
+        dialect=db_session.bind.dialect, compile_kwargs={"literal_binds": True}
+    )
+    await db_session.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = (await db_session.execute(text(f"EXPLAIN SELECT id FROM users WHERE {compiled}"))).scalars().all()
+    assert any("ix_users_" in line and "_trgm" in line for line in plan), plan
+
+# Test that total_mode controls how the search total is produced
+async def test_search_users_total_modes(db_session, users_with_same_role_50_users):
+    users, total = await UserService.search_users(db_session, limit=10, total_mode=TotalMode.EXACT)
+    assert len(users) == 10 and total == 50
+    users, total = await UserService.search_users(db_session, limit=10, include_total=False)
+    assert len(users) == 10 and total is None
+    users, total = await UserService.search_users(db_session, limit=10, total_mode=TotalMode.NONE)
+    assert total is None
+
+async def test_search_users_estimated_total(db_session, users_with_same_role_50_users):
+    await db_session.execute(text("ANALYZE users"))
+    _, total = await UserService.search_users(db_session, limit=10, total_mode=TotalMode.ESTIMATED)
+    assert total is not None and total >= 10
+    # Filtered listings use the planner estimate, which must render the filters as literals
+    _, total = await UserService.search_users(
+        db_session, q="o'brien", role=UserRole.AUTHENTICATED, is_professional=False,
+        limit=10, total_mode=TotalMode.ESTIMATED,
+    )
+    assert total == 0  # a short page pins the estimate down to what was actually found
+
+# Test that a ":word" in the search text is not taken for a bind parameter by the estimate
+async def test_search_users_estimated_total_with_colon(db_session, users_with_same_role_50_users):
+    users, total = await UserService.search_users(db_session, q="a :b", limit=10, total_mode=TotalMode.ESTIMATED)
+    assert users == [] and total == 0
+
+# Test that the row peeked past the page pins the estimate without being counted as seen
+async def test_search_users_estimated_total_with_peek(db_session, users_with_same_role_50_users):
+    users, total = await UserService.search_users(db_session, skip=40, limit=10, total_mode=TotalMode.ESTIMATED, peek=True)
+    assert len(users) == 10 and total == 50
+    users, total = await UserService.search_users(db_session, skip=30, limit=10, total_mode=TotalMode.EXACT, peek=True)
+    assert len(users) == 11 and total == 50
+
+# Test that creating a user is a single INSERT statement and the second user is not an admin
+async def test_create_user_single_statement(db_session, email_service, user):
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    sync_engine = db_session.bind.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        created_user = await UserService.create(
+            db_session, {"email": "second@example.com", "password": "ValidPassword123!"}, email_service
+        )
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+    # One statement per signup, plus a nextval once per block of reserved nicknames
+    statements = [s for s in statements if "nextval" not in s]
+    assert len(statements) == 1 and statements[0].lstrip().startswith("WITH")
+    assert created_user.role == UserRole.ANONYMOUS
+    assert created_user.email_verified is False and created_user.verification_token
+    assert created_user.created_at is not None
+    outbox = (await db_session.execute(select(EmailOutbox))).scalars().all()
+    assert created_user.verification_token in outbox[0].payload["verification_url"]
+
+# Test that a duplicate email is rejected by the unique constraint without queueing an email
+async def test_create_user_duplicate_email(db_session, email_service, user):
+    with pytest.raises(EmailAlreadyExistsError):
+        await UserService.create(db_session, {"email": user.email, "password": "ValidPassword123!"}, email_service)
+    assert (await db_session.execute(select(EmailOutbox))).scalars().all() == []
+
+# Test that running out of nickname attempts is a failure, not a duplicate email
+async def test_create_user_nickname_attempts_exhausted(db_session, email_service, user, monkeypatch):
+    taken = user.nickname
+    async def allocate(session):
+        return taken
+    monkeypatch.setattr(user_service.get_nickname_allocator(), "allocate", allocate)
+    created_user = await UserService.create(db_session, {"email": "other@example.com", "password": "ValidPassword123!"}, email_service)
+    assert created_user is None
+
+# Test that a nickname collision is retried with a fresh nickname
+async def test_create_user_retries_nickname_collision(db_session, email_service, user, monkeypatch):
+    nicknames = iter([user.nickname, "fresh_nickname_123"])
+    async def allocate(session):
+        return next(nicknames)
+    monkeypatch.setattr(user_service.get_nickname_allocator(), "allocate", allocate)
+    created_user = await UserService.create(db_session, {"email": "other@example.com", "password": "ValidPassword123!"}, email_service)
+    assert created_user.nickname == "fresh_nickname_123"
+
+# Test that parallel failed logins are all counted and the lockout threshold holds
+async def test_parallel_failed_logins_respect_lockout(db_session, verified_user, monkeypatch):
+    max_login_attempts = get_settings().max_login_attempts
+    attempts = max_login_attempts * 3
+
+    async def attempt(password):
+        async with AsyncTestingSessionLocal() as session:
+            return await UserService.authenticate(session, verified_user.email, password)
+
+    revoke_user_tokens = TokenRevocationService.revoke_user_tokens.__func__
+    transitions = []
+    async def count_transitions(cls, session, user_id, at=None):
+        transitions.append(user_id)
+        return await revoke_user_tokens(cls, session, user_id, at)
+    monkeypatch.setattr(TokenRevocationService, "revoke_user_tokens", classmethod(count_transitions))
+
+    results = await asyncio.gather(*(attempt("wrongpassword") for _ in range(attempts)))
+
+    async with AsyncTestingSessionLocal() as session:
+        stored = await session.get(User, verified_user.id)
+    assert stored.is_locked
+    # No failure is lost, none is counted past the lock, and exactly one made the transition
+    assert stored.failed_login_attempts == max_login_attempts
+    assert transitions == [verified_user.id]
+    assert all(user is None for user, _ in results)
+    assert sum(locked for _, locked in results) == attempts - max_login_attempts + 1
+
+    # Once locked, even the right password is refused
+    user, locked = await attempt("MySuperPassword$1234")
+    assert user is None and locked
+
+# Test that a user deleted between the read and the failure UPDATE is not an error
+async def test_failed_login_for_user_deleted_meanwhile(db_session, verified_user, monkeypatch):
+    user_id = verified_user.id
+    async def verify_while_deleted_elsewhere(password, hashed_password):
+        async with AsyncTestingSessionLocal() as other:
+            await other.execute(delete(User).where(User.id == user_id))
+            await other.commit()
+        return False
+    monkeypatch.setattr(user_service, "verify_password_async", verify_while_deleted_elsewhere)
+    assert await UserService.authenticate(db_session, verified_user.email, "wrongpassword") == (None, False)
+
+# Test that a successful login resets the failure counter
+async def test_authenticate_success_resets_failures(db_session, verified_user):
+    verified_user.failed_login_attempts = 2
+    await db_session.commit()
+    user, locked = await UserService.authenticate(db_session, verified_user.email, "MySuperPassword$1234")
+    assert user.id == verified_user.id and not locked
+    assert user.failed_login_attempts == 0 and user.last_login_at is not None
+
+
+async def test_login_rehashes_password_at_policy_cost(db_session, monkeypatch):
+    from app.services.password_rehash_service import drain_password_rehashes
+    from app.utils.security import hash_password, hash_rounds
+    monkeypatch.setattr(get_settings(), "password_hash_rounds", 5)
+    user = User(nickname=generate_nickname(), email="rehash@example.com", hashed_password=hash_password("MySuperPassword$1234", 4),
+                role=UserRole.AUTHENTICATED, email_verified=True)
+    db_session.add(user)
+    await db_session.commit()
+
+    assert await UserService.login_user(db_session, user.email, "MySuperPassword$1234") is not None
+    await drain_password_rehashes()
+    await db_session.refresh(user)
+    assert hash_rounds(user.hashed_password) == 5
+    assert await UserService.login_user(db_session, user.email, "MySuperPassword$1234") is not None
+
+
+async def test_rehash_does_not_overwrite_changed_password(db_session, verified_user):
+    from app.services.password_rehash_service import PasswordRehashService
+    old_hash = verified_user.hashed_password
+    await UserService.reset_password(db_session, verified_user.id, "AnotherPassword$1234")
+    assert not await PasswordRehashService.rehash(db_session, verified_user.id, old_hash, "MySuperPassword$1234")
+    await db_session.refresh(verified_user)
+    assert await UserService.login_user(db_session, verified_user.email, "AnotherPassword$1234") is not None
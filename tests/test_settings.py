@@ -0,0 +1,24 @@
+from settings.config import Settings, get_settings, reload_settings
+import settings.config as config_module
+
+
+def test_get_settings_is_cached():
+    assert get_settings() is get_settings()
+    assert isinstance(get_settings(), Settings)
+
+
+def test_module_level_settings_reads_through_provider():
+    assert config_module.settings is get_settings()
+
+
+def test_reload_settings_picks_up_environment(monkeypatch):
+    original = get_settings()
+    monkeypatch.setenv("MAX_LOGIN_ATTEMPTS", "7")
+    try:
+        reloaded = reload_settings()
+        assert reloaded is not original
+        assert get_settings() is reloaded
+        assert get_settings().max_login_attempts == 7
+    finally:
+        monkeypatch.delenv("MAX_LOGIN_ATTEMPTS")
+        reload_settings()
@@ -0,0 +1,61 @@
+from app.utils.ttl_cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5.0, clock=clock)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    clock.now += 5.0
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_ttl_cache_expires_at_can_only_shorten_ttl():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=5.0, clock=clock)
+    cache.set("short", 1, expires_at=clock.now + 1.0)
+    cache.set("long", 2, expires_at=clock.now + 60.0)
+    clock.now += 1.0
+    assert "short" not in cache and cache.get("short") is None
+    assert cache.get("long") == 2
+    clock.now += 4.0
+    assert cache.get("long") is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60.0, clock=FakeClock())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_stats_and_invalidation():
+    cache = TTLCache(maxsize=10, ttl=60.0, clock=FakeClock())
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("missing")
+    assert cache.invalidate("a") is True
+    assert cache.invalidate("a") is False
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_ttl_cache_with_zero_size_stores_nothing():
+    cache = TTLCache(maxsize=0, ttl=60.0, clock=FakeClock())
+    cache.set("a", 1)
+    assert cache.get("a") is None
@@ -2,6 +2,7 @@ import pytest
 import markdown2
 import smtplib
 import logging
+import os
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from httpx import AsyncClient
@@ -284,6 +285,12 @@ def test_apply_email_styles_empty_html(tm):
     styled = tm._apply_email_styles("")
     assert styled == f'<div style="{body_style}"></div>'
 
+P_STYLE = "font-size: 16px; color: #666666; margin: 10px 0; line-height: 1.6;"
+BODY_STYLE = (
+    "font-family: Arial, sans-serif; font-size: 16px; color: #333333; "
+    "background-color: #ffffff; line-height: 1.5;"
+)
+
 def test_render_template_success(monkeypatch, tm):
     # 1) Stub out _read_template
     def fake_read_template(self, filename):
@@ -295,22 +302,63 @@ def test_render_template_success(monkeypatch, tm):
         return mapping[filename]
     monkeypatch.setattr(TemplateManager, "_read_template", fake_read_template)
 
-    # 2) Stub out markdown2.markdown
-    def fake_markdown(text):
-        return f"<html>{text}</html>"
-    monkeypatch.setattr(markdown2, "markdown", fake_markdown)
+    # 2) Call render_template
+    result = tm.render_template("welcome", user="Alice")
 
-    # 3) Stub out _apply_email_styles (accepting self and html)
-    def fake_apply(self, html):
-        return f"STYLED[{html}]"
-    monkeypatch.setattr(TemplateManager, "_apply_email_styles", fake_apply)
+    # 3) Header, body and footer are each rendered and styled, then wrapped once
+    assert result == (
+        f'<div style="{BODY_STYLE}">'
+        f'<p style="{P_STYLE}">HEADER_CONTENT</p>\n'
+        f'<p style="{P_STYLE}">Hello, Alice!</p>\n'
+        f'<p style="{P_STYLE}">FOOTER_CONTENT</p>\n'
+        '</div>'
+    )
 
-    # 4) Call render_template
-    result = tm.render_template("welcome", user="Alice")
+def test_render_template_compiles_each_template_once(monkeypatch, tm):
+    reads = []
+    markdown_calls = []
+    real_markdown = markdown2.markdown
+
+    def fake_read_template(self, filename):
+        reads.append(filename)
+        return {"header.md": "# Head", "footer.md": "Foot", "welcome.md": "Hello, {user}!"}[filename]
+
+    def counting_markdown(text):
+        markdown_calls.append(text)
+        return real_markdown(text)
+
+    monkeypatch.setattr(TemplateManager, "_read_template", fake_read_template)
+    monkeypatch.setattr(markdown2, "markdown", counting_markdown)
+
+    first = tm.render_template("welcome", user="Alice")
+    second = tm.render_template("welcome", user="Bob")
+
+    assert sorted(reads) == ["footer.md", "header.md", "welcome.md"]
+    assert len(markdown_calls) == 3
+    assert "Hello, Alice!" in first and "Hello, Bob!" in second
+
+def test_render_template_escapes_context_values(tm, tmp_templates_dir):
+    (tmp_templates_dir / "header.md").write_text("", encoding="utf-8")
+    (tmp_templates_dir / "footer.md").write_text("", encoding="utf-8")
+    (tmp_templates_dir / "link.md").write_text("Hi {name}, [verify]({url})", encoding="utf-8")
+
+    result = tm.render_template("link", name="<b>Bob</b>", url="http://x.test/v?a=1&b=2")
+
+    assert "Hi &lt;b&gt;Bob&lt;/b&gt;," in result
+    assert '<a href="http://x.test/v?a=1&amp;b=2">verify</a>' in result
+
+def test_render_template_auto_reload_picks_up_changes(tm, tmp_templates_dir):
+    tm.auto_reload = True
+    (tmp_templates_dir / "header.md").write_text("", encoding="utf-8")
+    (tmp_templates_dir / "footer.md").write_text("", encoding="utf-8")
+    body = tmp_templates_dir / "note.md"
+    body.write_text("First {n}", encoding="utf-8")
+    assert "First 1" in tm.render_template("note", n=1)
 
-    # 5) Verify the sequence
-    expected_md = "HEADER_CONTENT\nHello, Alice!\nFOOTER_CONTENT"
-    assert result == f"STYLED[<html>{expected_md}</html>]"
+    body.write_text("Second {n}", encoding="utf-8")
+    stat = body.stat()
+    os.utime(body, (stat.st_atime, stat.st_mtime + 5))
+    assert "Second 2" in tm.render_template("note", n=2)
 
 
 @pytest.mark.asyncio
@@ -372,7 +420,11 @@ def test_smtpclient_send_email_success(monkeypatch, caplog):
 
     # Patch smtplib.SMTP to return our DummySMTP
     dummy = DummySMTP(client.server, client.port)
-    monkeypatch.setattr(smtplib, "SMTP", lambda server, port: dummy)
+    timeouts = []
+    def connect(server, port, timeout):
+        timeouts.append(timeout)
+        return dummy
+    monkeypatch.setattr(smtplib, "SMTP", connect)
 
     # Act
     client.send_email("Test Subject", "<p>Hello!</p>", "recipient@test")
@@ -386,6 +438,7 @@ def test_smtpclient_send_email_success(monkeypatch, caplog):
     assert f"Subject: Test Subject" in raw
     assert "<p>Hello!</p>" in raw
     assert f"Email sent to recipient@test" in caplog.text
+    assert timeouts == [client.timeout]
 
 def test_smtpclient_send_email_failure(monkeypatch, caplog):
     caplog.set_level(logging.ERROR)
@@ -393,7 +446,7 @@ def test_smtpclient_send_email_failure(monkeypatch, caplog):
 
     # Define an SMTP that errors on enter
     class BadSMTP:
-        def __init__(self, server, port):
+        def __init__(self, server, port, timeout):
             pass
         def __enter__(self):
             raise RuntimeError("connection failed")